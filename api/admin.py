@@ -1,8 +1,38 @@
+import uuid
+
+from django.conf import settings
 from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.db.models import Q
+from django.db.models.functions import Length
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.template.loader import render_to_string
+from django.template.response import TemplateResponse
 from django.utils.html import format_html
-from django.urls import reverse
+from django.urls import path, reverse
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import require_GET, require_POST
 from django.utils.safestring import mark_safe
-from .models import BlogPost, Author, Tag, Comment
+from .models import BlogPost, Author, Tag, Comment, BulkJob
+from . import jobs, revisions
+from .admin_utils import AutocompleteFilter, LargeTableAdminMixin
+
+
+def run_bulk_action(modeladmin, request, queryset, action):
+    """
+    Apply a bulk action, or queue it when the selection is large.
+    Returns the number of changed rows, or None when a job was queued.
+    """
+    count, job = jobs.submit(action, queryset, request.user)
+    if job is not None:
+        url = reverse('admin:api_bulkjob_change', args=[job.pk])
+        modeladmin.message_user(
+            request,
+            format_html('The selection is large, so it is being processed in the background. <a href="{}">Follow its progress</a>.', url),
+            level='info'
+        )
+    return count
 
 
 @admin.register(Author)
@@ -67,23 +97,34 @@ class TagAdmin(admin.ModelAdmin):
 
 
 class CommentInline(admin.TabularInline):
-    """Inline comments for blog posts"""
+    """
+    Comments of a post, newest first. Pages of ADMIN_INLINE_COMMENTS_PAGE_SIZE
+    rows are fetched from BlogPostAdmin.comments_page as the editor asks for
+    them, so the change form does not load or submit any comments.
+    """
     model = Comment
+    template = 'admin/api/blogpost/comment_inline.html'
     extra = 0
-    readonly_fields = ['name', 'email', 'content', 'created_at', 'is_approved']
+    max_num = 0
     fields = ['name', 'email', 'content', 'is_approved', 'created_at']
+    readonly_fields = fields
     can_delete = False
-    show_change_link = True
+
+    class Media:
+        js = ['api/admin/comment_inline.js']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).none()
 
     def has_add_permission(self, request, obj=None):
         return False
 
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     """Admin interface for Comment model"""
     list_display = ['name', 'email', 'blog_post_link', 'content_preview', 'is_approved_badge', 'created_at']
-    list_filter = ['is_approved', 'created_at', 'blog_post']
+    list_filter = ['is_approved', 'created_at', ('blog_post', AutocompleteFilter)]
     search_fields = ['name', 'email', 'content', 'blog_post__title']
     readonly_fields = ['id', 'created_at', 'updated_at']
     list_per_page = 50
@@ -134,19 +175,21 @@ class CommentAdmin(admin.ModelAdmin):
 
     def approve_comments(self, request, queryset):
         """Approve selected comments"""
-        count = queryset.update(is_approved=True)
-        self.message_user(request, f'Successfully approved {count} comment{"" if count == 1 else "s"}.', level='success')
+        count = run_bulk_action(self, request, queryset, 'approve_comments')
+        if count is not None:
+            self.message_user(request, f'Successfully approved {count} comment{"" if count == 1 else "s"}.', level='success')
     approve_comments.short_description = '✓ Approve selected comments'
 
     def disapprove_comments(self, request, queryset):
         """Disapprove selected comments"""
-        count = queryset.update(is_approved=False)
-        self.message_user(request, f'Successfully disapproved {count} comment{"" if count == 1 else "s"}.', level='warning')
+        count = run_bulk_action(self, request, queryset, 'disapprove_comments')
+        if count is not None:
+            self.message_user(request, f'Successfully disapproved {count} comment{"" if count == 1 else "s"}.', level='warning')
     disapprove_comments.short_description = '✗ Disapprove selected comments'
 
 
 @admin.register(BlogPost)
-class BlogPostAdmin(admin.ModelAdmin):
+class BlogPostAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     """Admin interface for BlogPost model"""
     list_display = [
         'title_preview',
@@ -164,8 +207,8 @@ class BlogPostAdmin(admin.ModelAdmin):
         'category',
         'featured',
         'comments_enabled',
-        'author',
-        'tags',
+        ('author', AutocompleteFilter),
+        ('tags', AutocompleteFilter),
         'created_at',
         'published_at',
     ]
@@ -184,6 +227,10 @@ class BlogPostAdmin(admin.ModelAdmin):
         'updated_at',
         'comments_count',
         'featured_image_preview',
+        'excerpt',
+        'word_count',
+        'read_time',
+        'revision_history',
     ]
     filter_horizontal = ['tags']
     autocomplete_fields = ['author']
@@ -211,11 +258,11 @@ class BlogPostAdmin(admin.ModelAdmin):
             'description': 'Control the visibility and features of your blog post.'
         }),
         ('Statistics', {
-            'fields': ('comments_count',),
+            'fields': ('comments_count', 'word_count', 'read_time', 'excerpt'),
             'classes': ('collapse',)
         }),
         ('Metadata', {
-            'fields': ('created_by', 'updated_by', 'created_at', 'updated_at'),
+            'fields': ('created_by', 'updated_by', 'created_at', 'updated_at', 'revision_history'),
             'classes': ('collapse',)
         }),
     )
@@ -296,31 +343,216 @@ class BlogPostAdmin(admin.ModelAdmin):
 
     def make_published(self, request, queryset):
         """Mark selected posts as published"""
-        count = queryset.update(status='published')
-        self.message_user(request, f'Successfully published {count} post{"" if count == 1 else "s"}.', level='success')
+        count = run_bulk_action(self, request, queryset, 'make_published')
+        if count is not None:
+            self.message_user(request, f'Successfully published {count} post{"" if count == 1 else "s"}.', level='success')
     make_published.short_description = '📝 Mark as published'
 
     def make_draft(self, request, queryset):
         """Mark selected posts as draft"""
-        count = queryset.update(status='draft')
-        self.message_user(request, f'Successfully marked {count} post{"" if count == 1 else "s"} as draft.', level='info')
+        count = run_bulk_action(self, request, queryset, 'make_draft')
+        if count is not None:
+            self.message_user(request, f'Successfully marked {count} post{"" if count == 1 else "s"} as draft.', level='info')
     make_draft.short_description = '📄 Mark as draft'
 
     def make_featured(self, request, queryset):
         """Mark selected posts as featured"""
-        count = queryset.update(featured=True)
-        self.message_user(request, f'Successfully featured {count} post{"" if count == 1 else "s"}.', level='success')
+        count = run_bulk_action(self, request, queryset, 'make_featured')
+        if count is not None:
+            self.message_user(request, f'Successfully featured {count} post{"" if count == 1 else "s"}.', level='success')
     make_featured.short_description = '⭐ Mark as featured'
 
     def unfeature(self, request, queryset):
         """Unfeature selected posts"""
-        count = queryset.update(featured=False)
-        self.message_user(request, f'Successfully unfeatured {count} post{"" if count == 1 else "s"}.', level='info')
+        count = run_bulk_action(self, request, queryset, 'unfeature')
+        if count is not None:
+            self.message_user(request, f'Successfully unfeatured {count} post{"" if count == 1 else "s"}.', level='info')
     unfeature.short_description = 'Remove featured status'
 
+    def get_urls(self):
+        return [
+            path(
+                '<path:object_id>/comments/',
+                self.admin_site.admin_view(self.comments_page),
+                name='api_blogpost_comments',
+            ),
+            path(
+                '<path:object_id>/comments/<uuid:comment_id>/moderate/',
+                self.admin_site.admin_view(self.moderate_comment),
+                name='api_blogpost_moderate_comment',
+            ),
+            path(
+                '<path:object_id>/revisions/',
+                self.admin_site.admin_view(self.revision_list),
+                name='api_blogpost_revisions',
+            ),
+            path(
+                '<path:object_id>/revisions/<int:number>/',
+                self.admin_site.admin_view(self.revision_diff),
+                name='api_blogpost_revision_diff',
+            ),
+        ] + super().get_urls()
+
+    def revision_history(self, obj):
+        """Link to the revision history of the post"""
+        if not obj.pk:
+            return '-'
+        count = obj.revisions.count()
+        url = reverse('admin:api_blogpost_revisions', args=[obj.pk])
+        return format_html('<a href="{}">{} revision{}</a>', url, count, '' if count == 1 else 's')
+    revision_history.short_description = 'Revisions'
+
+    def _post_or_404(self, request, object_id):
+        post = self.get_object(request, object_id)
+        if post is None or not self.has_view_or_change_permission(request, post):
+            raise Http404
+        return post
+
+    def _revision_context(self, request, post, title):
+        return {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'original': post,
+            'title': title,
+        }
+
+    def revision_list(self, request, object_id):
+        """Revisions of a post, newest first"""
+        post = self._post_or_404(request, object_id)
+        revision_rows = (
+            post.revisions.defer('data')
+            .annotate(size=Length('data'))
+            .select_related('created_by')
+            .order_by('-number')
+        )
+        context = self._revision_context(request, post, f'Revisions of "{post}"')
+        context['revisions'] = revision_rows
+        return TemplateResponse(request, 'admin/api/blogpost/revision_list.html', context)
+
+    def revision_diff(self, request, object_id, number):
+        """Field-by-field diff between a revision and the previous one (or ?against=<number>)"""
+        post = self._post_or_404(request, object_id)
+        if not post.revisions.filter(number=number).exists():
+            raise Http404
+        try:
+            against = int(request.GET.get('against', number - 1))
+        except ValueError:
+            against = number - 1
+        new = revisions.rebuild(post.pk, number)
+        old = revisions.rebuild(post.pk, against) if post.revisions.filter(number=against).exists() else {}
+        context = self._revision_context(request, post, f'Revision {number} of "{post}"')
+        context.update({
+            'number': number,
+            'against': against if old else None,
+            'changes': revisions.html_diff(old, new, f'Revision {against}' if old else '', f'Revision {number}'),
+        })
+        return TemplateResponse(request, 'admin/api/blogpost/revision_diff.html', context)
+
+    def _comment_admin(self, request, permission):
+        comment_admin = self.admin_site._registry[Comment]
+        if not getattr(comment_admin, f'has_{permission}_permission')(request):
+            raise PermissionDenied
+        return comment_admin
+
+    def _render_comment_rows(self, request, comments):
+        comment_admin = self.admin_site._registry[Comment]
+        return render_to_string('admin/api/blogpost/comment_rows.html', {
+            'comments': comments,
+            'can_change': comment_admin.has_change_permission(request),
+            'can_delete': comment_admin.has_delete_permission(request),
+        }, request=request)
+
+    @method_decorator(require_GET)
+    def comments_page(self, request, object_id):
+        """One page of a post's comments, newest first, as table rows for the inline"""
+        self._comment_admin(request, 'view')
+        post = self.get_object(request, object_id)
+        if post is None:
+            raise Http404
+        comments = post.comments.order_by('-created_at', '-id')
+        before = request.GET.get('before')
+        if before:
+            try:
+                before = uuid.UUID(before)
+            except ValueError:
+                return JsonResponse({'error': 'Invalid cursor.'}, status=400)
+            cursor = get_object_or_404(Comment, pk=before, blog_post=post)
+            comments = comments.filter(
+                Q(created_at__lt=cursor.created_at) | Q(created_at=cursor.created_at, id__lt=cursor.id)
+            )
+        page_size = settings.ADMIN_INLINE_COMMENTS_PAGE_SIZE
+        page = list(comments[:page_size + 1])
+        has_more = len(page) > page_size
+        page = page[:page_size]
+        return JsonResponse({
+            'html': self._render_comment_rows(request, page),
+            'next': str(page[-1].pk) if has_more else None,
+        })
+
+    @method_decorator(require_POST)
+    def moderate_comment(self, request, object_id, comment_id):
+        """Approve, disapprove or delete a single comment from the inline"""
+        action = request.POST.get('action')
+        if action not in ('approve', 'disapprove', 'delete'):
+            return JsonResponse({'error': 'Unknown action.'}, status=400)
+        self._comment_admin(request, 'delete' if action == 'delete' else 'change')
+        comment = get_object_or_404(Comment, pk=comment_id, blog_post_id=object_id)
+        if action == 'delete':
+            comment.delete()
+            return JsonResponse({'deleted': True})
+        jobs.set_comment_approval([comment.pk], action == 'approve')
+        comment.refresh_from_db()
+        return JsonResponse({'html': self._render_comment_rows(request, [comment])})
+
     def save_model(self, request, obj, form, change):
         """Set created_by and updated_by automatically"""
         if not change:  # Creating new object
             obj.created_by = request.user
+        else:
+            obj._revision_base = revisions.stored_state(obj.pk)
         obj.updated_by = request.user
         super().save_model(request, obj, form, change)
+
+    def save_related(self, request, form, formsets, change):
+        """Record a revision once tags are saved too"""
+        super().save_related(request, form, formsets, change)
+        revisions.record(form.instance, request.user, getattr(form.instance, '_revision_base', None))
+
+
+@admin.register(BulkJob)
+class BulkJobAdmin(admin.ModelAdmin):
+    """Progress of bulk actions running in the background"""
+    list_display = ['action', 'status', 'progress', 'created_by', 'created_at', 'finished_at']
+    list_filter = ['status', 'action']
+    readonly_fields = ['action', 'status', 'progress', 'processed', 'total', 'last_pk', 'error',
+                       'created_by', 'created_at', 'started_at', 'heartbeat_at', 'finished_at']
+    fields = readonly_fields
+    list_per_page = 25
+    actions = ['requeue_jobs']
+    change_form_template = 'admin/api/bulkjob/change_form.html'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        # Jobs are read-only; their view page shows the progress
+        return False
+
+    def progress(self, obj):
+        """Display a progress bar"""
+        if not obj.total:
+            return f'{obj.processed} rows' if obj.status != 'queued' else 'Waiting for a worker'
+        percent = min(100, round(obj.processed * 100 / obj.total))
+        return format_html(
+            '<div style="width: 200px; background-color: #e9ecef; border-radius: 3px;">'
+            '<div style="width: {}%; background-color: #28a745; color: white; padding: 2px 0; border-radius: 3px; font-size: 11px; text-align: center;">{}%</div>'
+            '</div> {} / {}',
+            percent, percent, obj.processed, obj.total
+        )
+    progress.short_description = 'Progress'
+
+    def requeue_jobs(self, request, queryset):
+        """Queue failed jobs again; they resume after the last committed chunk"""
+        count = queryset.filter(status='failed').update(status='queued')
+        self.message_user(request, f'Queued {count} job{"" if count == 1 else "s"} again.', level='info')
+    requeue_jobs.short_description = 'Retry failed jobs'
@@ -0,0 +1,243 @@
+"""
+Admission control for database-heavy requests.
+
+Requests are classified into pools (ADMISSION_POOLS): admin pages, image
+uploads, writes, post search, comment lists and other API reads. Upload
+chunks stream large bodies from slow clients, so they get a pool of their
+own instead of holding the slots of comment posting and other writes. Each pool admits a limited
+number of concurrent requests per worker, and all pools together at most
+ADMISSION_MAX_CONCURRENCY. A request over the limit waits in a bounded
+queue for up to the pool's `wait` seconds; when the queue is full or the
+wait runs out it gets `503 Service Unavailable` with `Retry-After` right
+away instead of piling onto the database.
+
+Pools with a lower `priority` number (admin and writes) go first: while one
+of their requests is waiting, requests of other pools are not admitted.
+Keeping the read pools' limits below the total reserves headroom for them.
+
+Admitted requests run their queries with the pool's statement timeout
+(PostgreSQL only); a query cancelled by it is also answered with a 503.
+
+Limits are per worker process; with N workers the database sees up to
+N x ADMISSION_MAX_CONCURRENCY connections. Shed and queued requests are
+counted in the default cache (`stats()`, GET /api/admission/), which adds up
+all workers only when CACHE_URL points them at a shared one.
+"""
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.http import JsonResponse
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+COMMENT_LIST_RE = re.compile(r'^/api/posts/[^/]+/comments/list/$')
+EVENTS = ('queued', 'shed', 'timed_out')
+# PostgreSQL SQLSTATE of a query cancelled by statement_timeout
+QUERY_CANCELED = '57014'
+
+
+def classify(request):
+    """Name of the pool a request belongs to, or None when it is not limited"""
+    path = request.path
+    if path.startswith('/admin/'):
+        return 'admin'
+    if not path.startswith('/api/'):
+        return None
+    if path.startswith('/api/uploads/'):
+        return 'uploads'
+    if request.method not in SAFE_METHODS:
+        return 'write'
+    if COMMENT_LIST_RE.match(path):
+        return 'comments'
+    if path.startswith('/api/posts/') and request.GET.get('search'):
+        return 'search'
+    return 'read'
+
+
+class Pool:
+    def __init__(self, name, concurrency, queue, wait, priority=1, statement_timeout=None):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue = queue
+        self.wait = wait
+        self.priority = priority
+        self.statement_timeout = statement_timeout
+        self.active = 0
+        self.waiting = 0
+
+
+class Gate:
+    """Per-process concurrency limits with bounded, prioritised wait queues"""
+
+    def __init__(self, pools, max_concurrency):
+        self.pools = {name: Pool(name, **options) for name, options in pools.items()}
+        self.max_concurrency = max_concurrency
+        self.active = 0
+        self._condition = threading.Condition()
+
+    def _can_enter(self, pool):
+        if pool.active >= pool.concurrency or self.active >= self.max_concurrency:
+            return False
+        # Leave the next free slot to waiting requests of a more important pool
+        return not any(
+            other.waiting and other.priority < pool.priority and other.active < other.concurrency
+            for other in self.pools.values()
+        )
+
+    def acquire(self, pool):
+        """Admit a request to `pool`; returns (admitted, queued)"""
+        with self._condition:
+            if not self._can_enter(pool):
+                if pool.waiting >= pool.queue:
+                    return False, False
+                deadline = time.monotonic() + pool.wait
+                pool.waiting += 1
+                try:
+                    while not self._can_enter(pool):
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            return False, True
+                        self._condition.wait(remaining)
+                finally:
+                    pool.waiting -= 1
+                queued = True
+            else:
+                queued = False
+            pool.active += 1
+            self.active += 1
+            return True, queued
+
+    def release(self, pool):
+        with self._condition:
+            pool.active -= 1
+            self.active -= 1
+            self._condition.notify_all()
+
+    def snapshot(self):
+        with self._condition:
+            return {
+                name: {'active': pool.active, 'waiting': pool.waiting, 'concurrency': pool.concurrency, 'queue': pool.queue}
+                for name, pool in self.pools.items()
+            }
+
+
+def _counter_key(pool_name, event):
+    return f'api:admission:{pool_name}:{event}'
+
+
+def count(pool_name, event):
+    """Add one to an event counter; admitted requests are not counted, so they cost no cache round trip"""
+    key = _counter_key(pool_name, event)
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
+
+
+_gate = None
+_gate_lock = threading.Lock()
+
+
+def get_gate():
+    global _gate
+    if _gate is None:
+        with _gate_lock:
+            if _gate is None:
+                _gate = Gate(settings.ADMISSION_POOLS, settings.ADMISSION_MAX_CONCURRENCY)
+    return _gate
+
+
+def stats():
+    """
+    Event counters per pool, plus this worker's current load. The counters
+    cover every worker sharing the cache, i.e. only this process when the
+    cache is local memory.
+    """
+    gate = get_gate()
+    keys = [_counter_key(name, event) for name in gate.pools for event in EVENTS]
+    counters = cache.get_many(keys)
+    workers = gate.snapshot()
+    return {
+        name: dict(
+            workers[name],
+            **{event: counters.get(_counter_key(name, event), 0) for event in EVENTS},
+        )
+        for name in gate.pools
+    }
+
+
+class StatementTimeout:
+    """
+    Execute wrapper that sets statement_timeout before the first query of
+    a request, so requests answered from the cache never touch the database.
+    """
+
+    def __init__(self, milliseconds):
+        self.milliseconds = milliseconds
+        self.applied = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if not self.applied:
+            context['cursor'].cursor.execute('SET statement_timeout = %s', [self.milliseconds])
+            self.applied = True
+        return execute(sql, params, many, context)
+
+    def reset(self):
+        if self.applied and connection.connection is not None:
+            try:
+                with connection.connection.cursor() as cursor:
+                    cursor.execute('RESET statement_timeout')
+            except Exception:
+                # The connection is broken; Django discards it at the end of the request
+                pass
+
+
+def _overloaded(pool_name):
+    response = JsonResponse({'error': 'Server is busy, please retry shortly.'}, status=503)
+    response['Retry-After'] = str(settings.ADMISSION_RETRY_AFTER)
+    response['X-Admission-Pool'] = pool_name
+    return response
+
+
+def _is_statement_timeout(exc):
+    return isinstance(exc, OperationalError) and getattr(exc.__cause__, 'pgcode', None) == QUERY_CANCELED
+
+
+class AdmissionControlMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        pool_name = classify(request) if settings.ADMISSION_CONTROL else None
+        if pool_name is None:
+            return self.get_response(request)
+        gate = get_gate()
+        pool = gate.pools[pool_name]
+        admitted, queued = gate.acquire(pool)
+        if queued:
+            count(pool_name, 'queued')
+        if not admitted:
+            count(pool_name, 'shed')
+            return _overloaded(pool_name)
+        try:
+            if pool.statement_timeout and connection.vendor == 'postgresql':
+                timeout = StatementTimeout(pool.statement_timeout)
+                with connection.execute_wrapper(timeout):
+                    try:
+                        return self.get_response(request)
+                    finally:
+                        timeout.reset()
+            return self.get_response(request)
+        finally:
+            gate.release(pool)
+
+    def process_exception(self, request, exception):
+        if _is_statement_timeout(exception):
+            pool_name = classify(request)
+            count(pool_name, 'timed_out')
+            return _overloaded(pool_name)
+        return None
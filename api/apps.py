@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from django.core.signals import request_started
+        from . import checks, signals  # noqa: F401
+        from . import autocomplete, slugs
+
+        request_started.connect(slugs.warm_on_first_request)
+        request_started.connect(autocomplete.warm_on_first_request)
@@ -0,0 +1,173 @@
+"""
+Typeahead suggestions for post titles, tag names and author names.
+
+Suggestions come from per-worker prefix indexes: sorted lists of
+(key, entry id) pairs with one key per word of every label, so a lookup is
+a binary search followed by a short scan. Labels are normalised
+(case-folded, accents stripped).
+
+Content changes bump a shared cache generation. A worker that sees a new
+generation refreshes: posts changed since its last sync (by `updated_at`,
+plus change-feed tombstones for removals) are re-indexed in place, while
+the tag and author index, built from two small tables, is rebuilt.
+
+Suggestions are ranked by where the prefix matched (start of the label
+first), then weight: total views for posts and published post counts for
+tags and authors.
+"""
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.signals import request_started
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from . import caching
+from .models import Author, BlogPost, PostTombstone, Tag
+
+AUTOCOMPLETE_NAMESPACE = 'autocomplete'
+
+# Rows changed this long before the last sync are re-read, covering commits that landed late
+SYNC_OVERLAP = timedelta(seconds=60)
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', text or '')
+    return ' '.join(''.join(char for char in text if not unicodedata.combining(char)).casefold().split())
+
+
+class PrefixIndex:
+    """Sorted prefix index over suggestion labels"""
+
+    def __init__(self):
+        self.keys = []      # sorted [(key, entry id)]
+        self.entries = {}   # entry id -> (suggestion, weight, keys)
+
+    @staticmethod
+    def label_keys(label):
+        """The normalised label from each word onwards, the whole label first"""
+        words = normalize(label).split()
+        return [' '.join(words[index:]) for index in range(len(words))]
+
+    def replace_all(self, items):
+        """Rebuild from [(entry id, suggestion, weight)] with a single sort"""
+        self.entries = {}
+        self.keys = []
+        for entry_id, suggestion, weight in items:
+            keys = self.label_keys(suggestion['label'])
+            self.entries[entry_id] = (suggestion, weight, keys)
+            self.keys.extend((key, entry_id) for key in set(keys))
+        self.keys.sort()
+
+    def add(self, entry_id, suggestion, weight):
+        self.remove(entry_id)
+        keys = self.label_keys(suggestion['label'])
+        for key in set(keys):
+            insort(self.keys, (key, entry_id))
+        self.entries[entry_id] = (suggestion, weight, keys)
+
+    def remove(self, entry_id):
+        entry = self.entries.pop(entry_id, None)
+        if entry is None:
+            return
+        for key in set(entry[2]):
+            index = bisect_left(self.keys, (key, entry_id))
+            if index < len(self.keys) and self.keys[index] == (key, entry_id):
+                del self.keys[index]
+
+    def search(self, prefix, scan_limit):
+        """{entry id: (matched at label start, weight, suggestion)} for keys starting with `prefix`"""
+        matches = {}
+        index = bisect_left(self.keys, (prefix, ''))
+        while index < len(self.keys) and len(matches) < scan_limit:
+            key, entry_id = self.keys[index]
+            if not key.startswith(prefix):
+                break
+            suggestion, weight, keys = self.entries[entry_id]
+            label_start = key == keys[0]
+            if entry_id not in matches or label_start:
+                matches[entry_id] = (label_start, weight, suggestion)
+            index += 1
+        return matches
+
+
+_lock = threading.Lock()
+_posts = PrefixIndex()
+_names = PrefixIndex()
+_generation = None
+_synced_at = None
+
+
+def _post_items(queryset):
+    rows = queryset.order_by().values_list('id', 'title', 'slug', 'status', 'popularity__total_views')
+    for post_id, title, slug, status, views in rows:
+        suggestion = {'type': 'post', 'id': str(post_id), 'label': title, 'slug': slug}
+        yield f'post:{post_id}', suggestion if status == 'published' else None, views or 0
+
+
+def _name_items():
+    published = Q(blog_posts__status='published')
+    tags = Tag.objects.annotate(count=Count('blog_posts', filter=published)).values_list('id', 'name', 'slug', 'count')
+    for tag_id, name, slug, count in tags:
+        yield f'tag:{tag_id}', {'type': 'tag', 'id': str(tag_id), 'label': name, 'slug': slug}, count
+    authors = Author.objects.annotate(count=Count('blog_posts', filter=published)).values_list('id', 'name', 'count')
+    for author_id, name, count in authors:
+        yield f'author:{author_id}', {'type': 'author', 'id': str(author_id), 'label': name}, count
+
+
+def _sync():
+    """Bring the local indexes up to date with the shared generation"""
+    global _generation, _synced_at
+    generation = caching.get_generation(AUTOCOMPLETE_NAMESPACE)
+    if generation == _generation:
+        return
+    with _lock:
+        if generation == _generation:
+            return
+        started_at = timezone.now()
+        if _synced_at is None:
+            _posts.replace_all(item for item in _post_items(BlogPost.objects.filter(status='published')) if item[1])
+        else:
+            since = _synced_at - SYNC_OVERLAP
+            for post_id in PostTombstone.objects.filter(created_at__gte=since).values_list('post_id', flat=True):
+                _posts.remove(f'post:{post_id}')
+            for entry_id, suggestion, weight in _post_items(BlogPost.objects.filter(updated_at__gte=since)):
+                if suggestion:
+                    _posts.add(entry_id, suggestion, weight)
+                else:
+                    _posts.remove(entry_id)
+        _names.replace_all(_name_items())
+        _generation, _synced_at = generation, started_at
+
+
+def suggest(query, limit):
+    """Up to `limit` suggestions for a prefix, best first"""
+    prefix = normalize(query)
+    if not prefix:
+        return []
+    _sync()
+    scan_limit = settings.AUTOCOMPLETE_SCAN_LIMIT
+    with _lock:
+        matches = list(_posts.search(prefix, scan_limit).values()) + list(_names.search(prefix, scan_limit).values())
+    matches.sort(key=lambda match: (not match[0], -match[1], len(match[2]['label'])))
+    return [suggestion for _, _, suggestion in matches[:limit]]
+
+
+def warm():
+    """Build the indexes"""
+    _sync()
+    return len(_posts.entries) + len(_names.entries)
+
+
+def warm_on_first_request(sender, **kwargs):
+    """request_started receiver that builds the indexes once per worker"""
+    request_started.disconnect(warm_on_first_request)
+    warm()
+
+
+def invalidate():
+    """Tell every worker that suggestions changed"""
+    caching.bump_generation(AUTOCOMPLETE_NAMESPACE)
@@ -0,0 +1,210 @@
+"""
+Generation-based cache namespaces.
+
+Cached values are stored under keys that embed the current generation of
+their namespace, so a whole namespace is invalidated by bumping one counter
+instead of tracking and deleting individual keys.
+
+Misses of hot keys are computed once (`single_flight`): threads of a worker
+wait for the one computing the value, and other workers wait on a lock key
+in the shared cache and then read the value it stored. Entries served with
+`get_stale_while_revalidate` outlive their freshness, so once they expire
+(or their namespace is bumped) one request recomputes them while the others
+keep getting the previous value.
+
+All of this relies on the default cache being shared by the workers
+(CACHE_URL). With the local-memory cache, generations, locks and deletes
+only reach the process that made them; `is_shared()` tells the two apart.
+"""
+import hashlib
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+# Namespace for anything derived from the set of posts (filters, counts, lists)
+POSTS_NAMESPACE = 'posts'
+
+
+def is_shared():
+    """False when the default cache lives inside each worker process"""
+    return not isinstance(caches['default'], (LocMemCache, DummyCache))
+
+
+def _generation_key(namespace):
+    return f'api:generation:{namespace}'
+
+
+def _initial_generation():
+    # Time based, so an evicted counter never restarts at a value still used by cached entries
+    return int(time.time() * 1000)
+
+
+def get_generation(namespace):
+    key = _generation_key(namespace)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, _initial_generation(), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(namespace):
+    """Invalidate every key of a namespace"""
+    key = _generation_key(namespace)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _initial_generation(), timeout=None)
+
+
+def make_key(namespace, *parts):
+    """Cache key for the current generation of a namespace"""
+    digest = hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    return f'api:{namespace}:{get_generation(namespace)}:{digest}'
+
+
+# Single-flight computation of misses
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.failed = False
+
+
+def _lock_key(key):
+    return f'{key}:lock'
+
+
+def _release(lock_key, token):
+    # Not atomic, but a lock that expired and was taken over is rarely released early
+    if cache.get(lock_key) == token:
+        cache.delete(lock_key)
+
+
+def _compute_locked(key, compute, timeout):
+    """Compute and cache `key` while holding its lock in the shared cache, or reuse what its holder stored"""
+    lock_key = _lock_key(key)
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + settings.SINGLE_FLIGHT_WAIT
+    delay = 0.01
+    while not cache.add(lock_key, token, settings.SINGLE_FLIGHT_LOCK_TIMEOUT):
+        if time.monotonic() >= deadline:
+            # The holder is too slow or gone; compute without the lock
+            token = None
+            break
+        time.sleep(delay)
+        delay = min(delay * 2, 0.1)
+        value = cache.get(key)
+        if value is not None:
+            return value
+    try:
+        value = cache.get(key) if token else None
+        if value is None:
+            value = compute()
+            if value is not None:
+                cache.set(key, value, timeout)
+        return value
+    finally:
+        if token:
+            _release(lock_key, token)
+
+
+def single_flight(key, compute, timeout):
+    """
+    Compute and cache the value of `key` after a cache miss, once for all
+    concurrent requests missing the same key. Returns the value; None (e.g.
+    for a missing object) is returned but not cached. Waiters give up after
+    SINGLE_FLIGHT_WAIT seconds, or when the computation fails, and compute the
+    value themselves.
+    """
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+    if not leader:
+        if flight.done.wait(settings.SINGLE_FLIGHT_WAIT) and not flight.failed:
+            return flight.value
+        return compute()
+    try:
+        flight.value = _compute_locked(key, compute, timeout)
+        return flight.value
+    except BaseException:
+        flight.failed = True
+        raise
+    finally:
+        with _flights_lock:
+            _flights.pop(key, None)
+        flight.done.set()
+
+
+def get_stale_while_revalidate(namespace, parts, compute, fresh_timeout, stale_timeout):
+    """
+    Cached value of `compute()` for `parts` of a namespace, fresh for
+    `fresh_timeout` seconds and served stale for up to `stale_timeout` more.
+    A bump of the namespace makes the entry stale rather than missing, so
+    invalidation does not send every request to the database at once.
+    """
+    digest = hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    key = f'api:{namespace}:swr:{digest}'
+    generation = get_generation(namespace)
+
+    def build():
+        return generation, time.time() + fresh_timeout, compute()
+
+    entry = cache.get(key)
+    if entry is None:
+        return single_flight(key, build, fresh_timeout + stale_timeout)[2]
+    entry_generation, fresh_until, value = entry
+    if entry_generation == generation and fresh_until > time.time():
+        return value
+    # Stale: one request refreshes it, the others keep the stale value meanwhile
+    lock_key = _lock_key(key)
+    token = uuid.uuid4().hex
+    if not cache.add(lock_key, token, settings.SINGLE_FLIGHT_LOCK_TIMEOUT):
+        return value
+    try:
+        entry = build()
+        cache.set(key, entry, fresh_timeout + stale_timeout)
+    finally:
+        _release(lock_key, token)
+    return entry[2]
+
+
+# Serialized post detail payloads, shared by retrieve and the batch endpoint
+
+def _detail_key(post_id):
+    return f'api:post-detail:{post_id}'
+
+
+def get_post_details(post_ids):
+    """Return {post_id (str): data} for the cached posts among `post_ids`"""
+    keys = {_detail_key(post_id): str(post_id) for post_id in post_ids}
+    return {keys[key]: data for key, data in cache.get_many(list(keys)).items()}
+
+
+def set_post_details(details):
+    """Cache serialized posts given as {post_id: data}"""
+    cache.set_many(
+        {_detail_key(post_id): data for post_id, data in details.items()},
+        settings.POST_DETAIL_CACHE_TIMEOUT,
+    )
+
+
+def coalesce_post_detail(post_id, compute):
+    """Serialize a missing post once for all concurrent requests; `compute` returns its data or None"""
+    return single_flight(_detail_key(post_id), compute, settings.POST_DETAIL_CACHE_TIMEOUT)
+
+
+def invalidate_post_details(post_ids):
+    cache.delete_many([_detail_key(post_id) for post_id in post_ids])
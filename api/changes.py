@@ -0,0 +1,102 @@
+"""
+Incremental change feed for client sync.
+
+The feed has two streams, each with its own cursor packed into one opaque
+token:
+
+- changes: published posts ordered by (updated_at, id)
+- tombstones: PostTombstone rows (deleted or unpublished posts) ordered by id
+
+Rows younger than CHANGE_FEED_SETTLE_SECONDS are held back so that
+transactions committing slightly out of order are not skipped by a cursor
+that already moved past them.
+"""
+import base64
+import json
+import uuid
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import BlogPost, PostTombstone
+
+
+class InvalidToken(ValueError):
+    pass
+
+
+def encode_token(updated_at, post_id, tombstone_id):
+    payload = [updated_at.isoformat() if updated_at else None, str(post_id) if post_id else None, tombstone_id]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_token(token):
+    """Return (updated_at, post_id, tombstone_id); an empty token starts from the beginning"""
+    if not token:
+        return None, None, 0
+    invalid = InvalidToken('Invalid sync token.')
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        updated_at, post_id, tombstone_id = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        raise invalid
+    # The posts cursor is either unset or a complete (updated_at, id) position
+    if not (isinstance(updated_at, str) and isinstance(post_id, str) or updated_at is None and post_id is None):
+        raise invalid
+    if type(tombstone_id) is not int or tombstone_id < 0:
+        raise invalid
+    if updated_at is not None:
+        try:
+            updated_at, post_id = datetime.fromisoformat(updated_at), uuid.UUID(post_id)
+        except ValueError:
+            raise invalid
+        if updated_at.tzinfo is None:
+            raise invalid
+    return updated_at, post_id, tombstone_id
+
+
+def record_tombstones(post_ids, reason):
+    PostTombstone.objects.bulk_create([PostTombstone(post_id=post_id, reason=reason) for post_id in post_ids])
+
+
+def get_changes(token, limit):
+    """
+    Return (posts, tombstones, next_token, has_more) for changes after `token`.
+    `posts` is a list of BlogPost, `tombstones` a list of PostTombstone.
+    """
+    updated_at, post_id, tombstone_id = decode_token(token)
+    settled = timezone.now() - timedelta(seconds=settings.CHANGE_FEED_SETTLE_SECONDS)
+
+    posts = BlogPost.objects.filter(status='published', updated_at__lte=settled)
+    if updated_at is not None:
+        posts = posts.filter(Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=post_id))
+    posts = list(
+        posts.select_related('author').prefetch_related('tags').order_by('updated_at', 'id')[:limit + 1]
+    )
+    tombstones = list(
+        PostTombstone.objects.filter(id__gt=tombstone_id, created_at__lte=settled).order_by('id')[:limit + 1]
+    )
+    has_more = len(posts) > limit or len(tombstones) > limit
+    posts, tombstones = posts[:limit], tombstones[:limit]
+
+    if posts:
+        updated_at, post_id = posts[-1].updated_at, posts[-1].id
+    if tombstones:
+        tombstone_id = tombstones[-1].id
+    return posts, _drop_superseded(tombstones), encode_token(updated_at, post_id, tombstone_id), has_more
+
+
+def _drop_superseded(tombstones):
+    """Skip tombstones of posts that have been published again since"""
+    if not tombstones:
+        return tombstones
+    republished = dict(
+        BlogPost.objects.filter(pk__in={t.post_id for t in tombstones}, status='published')
+        .values_list('pk', 'updated_at')
+    )
+    return [
+        t for t in tombstones
+        if t.post_id not in republished or republished[t.post_id] < t.created_at
+    ]
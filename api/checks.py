@@ -0,0 +1,18 @@
+from django.core.checks import Tags, Warning, register
+
+from . import caching
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """Workers coordinate through the default cache, which must be shared in production"""
+    if caching.is_shared():
+        return []
+    return [
+        Warning(
+            'The default cache is local to each process, so cache invalidation, single-flight '
+            'locks and admission counters do not reach other workers.',
+            hint='Set CACHE_URL to a Redis or Memcached server.',
+            id='api.W001',
+        )
+    ]
@@ -0,0 +1,77 @@
+"""
+Content processing for BlogPost.content.
+
+Content is stored as block JSON (Editor.js style):
+
+    {"blocks": [{"type": "paragraph", "data": {"text": "Hello <b>world</b>"}}, ...]}
+
+`extract_derived_fields` walks the blocks once and returns the plain text,
+word count, read time and excerpt stored on BlogPost.
+"""
+import html
+import re
+
+from django.conf import settings
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+
+# Keys of block data that never hold readable text
+NON_TEXT_KEYS = {'url', 'file', 'link', 'href', 'src', 'style', 'level', 'alignment', 'id', 'type', 'withBorder',
+                 'withBackground', 'stretched', 'withHeadings', 'embed', 'service', 'source', 'width', 'height'}
+
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+def iter_blocks(content):
+    """Yield the blocks of a content document, accepting {'blocks': [...]} or a bare list"""
+    if isinstance(content, dict):
+        blocks = content.get('blocks', [])
+    elif isinstance(content, list):
+        blocks = content
+    else:
+        blocks = []
+    for block in blocks if isinstance(blocks, list) else []:
+        if isinstance(block, dict):
+            yield block
+
+
+def clean_text(value):
+    """Strip inline HTML and normalise whitespace"""
+    return WHITESPACE_RE.sub(' ', html.unescape(strip_tags(value))).strip()
+
+
+def _collect_strings(value, out):
+    if isinstance(value, str):
+        out.append(value)
+    elif isinstance(value, list):
+        for item in value:
+            _collect_strings(item, out)
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            if key not in NON_TEXT_KEYS:
+                _collect_strings(item, out)
+
+
+def block_text(block):
+    """Readable text of a single block"""
+    data = block.get('data')
+    if isinstance(data, str):
+        return clean_text(data)
+    pieces = []
+    _collect_strings(data, pieces)
+    return ' '.join(filter(None, (clean_text(piece) for piece in pieces)))
+
+
+def extract_derived_fields(content):
+    """Return plain_text, word_count, read_time (minutes) and excerpt for a content document"""
+    texts = [text for text in (block_text(block) for block in iter_blocks(content)) if text]
+    plain_text = '\n'.join(texts)
+    word_count = len(plain_text.split())
+    read_time = -(-word_count // settings.READ_TIME_WORDS_PER_MINUTE) if word_count else 0
+    excerpt = Truncator(' '.join(texts)).chars(settings.EXCERPT_LENGTH)
+    return {
+        'plain_text': plain_text,
+        'word_count': word_count,
+        'read_time': read_time,
+        'excerpt': excerpt,
+    }
@@ -0,0 +1,118 @@
+"""
+Author and tag directories with published-post statistics.
+
+Pages are ordered by (name, id) and paginated with an opaque keyset
+cursor, so deep pages cost the same as the first. The counts and latest
+publication times for a page come from one grouped aggregate query over
+just the ids on that page. Pages are cached in the posts cache namespace,
+which is bumped whenever posts are published, unpublished or retagged and
+when authors or tags change.
+"""
+import base64
+import json
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max, Q
+from django.db.models.functions import Coalesce
+
+from . import caching
+from .models import Author, BlogPost, Tag
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(name, pk):
+    return base64.urlsafe_b64encode(json.dumps([name, str(pk)]).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (name, id) of the last row of the previous page"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        name, pk = json.loads(base64.urlsafe_b64decode(padded))
+        if not (isinstance(name, str) and isinstance(pk, str)):
+            raise InvalidCursor('Invalid cursor.')
+        return name, uuid.UUID(pk)
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor.')
+
+
+def author_stats(author_ids):
+    """{author_id: (published post count, latest publication time)}"""
+    rows = (
+        BlogPost.objects.filter(status='published', author_id__in=author_ids)
+        .values('author_id')
+        .annotate(count=Count('id'), latest=Max(Coalesce('published_at', 'created_at')))
+        .order_by()
+    )
+    return {row['author_id']: (row['count'], row['latest']) for row in rows}
+
+
+def tag_stats(tag_ids):
+    """{tag_id: (published post count, latest publication time)}"""
+    rows = (
+        BlogPost.tags.through.objects.filter(tag_id__in=tag_ids, blogpost__status='published')
+        .values('tag_id')
+        .annotate(
+            count=Count('blogpost_id'),
+            latest=Max(Coalesce('blogpost__published_at', 'blogpost__created_at')),
+        )
+        .order_by()
+    )
+    return {row['tag_id']: (row['count'], row['latest']) for row in rows}
+
+
+STATS = {Author: author_stats, Tag: tag_stats}
+
+
+def _with_stats(model, objects):
+    stats = STATS[model]([obj.pk for obj in objects])
+    for obj in objects:
+        obj.post_count, obj.latest_post_at = stats.get(obj.pk, (0, None))
+    return objects
+
+
+def _cached(key, compute):
+    data = cache.get(key)
+    if data is None:
+        data = caching.single_flight(key, compute, settings.DIRECTORY_CACHE_TIMEOUT)
+    return data
+
+
+def page(model, serializer_class, prefix='', cursor=None, limit=None):
+    """
+    Return (serialized rows, next cursor or None) for one page of authors or
+    tags whose name starts with `prefix` (case-insensitive).
+    """
+    after = decode_cursor(cursor) if cursor else None
+
+    def compute():
+        queryset = model.objects.all()
+        if prefix:
+            queryset = queryset.filter(name__istartswith=prefix)
+        if after is not None:
+            name, pk = after
+            queryset = queryset.filter(Q(name__gt=name) | Q(name=name, pk__gt=pk))
+        objects = list(queryset.order_by('name', 'pk')[:limit + 1])
+        more = len(objects) > limit
+        objects = _with_stats(model, objects[:limit])
+        next_cursor = encode_cursor(objects[-1].name, objects[-1].pk) if more else None
+        return serializer_class(objects, many=True).data, next_cursor
+
+    key = caching.make_key(caching.POSTS_NAMESPACE, 'directory', model._meta.model_name, prefix.lower(), cursor, limit)
+    return _cached(key, compute)
+
+
+def detail(model, serializer_class, **lookup):
+    """Serialized author or tag matching `lookup`, or None"""
+
+    def compute():
+        obj = model.objects.filter(**lookup).first()
+        return serializer_class(_with_stats(model, [obj])[0]).data if obj is not None else None
+
+    key = caching.make_key(caching.POSTS_NAMESPACE, 'directory', model._meta.model_name, sorted(lookup.items()))
+    return _cached(key, compute)
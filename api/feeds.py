@@ -0,0 +1,293 @@
+"""
+Precomputed RSS/Atom feeds and sharded sitemaps.
+
+Every feed scope (global, category, tag, author) and every sitemap shard is
+stored as a FeedArtifact row. When a post changes, only the artifacts whose
+scope contains the post are rebuilt; everything else is served as stored.
+
+Artifact keys:
+    rss:all / atom:all
+    rss:category:<category> / atom:category:<category>
+    rss:tag:<tag slug> / atom:tag:<tag slug>
+    rss:author:<author uuid> / atom:author:<author uuid>
+    sitemap:index
+    sitemap:<YYYY-MM>            (posts grouped by creation month)
+"""
+import hashlib
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.functions import Coalesce
+from django.utils import feedgenerator, timezone
+
+from . import caching
+from .models import BlogPost, FeedArtifact, Tag, Author
+
+FEED_FORMATS = {
+    'rss': (feedgenerator.Rss201rev2Feed, 'application/rss+xml; charset=utf-8'),
+    'atom': (feedgenerator.Atom1Feed, 'application/atom+xml; charset=utf-8'),
+}
+SITEMAP_CONTENT_TYPE = 'application/xml; charset=utf-8'
+SITEMAP_INDEX_KEY = 'sitemap:index'
+
+
+def post_url(post):
+    """Public URL of a blog post"""
+    return settings.BLOG_POST_URL.format(slug=post.slug, id=post.id)
+
+
+def site_url(path):
+    """Absolute URL for an API path"""
+    return settings.SITE_URL.rstrip('/') + path
+
+
+def published_posts():
+    return BlogPost.objects.filter(status='published')
+
+
+def feed_key(fmt, scope='all', value=None):
+    if value is None:
+        return f'{fmt}:{scope}'
+    return f'{fmt}:{scope}:{value}'
+
+
+def sitemap_shard(post):
+    """Sitemap shard of a post; creation month never changes, so posts never move between shards"""
+    return post.created_at.strftime('%Y-%m')
+
+
+def sitemap_key(shard):
+    return f'sitemap:{shard}'
+
+
+# ---------------------------------------------------------------------------
+# Builders
+# ---------------------------------------------------------------------------
+
+def _scope_queryset(scope, value):
+    """Return (queryset, title, link path) for a feed scope, or None if the scope does not exist"""
+    queryset = published_posts()
+    if scope == 'all':
+        return queryset, 'All posts', '/api/feeds'
+    if scope == 'category':
+        return queryset.filter(category=value), f'Category: {value}', f'/api/feeds/category/{value}'
+    if scope == 'tag':
+        tag = Tag.objects.filter(slug=value).first()
+        if tag is None:
+            return None
+        return queryset.filter(tags=tag), f'Tag: {tag.name}', f'/api/feeds/tag/{value}'
+    if scope == 'author':
+        author = Author.objects.filter(id=value).first()
+        if author is None:
+            return None
+        return queryset.filter(author=author), f'Author: {author.name}', f'/api/feeds/author/{value}'
+    return None
+
+
+def build_feed(fmt, scope='all', value=None):
+    """
+    Render a feed document.
+    Returns (body, last_modified), or None if the scope has no published posts.
+    """
+    scoped = _scope_queryset(scope, value)
+    if scoped is None:
+        return None
+    queryset, title, path = scoped
+    posts = list(
+        queryset.select_related('author')
+        .prefetch_related('tags')
+        .annotate(sort_date=Coalesce('published_at', 'created_at'))
+        .order_by('-sort_date')[:settings.FEED_ITEM_LIMIT]
+    )
+    if not posts and scope != 'all':
+        return None
+
+    feed_class, _ = FEED_FORMATS[fmt]
+    feed = feed_class(
+        title=f'{settings.FEED_TITLE} - {title}',
+        link=settings.SITE_URL,
+        description=settings.FEED_DESCRIPTION,
+        language=settings.LANGUAGE_CODE,
+        feed_url=site_url(f'{path}/{fmt}/'),
+    )
+    for post in posts:
+        feed.add_item(
+            title=post.title,
+            link=post_url(post),
+            description=post.meta_description or post.excerpt or post.subtitle or '',
+            unique_id=str(post.id),
+            unique_id_is_permalink=False,
+            pubdate=post.sort_date,
+            updateddate=post.updated_at,
+            author_name=post.author.name,
+            categories=[post.category] + [tag.name for tag in post.tags.all()],
+        )
+    last_modified = max((post.updated_at for post in posts), default=timezone.now())
+    return feed.writeString('utf-8'), last_modified
+
+
+def build_sitemap_shard(shard):
+    """
+    Render a sitemap shard (posts created in the given YYYY-MM month).
+    Returns (body, last_modified), or None if the shard is empty.
+    """
+    year, month = (int(part) for part in shard.split('-'))
+    posts = list(
+        published_posts()
+        .filter(created_at__year=year, created_at__month=month)
+        .order_by('created_at')
+        .only('id', 'slug', 'updated_at')
+    )
+    if not posts:
+        return None
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+             '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">']
+    for post in posts:
+        lines.append(
+            f'<url><loc>{escape(post_url(post))}</loc>'
+            f'<lastmod>{post.updated_at.isoformat()}</lastmod></url>'
+        )
+    lines.append('</urlset>')
+    return '\n'.join(lines), max(post.updated_at for post in posts)
+
+
+def build_sitemap_index():
+    """Render the sitemap index from the stored shards. Returns (body, last_modified)."""
+    shards = FeedArtifact.objects.filter(key__startswith='sitemap:').exclude(key=SITEMAP_INDEX_KEY)
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+             '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">']
+    last_modified = None
+    for artifact in shards.only('key', 'last_modified'):
+        shard = artifact.key.split(':', 1)[1]
+        lines.append(
+            f'<sitemap><loc>{escape(site_url(f"/api/sitemaps/{shard}.xml"))}</loc>'
+            f'<lastmod>{artifact.last_modified.isoformat()}</lastmod></sitemap>'
+        )
+        if last_modified is None or artifact.last_modified > last_modified:
+            last_modified = artifact.last_modified
+    lines.append('</sitemapindex>')
+    return '\n'.join(lines), last_modified or timezone.now()
+
+
+# ---------------------------------------------------------------------------
+# Storage
+# ---------------------------------------------------------------------------
+
+def _store(key, content_type, result):
+    """Save a built artifact, or delete it when the builder returned nothing"""
+    if result is None:
+        FeedArtifact.objects.filter(key=key).delete()
+        return None
+    body, last_modified = result
+    etag = hashlib.sha1(body.encode('utf-8')).hexdigest()
+    previous = FeedArtifact.objects.filter(key=key).only('etag', 'last_modified').first()
+    if previous is not None:
+        # Last-Modified must not move backwards, e.g. when the newest post is deleted or unpublished
+        if previous.etag == etag:
+            last_modified = previous.last_modified
+        else:
+            last_modified = max(previous.last_modified, timezone.now())
+    artifact, _ = FeedArtifact.objects.update_or_create(
+        key=key,
+        defaults={
+            'content_type': content_type,
+            'body': body,
+            'etag': etag,
+            'last_modified': last_modified,
+        },
+    )
+    return artifact
+
+
+def regenerate(key):
+    """Rebuild a single artifact by key and return it (None if it no longer has content)"""
+    kind, _, rest = key.partition(':')
+    if kind == 'sitemap':
+        if rest == 'index':
+            return _store(key, SITEMAP_CONTENT_TYPE, build_sitemap_index())
+        return _store(key, SITEMAP_CONTENT_TYPE, build_sitemap_shard(rest))
+    scope, _, value = rest.partition(':')
+    return _store(key, FEED_FORMATS[kind][1], build_feed(kind, scope, value or None))
+
+
+def get_or_build(key):
+    """
+    Return the stored artifact, building it on first request. Keys without
+    content (unknown tags, empty categories) are remembered as missing until
+    posts, tags or authors change, so requests for them do not rebuild it
+    every time.
+    """
+    artifact = FeedArtifact.objects.filter(key=key).first()
+    if artifact is None:
+        missing_key = caching.make_key(caching.POSTS_NAMESPACE, 'feed-missing', key)
+        if cache.get(missing_key):
+            return None
+        artifact = regenerate(key)
+        if artifact is None:
+            cache.set(missing_key, True, settings.FEED_MISSING_CACHE_TIMEOUT)
+    return artifact
+
+
+def keys_for_state(state):
+    """
+    Artifact keys that contain a post in the given state.
+    `state` is a dict with category, author_id, tag_slugs and shard.
+    """
+    scopes = [('all', None), ('category', state['category']), ('author', state['author_id'])]
+    scopes += [('tag', slug) for slug in state['tag_slugs']]
+    keys = {feed_key(fmt, scope, value) for fmt in FEED_FORMATS for scope, value in scopes}
+    keys.add(sitemap_key(state['shard']))
+    return keys
+
+
+def post_state(post, tag_slugs=None):
+    """Snapshot the feed-relevant fields of a post"""
+    if tag_slugs is None:
+        tag_slugs = list(post.tags.values_list('slug', flat=True))
+    return {
+        'published': post.status == 'published',
+        'category': post.category,
+        'author_id': post.author_id,
+        'tag_slugs': tag_slugs,
+        'shard': sitemap_shard(post),
+    }
+
+
+def regenerate_keys(keys):
+    """Rebuild the given artifacts; the sitemap index follows any shard change"""
+    keys = set(keys)
+    for key in sorted(keys - {SITEMAP_INDEX_KEY}):
+        regenerate(key)
+    if any(key.startswith('sitemap:') for key in keys):
+        regenerate(SITEMAP_INDEX_KEY)
+
+
+def tag_keys(slug):
+    return {feed_key(fmt, 'tag', slug) for fmt in FEED_FORMATS}
+
+
+def regenerate_for_posts(posts):
+    """Rebuild every artifact that contains any of the given posts"""
+    keys = set()
+    for post in posts.prefetch_related('tags'):
+        keys |= keys_for_state(post_state(post, [tag.slug for tag in post.tags.all()]))
+    regenerate_keys(keys)
+
+
+def rebuild_all():
+    """Rebuild every artifact from scratch and drop the ones that no longer have content"""
+    posts = published_posts()
+    keys = {feed_key(fmt) for fmt in FEED_FORMATS}
+    for category in posts.order_by().values_list('category', flat=True).distinct():
+        keys |= {feed_key(fmt, 'category', category) for fmt in FEED_FORMATS}
+    for author_id in posts.order_by().values_list('author_id', flat=True).distinct():
+        keys |= {feed_key(fmt, 'author', author_id) for fmt in FEED_FORMATS}
+    for slug in Tag.objects.filter(blog_posts__status='published').values_list('slug', flat=True).distinct():
+        keys |= {feed_key(fmt, 'tag', slug) for fmt in FEED_FORMATS}
+    for created_at in posts.dates('created_at', 'month'):
+        keys.add(sitemap_key(created_at.strftime('%Y-%m')))
+
+    FeedArtifact.objects.exclude(key__in=keys | {SITEMAP_INDEX_KEY}).delete()
+    regenerate_keys(keys)
+    return len(keys) + 1
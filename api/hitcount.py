@@ -0,0 +1,167 @@
+"""
+Buffered view counting.
+
+Views are counted in memory per worker process and flushed as batched
+upserts, either when VIEW_COUNT_FLUSH_INTERVAL seconds have passed or the
+buffer holds VIEW_COUNT_MAX_BUFFER entries:
+
+- PostViewCount gets one row per post and time bucket (VIEW_COUNT_BUCKET_SECONDS).
+- PostPopularity keeps a running total and a trending score per post.
+
+The trending score uses forward exponential decay kept in log space:
+
+    score = log(sum(views_i * exp(k * t_i)))      k = ln 2 / TRENDING_HALF_LIFE_HOURS
+
+where t_i is the view time in hours. Ordering by this score is the same as
+ordering by the decayed view count at any moment, yet every flush only adds
+to it (no periodic full-table recomputation), and staying in log space keeps
+the value from overflowing.
+"""
+import atexit
+import logging
+import math
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .models import BlogPost, PostPopularity, PostViewCount
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_buffer = Counter()
+_last_flush = time.monotonic()
+
+
+def bucket_for(moment):
+    """Start of the counting bucket containing `moment`"""
+    size = settings.VIEW_COUNT_BUCKET_SECONDS
+    return datetime.fromtimestamp(int(moment.timestamp()) // size * size, tz=dt_timezone.utc)
+
+
+def decay_rate():
+    return math.log(2) / settings.TRENDING_HALF_LIFE_HOURS
+
+
+def log_add(a, b):
+    """log(exp(a) + exp(b)) without overflow"""
+    if a < b:
+        a, b = b, a
+    return a + math.log1p(math.exp(b - a))
+
+
+def record_view(post_id):
+    """Count a view of a post; flushes the buffer when it is due"""
+    post_id = uuid.UUID(str(post_id))
+    now = timezone.now()
+    with _lock:
+        _buffer[(post_id, bucket_for(now))] += 1
+        due = (
+            len(_buffer) >= settings.VIEW_COUNT_MAX_BUFFER
+            or time.monotonic() - _last_flush >= settings.VIEW_COUNT_FLUSH_INTERVAL
+        )
+    if due:
+        flush()
+
+
+def _take_buffer():
+    global _buffer, _last_flush
+    with _lock:
+        pending, _buffer = _buffer, Counter()
+        _last_flush = time.monotonic()
+    return pending
+
+
+def _restore_buffer(pending):
+    with _lock:
+        _buffer.update(pending)
+
+
+def _upsert_counts(pending):
+    table = connection.ops.quote_name(PostViewCount._meta.db_table)
+    pk_field = BlogPost._meta.pk
+    bucket_field = PostViewCount._meta.get_field('bucket')
+    sql = (
+        f'INSERT INTO {table} (post_id, bucket, count) VALUES (%s, %s, %s) '
+        f'ON CONFLICT (post_id, bucket) DO UPDATE SET count = {table}.count + EXCLUDED.count'
+    )
+    params = [
+        (
+            pk_field.get_db_prep_value(post_id, connection),
+            bucket_field.get_db_prep_value(bucket, connection),
+            hits,
+        )
+        # Same order in every flush, so concurrent flushes lock rows without deadlocking
+        for (post_id, bucket), hits in sorted(pending.items())
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def _update_popularity(pending):
+    k = decay_rate()
+    deltas = {}
+    for (post_id, bucket), hits in pending.items():
+        hours = bucket.timestamp() / 3600
+        total, score, last = deltas.get(post_id, (0, None, bucket))
+        increment = math.log(hits) + k * hours
+        deltas[post_id] = (
+            total + hits,
+            increment if score is None else log_add(score, increment),
+            max(last, bucket),
+        )
+
+    while deltas:
+        # Lock and insert rows in primary-key order, as _upsert_counts does, so
+        # concurrent flushes of overlapping posts queue instead of deadlocking
+        existing = {
+            row.pk: row
+            for row in PostPopularity.objects.select_for_update().filter(pk__in=list(deltas)).order_by('pk')
+        }
+        for post_id, row in existing.items():
+            hits, score, last = deltas[post_id]
+            row.total_views += hits
+            row.trending_score = log_add(row.trending_score, score)
+            row.last_viewed_at = max(row.last_viewed_at or last, last)
+        PostPopularity.objects.bulk_update(list(existing.values()), ['total_views', 'trending_score', 'last_viewed_at'])
+        to_create = [
+            PostPopularity(post_id=post_id, total_views=hits, trending_score=score, last_viewed_at=last)
+            for post_id, (hits, score, last) in sorted(deltas.items())
+            if post_id not in existing
+        ]
+        try:
+            with transaction.atomic():
+                PostPopularity.objects.bulk_create(to_create)
+            return
+        except IntegrityError:
+            # Another worker created some of these rows since they were read; add to them instead
+            deltas = {post_id: delta for post_id, delta in deltas.items() if post_id not in existing}
+
+
+def flush():
+    """Write buffered view counts to the database"""
+    pending = _take_buffer()
+    if not pending:
+        return 0
+    existing_ids = set(
+        BlogPost.objects.filter(pk__in={post_id for post_id, _ in pending}).values_list('pk', flat=True)
+    )
+    pending = Counter({key: hits for key, hits in pending.items() if key[0] in existing_ids})
+    try:
+        with transaction.atomic():
+            _upsert_counts(pending)
+            _update_popularity(pending)
+    except Exception:
+        logger.exception('Failed to flush %d view count entries; keeping them for the next flush', len(pending))
+        _restore_buffer(pending)
+        return 0
+    return sum(pending.values())
+
+
+atexit.register(flush)
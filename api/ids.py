@@ -0,0 +1,50 @@
+"""
+Time-ordered UUIDv7 primary keys (RFC 9562).
+
+    48 bits  unix time in milliseconds
+     4 bits  version (7)
+    12 bits  counter, random at the start of each millisecond
+     2 bits  variant
+    62 bits  random
+
+Ids generated by one process are strictly increasing: within a millisecond
+the counter is incremented, and if it overflows the timestamp is advanced
+by one. New rows therefore land at the right edge of the primary key index,
+and ordering by id follows creation order, so `id` works as a tiebreaker
+after a timestamp (or on its own) in keyset pagination. Rows created before
+the switch keep their random uuid4 ids.
+"""
+import os
+import threading
+import time
+import uuid
+
+_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+
+COUNTER_MAX = 0xFFF
+
+
+def uuid7():
+    global _last_ms, _counter
+    with _lock:
+        now_ms = time.time_ns() // 1_000_000
+        if now_ms > _last_ms:
+            _last_ms = now_ms
+            # Start low in the counter space so a burst has room to increment
+            _counter = int.from_bytes(os.urandom(2), 'big') & 0x7FF
+        else:
+            _counter += 1
+            if _counter > COUNTER_MAX:
+                _last_ms += 1
+                _counter = 0
+        timestamp, counter = _last_ms, _counter
+    rand_b = int.from_bytes(os.urandom(8), 'big') & ((1 << 62) - 1)
+    value = (timestamp & ((1 << 48) - 1)) << 80
+    value |= 0x7 << 76
+    value |= counter << 64
+    value |= 0b10 << 62
+    value |= rand_b
+    return uuid.UUID(int=value)
+
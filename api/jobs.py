@@ -0,0 +1,168 @@
+"""
+Admin bulk actions.
+
+Each action is applied in chunks of ADMIN_BULK_CHUNK_SIZE rows, walking the
+selection in primary-key order and committing once per chunk, so row locks
+are held only for one chunk and the bookkeeping (tombstones, signals, cache
+purges) happens as each chunk lands.
+
+Selections of up to ADMIN_BULK_SYNC_LIMIT rows are applied during the admin
+request. Larger ones are stored as a BulkJob holding the primary keys of the
+selection and run by `manage.py run_admin_jobs`; the job records the last
+primary key it committed, so a failed job resumes where it stopped when it
+is queued again. Running jobs also record a heartbeat with every chunk; a
+job whose worker died (no heartbeat for ADMIN_BULK_JOB_LEASE seconds) is
+claimed again by the next worker and resumes the same way. The previous
+worker, if it was only stalled, stops at its next chunk.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import purge
+from .changes import record_tombstones
+from .models import BlogPost, BulkJob, Comment
+from .signals import posts_bulk_updated
+
+logger = logging.getLogger(__name__)
+
+
+def update_posts(post_ids, user=None, **fields):
+    """Update posts and notify listeners that rely on save signals"""
+    now = timezone.now()
+    fields.setdefault('updated_at', now)
+    if user is not None:
+        fields['updated_by'] = user
+    posts = BlogPost.objects.filter(pk__in=post_ids)
+    if fields.get('status', 'published') != 'published':
+        record_tombstones(posts.filter(status='published').values_list('pk', flat=True), 'unpublished')
+    changed = list(fields)
+    if fields.get('status') == 'published':
+        posts.filter(published_at__isnull=True).update(published_at=now)
+        changed.append('published_at')
+    count = posts.update(**fields)
+    posts_bulk_updated.send(sender=BlogPost, post_ids=list(post_ids), fields=changed)
+    return count
+
+
+def set_comment_approval(comment_ids, approved):
+    comments = Comment.objects.filter(pk__in=comment_ids)
+    post_ids = set(comments.values_list('blog_post_id', flat=True))
+    count = comments.update(is_approved=approved)
+    purge.enqueue(key for post_id in post_ids for key in purge.comment_keys(post_id))
+    return count
+
+
+# action name -> (model, function applying it to a chunk of primary keys)
+ACTIONS = {
+    'make_published': (BlogPost, lambda ids, user: update_posts(ids, user, status='published')),
+    'make_draft': (BlogPost, lambda ids, user: update_posts(ids, user, status='draft')),
+    'make_featured': (BlogPost, lambda ids, user: update_posts(ids, user, featured=True)),
+    'unfeature': (BlogPost, lambda ids, user: update_posts(ids, user, featured=False)),
+    'approve_comments': (Comment, lambda ids, user: set_comment_approval(ids, True)),
+    'disapprove_comments': (Comment, lambda ids, user: set_comment_approval(ids, False)),
+}
+
+
+def _chunks(queryset, chunk_size, after=None):
+    """Yield lists of primary keys in ascending order, re-querying after each chunk"""
+    # Searches across relations (e.g. tag names) can return a row more than once
+    queryset = queryset.order_by('pk').values_list('pk', flat=True).distinct()
+    while True:
+        page = queryset.filter(pk__gt=after) if after is not None else queryset
+        ids = list(page[:chunk_size])
+        if not ids:
+            return
+        yield ids
+        if len(ids) < chunk_size:
+            return
+        after = ids[-1]
+
+
+def submit(action, queryset, user):
+    """
+    Apply an admin action to `queryset`.
+    Returns (count, None) when it ran inline, or (None, job) when it was queued.
+    """
+    model, apply = ACTIONS[action]
+    limit = settings.ADMIN_BULK_SYNC_LIMIT
+    if len(queryset.order_by().values_list('pk', flat=True).distinct()[:limit + 1]) <= limit:
+        count = 0
+        for ids in _chunks(queryset, settings.ADMIN_BULK_CHUNK_SIZE):
+            with transaction.atomic():
+                count += apply(ids, user)
+        return count, None
+    object_ids = [str(pk) for pk in queryset.order_by('pk').values_list('pk', flat=True).distinct()]
+    job = BulkJob.objects.create(action=action, object_ids=object_ids, created_by=user)
+    return None, job
+
+
+def selection(job):
+    """Rows selected when the job was submitted that still exist"""
+    model, _ = ACTIONS[job.action]
+    return model._default_manager.filter(pk__in=job.object_ids)
+
+
+def claim_next():
+    """Mark the oldest queued job, or a running one whose worker stopped reporting, as running and return it"""
+    with transaction.atomic():
+        now = timezone.now()
+        stale = now - timedelta(seconds=settings.ADMIN_BULK_JOB_LEASE)
+        job = (
+            BulkJob.objects.select_for_update(skip_locked=True)
+            .filter(Q(status='queued') | Q(status='running', heartbeat_at__lt=stale))
+            .order_by('created_at')
+            .first()
+        )
+        if job is None:
+            return None
+        if job.status == 'running':
+            logger.warning('Bulk job %s has had no heartbeat since %s; resuming it after %s',
+                           job.pk, job.heartbeat_at, job.last_pk or 'the start')
+        job.status = 'running'
+        job.started_at = job.started_at or now
+        job.heartbeat_at = now
+        job.error = ''
+        job.save(update_fields=['status', 'started_at', 'heartbeat_at', 'error'])
+    return job
+
+
+def _still_owned(job):
+    """Lock the job row and check no other worker has taken the job over"""
+    return BulkJob.objects.select_for_update().filter(
+        pk=job.pk, status='running', heartbeat_at=job.heartbeat_at
+    ).values_list('pk', flat=True).first() is not None
+
+
+def run(job):
+    """Apply a job chunk by chunk, recording progress with each committed chunk"""
+    _, apply = ACTIONS[job.action]
+    queryset = selection(job)
+    if job.total is None:
+        job.total = queryset.count()
+        job.save(update_fields=['total'])
+    after = job.last_pk or None
+    try:
+        for ids in _chunks(queryset, settings.ADMIN_BULK_CHUNK_SIZE, after):
+            with transaction.atomic():
+                if not _still_owned(job):
+                    logger.warning('Bulk job %s was taken over by another worker; stopping', job.pk)
+                    return job
+                apply(ids, job.created_by)
+                job.processed += len(ids)
+                job.last_pk = str(ids[-1])
+                job.heartbeat_at = timezone.now()
+                job.save(update_fields=['processed', 'last_pk', 'heartbeat_at'])
+    except Exception as exc:
+        logger.exception('Bulk job %s failed after %d rows', job.pk, job.processed)
+        job.status = 'failed'
+        job.error = str(exc)
+    else:
+        job.status = 'done'
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'finished_at'])
+    return job
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from api.models import BlogPost
+
+
+class Command(BaseCommand):
+    help = 'Compute plain text, word count, read time and excerpt for existing blog posts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Posts processed per batch')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        processed = 0
+        last_pk = None
+        while True:
+            # Keyset pagination on the primary key keeps each batch an indexed range scan
+            chunk = BlogPost.objects.order_by('pk').only('pk', 'content', *BlogPost.DERIVED_FIELDS)
+            if last_pk is not None:
+                chunk = chunk.filter(pk__gt=last_pk)
+            posts = list(chunk[:chunk_size])
+            if not posts:
+                break
+            for post in posts:
+                post.update_derived_fields()
+            # bulk_update leaves updated_at untouched, so backfilling is not reported as an edit
+            BlogPost.objects.bulk_update(posts, BlogPost.DERIVED_FIELDS)
+            processed += len(posts)
+            last_pk = posts[-1].pk
+            self.stdout.write(f'Processed {processed} posts...')
+
+        self.stdout.write(self.style.SUCCESS(f'Backfilled content fields for {processed} post{"" if processed == 1 else "s"}.'))
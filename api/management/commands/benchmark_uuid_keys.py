@@ -0,0 +1,76 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from api.ids import uuid7
+
+GENERATORS = {
+    'uuid4': uuid.uuid4,
+    'uuid7': uuid7,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare insert throughput and primary key index size of uuid4 and uuid7 keys '
+        'by loading comment-shaped rows into temporary tables'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help='Rows to insert per key type')
+        parser.add_argument('--batch-size', type=int, default=10_000, help='Rows per INSERT statement')
+
+    def handle(self, *args, **options):
+        rows, batch_size = options['rows'], options['batch_size']
+        post_ids = [uuid.uuid4() for _ in range(100)]
+        self.stdout.write(f'{"keys":<8}{"rows":>12}{"seconds":>10}{"rows/s":>12}{"pk index":>12}{"table":>12}')
+        with connection.cursor() as cursor:
+            for name, generate in GENERATORS.items():
+                table = f'benchmark_comment_{name}'
+                self._create(cursor, table)
+                elapsed = 0.0
+                for start in range(0, rows, batch_size):
+                    now = timezone.now()
+                    batch = [
+                        (generate(), post_ids[i % len(post_ids)], now, 'Benchmark comment body')
+                        for i in range(start, min(start + batch_size, rows))
+                    ]
+                    began = time.perf_counter()
+                    self._insert(cursor, table, batch)
+                    elapsed += time.perf_counter() - began
+                index_size, table_size = self._sizes(cursor, table)
+                self.stdout.write(
+                    f'{name:<8}{rows:>12}{elapsed:>10.2f}{rows / elapsed:>12.0f}{index_size:>12}{table_size:>12}'
+                )
+                cursor.execute(f'DROP TABLE {table}')
+
+    def _create(self, cursor, table):
+        cursor.execute(f'DROP TABLE IF EXISTS {table}')
+        cursor.execute(
+            f'CREATE TEMPORARY TABLE {table} ('
+            f'id uuid PRIMARY KEY, blog_post_id uuid NOT NULL, created_at timestamp with time zone NOT NULL, content text NOT NULL)'
+        )
+
+    def _insert(self, cursor, table, batch):
+        if connection.vendor == 'postgresql':
+            ids, posts, created, content = zip(*batch)
+            cursor.execute(
+                f'INSERT INTO {table} SELECT * FROM unnest(%s::uuid[], %s::uuid[], %s::timestamptz[], %s::text[])',
+                [list(ids), list(posts), list(created), list(content)],
+            )
+        else:
+            cursor.executemany(
+                f'INSERT INTO {table} VALUES (%s, %s, %s, %s)',
+                [(str(a), str(b), c.isoformat(), d) for a, b, c, d in batch],
+            )
+
+    def _sizes(self, cursor, table):
+        if connection.vendor != 'postgresql':
+            return 'n/a', 'n/a'
+        cursor.execute(
+            f"SELECT pg_size_pretty(pg_relation_size('{table}_pkey')), pg_size_pretty(pg_relation_size('{table}'))"
+        )
+        return cursor.fetchone()
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api import feeds
+
+
+class Command(BaseCommand):
+    help = 'Rebuild all precomputed RSS/Atom feeds and sitemap shards'
+
+    def handle(self, *args, **options):
+        count = feeds.rebuild_all()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} feed artifact{"" if count == 1 else "s"}.'))
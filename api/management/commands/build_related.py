@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api import related
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the related-posts index for all published posts'
+
+    def handle(self, *args, **options):
+        count = related.rebuild_all()
+        self.stdout.write(self.style.SUCCESS(f'Indexed related posts for {count} post{"" if count == 1 else "s"}.'))
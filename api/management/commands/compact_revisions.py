@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api import revisions
+from api.models import PostRevision
+
+
+class Command(BaseCommand):
+    help = 'Delete post revisions past the retention period and rewrite the remaining snapshot/delta chains'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.REVISION_RETENTION_DAYS,
+                            help='Days of revisions to keep')
+        parser.add_argument('--keep-min', type=int, default=settings.REVISION_KEEP_MIN,
+                            help='Revisions kept per post regardless of age')
+
+    def handle(self, *args, **options):
+        keep_after = timezone.now() - timedelta(days=options['days'])
+        post_ids = PostRevision.objects.order_by().values_list('post_id', flat=True).distinct()
+        deleted = posts = 0
+        for post_id in post_ids.iterator():
+            deleted += revisions.compact(post_id, keep_after, options['keep_min'])
+            posts += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Compacted revisions of {posts} post{"" if posts == 1 else "s"}, '
+            f'deleted {deleted} revision{"" if deleted == 1 else "s"}.'
+        ))
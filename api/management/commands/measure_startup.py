@@ -0,0 +1,104 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter so every phase is measured cold
+CHILD_SCRIPT = r'''
+import io, json, sys, time
+spawned, application_path, url = float(sys.argv[1]), sys.argv[2], sys.argv[3]
+started = time.perf_counter()
+interpreter = time.time() - spawned
+
+from django.utils.module_loading import import_string
+application = import_string(application_path)
+loaded = time.perf_counter()
+
+from urllib.parse import urlsplit
+from django.conf import settings
+from api import warmup
+
+site = urlsplit(settings.SITE_URL)
+path, _, query = url.partition('?')
+
+
+def request():
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query, 'SCRIPT_NAME': '',
+        'SERVER_NAME': site.hostname or 'localhost', 'SERVER_PORT': str(site.port or (443 if site.scheme == 'https' else 80)),
+        'HTTP_HOST': site.netloc, 'SERVER_PROTOCOL': 'HTTP/1.1', 'wsgi.url_scheme': site.scheme or 'http',
+        'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr, 'wsgi.version': (1, 0),
+        'wsgi.multithread': False, 'wsgi.multiprocess': True, 'wsgi.run_once': False,
+    }
+    status = []
+    began = time.perf_counter()
+    response = application(environ, lambda code, headers, exc_info=None: status.append(code))
+    try:
+        b''.join(response)
+    finally:
+        getattr(response, 'close', lambda: None)()
+    return time.perf_counter() - began, status[0]
+
+
+first, status = request()
+second, _ = request()
+warmed = sum(warmup.last_report.values())
+print(json.dumps({
+    'interpreter': interpreter,
+    'import': loaded - started - warmed,
+    'warmup': warmed,
+    'first_response': first,
+    'second_response': second,
+    'time_to_first_response': interpreter + loaded - started + first,
+    'status': status,
+}))
+'''
+
+PHASES = ['interpreter', 'import', 'warmup', 'first_response', 'second_response', 'time_to_first_response']
+
+
+class Command(BaseCommand):
+    help = 'Measure worker import time, warm-up and time to first response in fresh processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='/api/posts/', help='Path (and query) of the requests to time')
+        parser.add_argument('--runs', type=int, default=3, help='Fresh processes to start; medians are reported')
+        parser.add_argument('--no-warmup', action='store_true', help='Start workers with WARMUP_ON_STARTUP off')
+        parser.add_argument('--max-first-response', type=float, default=None,
+                            help='Fail if the median time to first response exceeds this many seconds')
+        parser.add_argument('--json', action='store_true', help='Print the medians as JSON')
+
+    def _run(self, options):
+        env = dict(os.environ, WARMUP_ON_STARTUP='False' if options['no_warmup'] else 'True')
+        env.setdefault('DJANGO_SETTINGS_MODULE', settings.SETTINGS_MODULE)
+        result = subprocess.run(
+            [sys.executable, '-c', CHILD_SCRIPT, repr(time.time()), settings.WSGI_APPLICATION, options['url']],
+            env=env, cwd=settings.BASE_DIR, capture_output=True, text=True,
+        )
+        if result.returncode:
+            raise CommandError(f'Worker process failed:\n{result.stderr}')
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def handle(self, *args, **options):
+        runs = [self._run(options) for _ in range(max(options['runs'], 1))]
+        statuses = {run['status'] for run in runs}
+        medians = {phase: statistics.median(run[phase] for run in runs) for phase in PHASES}
+
+        if options['json']:
+            self.stdout.write(json.dumps(dict(medians, status=sorted(statuses))))
+        else:
+            self.stdout.write(f'GET {options["url"]} ({len(runs)} runs, warm-up {"off" if options["no_warmup"] else "on"}):')
+            for phase in PHASES:
+                self.stdout.write(f'  {phase.replace("_", " "):<24} {medians[phase] * 1000:9.1f} ms')
+            self.stdout.write(f'  {"status":<24} {", ".join(sorted(statuses))}')
+
+        limit = options['max_first_response']
+        if limit is not None and medians['time_to_first_response'] > limit:
+            raise CommandError(
+                f'Time to first response {medians["time_to_first_response"]:.3f}s exceeds {limit:.3f}s.'
+            )
@@ -0,0 +1,42 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from api import partitions
+
+
+class Command(BaseCommand):
+    help = (
+        'Partition the comment table by month: convert it on first run, create partitions ahead of time '
+        'and move old partitions to the cold tablespace. Meant to run from cron, e.g. daily.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ahead', type=int, default=settings.COMMENT_PARTITIONS_AHEAD,
+                            help='Months of partitions to create ahead of the current month')
+        parser.add_argument('--hot-months', type=int, default=settings.COMMENT_HOT_MONTHS,
+                            help='Months of recent partitions kept out of the cold tablespace')
+
+    def handle(self, *args, **options):
+        if not settings.COMMENT_PARTITIONING:
+            raise CommandError('Comment partitioning is disabled; set COMMENT_PARTITIONING=True to enable it.')
+        if connection.vendor != 'postgresql':
+            raise CommandError('Comment partitioning requires PostgreSQL.')
+
+        current = partitions.month_start(datetime.now(dt_timezone.utc))
+        with connection.cursor() as cursor:
+            if not partitions.is_partitioned(cursor):
+                created = partitions.convert(cursor, options['ahead'])
+                self.stdout.write(f'Converted {partitions.TABLE} into {len(created)} monthly partitions.')
+            created = partitions.ensure_partitions(cursor, partitions.add_months(current, options['ahead']))
+            for name in created:
+                self.stdout.write(f'Created {name}.')
+
+            tablespace = settings.COMMENT_COLD_TABLESPACE
+            if tablespace:
+                before = partitions.add_months(current, -options['hot_months'])
+                for name in partitions.move_to_cold(cursor, before, tablespace):
+                    self.stdout.write(f'Moved {name} to tablespace {tablespace}.')
+        self.stdout.write(self.style.SUCCESS('Comment partitions are up to date.'))
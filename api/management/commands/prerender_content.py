@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from api import rendering
+from api.models import BlogPost
+
+
+class Command(BaseCommand):
+    help = 'Render post content to HTML and store it in the cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Include posts that are not published')
+        parser.add_argument('--batch-size', type=int, default=200, help='Posts rendered per cache write')
+
+    def handle(self, *args, **options):
+        posts = BlogPost.objects.only('id', 'content', 'updated_at').order_by('pk')
+        if not options['all']:
+            posts = posts.filter(status='published')
+        batch, count = [], 0
+        for post in posts.iterator(chunk_size=options['batch_size']):
+            batch.append(post)
+            if len(batch) >= options['batch_size']:
+                rendering.prerender(batch)
+                count += len(batch)
+                batch = []
+        rendering.prerender(batch)
+        count += len(batch)
+        self.stdout.write(self.style.SUCCESS(f'Rendered {count} post{"" if count == 1 else "s"}.'))
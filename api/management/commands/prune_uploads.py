@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api import uploads
+
+
+class Command(BaseCommand):
+    help = 'Delete unfinished image uploads idle for IMAGE_UPLOAD_EXPIRY_HOURS, with their temporary files'
+
+    def handle(self, *args, **options):
+        deleted = uploads.prune()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} stale upload{"" if deleted == 1 else "s"}.'))
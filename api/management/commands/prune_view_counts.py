@@ -0,0 +1,18 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import PostViewCount
+
+
+class Command(BaseCommand):
+    help = 'Delete per-bucket view counts older than the retention period (totals are kept)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90, help='Days of view count buckets to keep')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        deleted, _ = PostViewCount.objects.filter(bucket__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} view count bucket{"" if deleted == 1 else "s"}.'))
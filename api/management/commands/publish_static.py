@@ -0,0 +1,67 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from api import publishing
+from api.models import BlogPost, Tag
+
+
+class Command(BaseCommand):
+    help = 'Render published posts and list pages to static JSON files for CDN offload'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=settings.STATIC_SNAPSHOT_ROOT, help='Output directory')
+        parser.add_argument('--pages', type=int, default=3, help='List pages to render per category and tag')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes')
+        parser.add_argument('--chunk-size', type=int, default=200, help='Posts per detail rendering task')
+        parser.add_argument('--base-url', default=settings.SITE_URL, help='Base URL used for links in the output')
+
+    def handle(self, *args, **options):
+        if publishing.brotli is None:
+            self.stderr.write(self.style.WARNING(
+                'The brotli package is not installed; writing .gz siblings only, no .br files.'
+            ))
+        output_dir = str(options['output'])
+        os.makedirs(output_dir, exist_ok=True)
+        previous = publishing.load_manifest(output_dir)
+
+        published = BlogPost.objects.filter(status='published')
+        post_ids = [str(pk) for pk in published.order_by('pk').values_list('pk', flat=True)]
+        chunk_size = options['chunk_size']
+        chunks = [post_ids[i:i + chunk_size] for i in range(0, len(post_ids), chunk_size)]
+
+        list_params = [{}]
+        list_params += [{'category': c} for c in published.order_by().values_list('category', flat=True).distinct()]
+        list_params += [
+            {'tag': slug}
+            for slug in Tag.objects.filter(blog_posts__status='published').values_list('slug', flat=True).distinct()
+        ]
+
+        # Workers must not share the parent's database connection
+        connections.close_all()
+        manifest = {}
+        written = 0
+        with ProcessPoolExecutor(
+            max_workers=max(1, options['workers']),
+            initializer=publishing.init_worker,
+            initargs=(output_dir, options['base_url'], previous),
+        ) as pool:
+            futures = [pool.submit(publishing.render_details, chunk) for chunk in chunks]
+            futures += [pool.submit(publishing.render_list_pages, params, options['pages']) for params in list_params]
+            for future in futures:
+                for relpath, digest, changed in future.result():
+                    manifest[relpath] = digest
+                    written += changed
+
+        stale = set(previous) - set(manifest)
+        for relpath in stale:
+            publishing.remove_file(output_dir, relpath)
+        publishing.save_manifest(output_dir, manifest)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Published {len(manifest)} files to {output_dir}: '
+            f'{written} written, {len(manifest) - written} unchanged, {len(stale)} removed.'
+        ))
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api import jobs
+
+
+class Command(BaseCommand):
+    help = 'Run admin bulk actions queued as background jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run queued jobs and exit')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to sleep when nothing is queued')
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            job = jobs.claim_next()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['interval'])
+                continue
+            job = jobs.run(job)
+            style = self.style.SUCCESS if job.status == 'done' else self.style.ERROR
+            self.stdout.write(style(f'{job}: {job.processed} rows'))
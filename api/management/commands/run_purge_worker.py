@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api import purge
+
+
+class Command(BaseCommand):
+    help = 'Send queued cache purge keys to the configured webhook targets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Process due keys once and exit')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to sleep when nothing is due')
+        parser.add_argument('--batch-size', type=int, default=None, help='Keys per webhook request')
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            sent, failed = purge.process_due(options['batch_size'])
+            if sent or failed:
+                self.stdout.write(f'Purged {sent} keys, {failed} failed.')
+            if options['once']:
+                if not (sent or failed):
+                    self.stdout.write(self.style.SUCCESS('Nothing due.'))
+                return
+            if not (sent or failed):
+                time.sleep(options['interval'])
@@ -0,0 +1,185 @@
+"""
+Media file serving (MEDIA_URL).
+
+Django checks access and picks the cache headers; the bytes are sent
+according to MEDIA_SERVE_MODE:
+
+- 'x-accel-redirect': an empty response with `X-Accel-Redirect:
+  MEDIA_ACCEL_REDIRECT_PREFIX + path` for an nginx `internal` location
+  aliased to MEDIA_ROOT; nginx then handles ranges and conditional requests.
+- 'x-sendfile': an empty response with `X-Sendfile: <absolute path>` for
+  Apache mod_xsendfile or lighttpd.
+- 'python': streamed from the worker, with single-range `Range` requests,
+  `If-Range`, `If-None-Match` / `If-Modified-Since` and HEAD support.
+- 'none': no Django route; the front-end server serves MEDIA_ROOT itself.
+
+Images that are the featured image of unpublished posts only are hidden
+from everyone but staff. Access is checked on the normalized path, the same
+one the file is opened with. Files with a content hash in their name never
+change, so they are cached as immutable for a year unless an unpublished
+post uses them: those may be hidden or shown by the next status change and
+keep the short MEDIA_CACHE_MAX_AGE. The trade-off is that unpublishing the
+only post of an image already served as immutable hides it from this
+server, but not from browsers and CDNs that cached it before.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+from . import caching
+from .models import BlogPost
+
+BLOCK_SIZE = 64 * 1024
+
+# "cover.3f2a9b0c1d4e5f60.jpg": a hex digest of at least 12 characters before the extension
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{12,}\.[^./]+$')
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _post_statuses(name):
+    """Statuses of the posts using the file as their featured image"""
+    key = caching.make_key(caching.POSTS_NAMESPACE, 'media-statuses', name)
+    statuses = cache.get(key)
+    if statuses is None:
+        statuses = sorted(set(BlogPost.objects.filter(featured_image=name).values_list('status', flat=True)))
+        cache.set(key, statuses, settings.MEDIA_ACCESS_CACHE_TIMEOUT)
+    return set(statuses)
+
+
+def is_hidden(name):
+    """True when the file is only used as the featured image of unpublished posts"""
+    statuses = _post_statuses(name)
+    return bool(statuses) and 'published' not in statuses
+
+
+def is_immutable(name):
+    """True for hashed files that no unpublished post uses, so no status change is expected to hide them"""
+    return bool(HASHED_NAME_RE.search(name)) and _post_statuses(name) <= {'published'}
+
+
+def parse_range(header, size):
+    """
+    Return (start, end) (inclusive) for a single `bytes=` range, None to
+    serve the whole file (no, malformed or multiple ranges), or False when
+    the range cannot be satisfied.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if not length or not size:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return False
+    return start, end
+
+
+def _if_range_matches(request, etag, last_modified):
+    value = request.headers.get('If-Range')
+    if value is None:
+        return True
+    if value.startswith(('"', 'W/')):
+        return value == etag
+    return parse_http_date_safe(value) == last_modified
+
+
+def _read_range(fh, start, length):
+    try:
+        fh.seek(start)
+        while length > 0:
+            block = fh.read(min(BLOCK_SIZE, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+    finally:
+        fh.close()
+
+
+def _file_response(request, path, content_type, size, etag, last_modified):
+    byte_range = None
+    if request.headers.get('Range') and _if_range_matches(request, etag, last_modified):
+        byte_range = parse_range(request.headers['Range'], size)
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type)
+        response['Content-Length'] = str(size)
+    elif byte_range is None:
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            _read_range(open(path, 'rb'), start, end - start + 1), status=206, content_type=content_type
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+@require_safe
+def serve(request, path):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    # Check access under the normalized name, so "a//b", "./b" or "x/../b" cannot bypass it
+    name = os.path.relpath(full_path, os.path.abspath(settings.MEDIA_ROOT)).replace(os.sep, '/')
+    staff = request.user.is_staff
+    if not staff and is_hidden(name):
+        raise Http404
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    last_modified = int(stat.st_mtime)
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        mode = settings.MEDIA_SERVE_MODE
+        if mode == 'x-accel-redirect':
+            response = HttpResponse(content_type=content_type)
+            response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + quote(name)
+        elif mode == 'x-sendfile':
+            response = HttpResponse(content_type=content_type)
+            response['X-Sendfile'] = full_path
+        else:
+            response = _file_response(request, full_path, content_type, stat.st_size, etag, last_modified)
+            if encoding:
+                response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+
+    if staff and is_hidden(name):
+        patch_cache_control(response, private=True, no_cache=True)
+    elif is_immutable(name):
+        patch_cache_control(response, public=True, max_age=settings.MEDIA_IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=settings.MEDIA_CACHE_MAX_AGE)
+    return response
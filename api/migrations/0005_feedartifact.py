@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-19 05:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_remove_blogpost_likes_remove_blogpost_read_time_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedArtifact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text="Artifact key, e.g. 'rss:tag:django' or 'sitemap:2025-01'", max_length=255, unique=True)),
+                ('content_type', models.CharField(max_length=100)),
+                ('body', models.TextField()),
+                ('etag', models.CharField(max_length=64)),
+                ('last_modified', models.DateTimeField(help_text='Most recent updated_at of the posts in this artifact')),
+                ('generated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['key'],
+            },
+        ),
+    ]
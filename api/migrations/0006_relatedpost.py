@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-19 05:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_feedartifact'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedPost',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(help_text='Cosine similarity over tags and category')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('post', models.ForeignKey(help_text='Post the neighbours belong to', on_delete=django.db.models.deletion.CASCADE, related_name='related_entries', to='api.blogpost')),
+                ('related', models.ForeignKey(help_text='Similar post', on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.blogpost')),
+            ],
+            options={
+                'ordering': ['post', 'rank'],
+                'constraints': [models.UniqueConstraint(fields=('post', 'rank'), name='api_relatedpost_post_rank_uniq')],
+            },
+        ),
+    ]
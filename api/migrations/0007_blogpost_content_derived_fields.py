@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-19 05:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_relatedpost'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='excerpt',
+            field=models.TextField(blank=True, default='', editable=False, help_text='Short plain-text summary of the content'),
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='plain_text',
+            field=models.TextField(blank=True, default='', editable=False, help_text='Text extracted from content'),
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='read_time',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Estimated reading time in minutes'),
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2026-10-19 05:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_blogpost_content_derived_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostPopularity',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='popularity', serialize=False, to='api.blogpost')),
+                ('total_views', models.PositiveBigIntegerField(default=0)),
+                ('trending_score', models.FloatField(default=0.0, help_text='Log of the exponentially time-decayed view count (see api.hitcount)')),
+                ('last_viewed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'post popularity',
+                'indexes': [models.Index(fields=['-total_views'], name='api_postpop_total_v_ab790b_idx'), models.Index(fields=['-trending_score'], name='api_postpop_trendin_0aa5c5_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PostViewCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField(help_text='Start of the counting interval')),
+                ('count', models.PositiveBigIntegerField(default=0)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='view_counts', to='api.blogpost')),
+            ],
+            options={
+                'ordering': ['-bucket'],
+                'indexes': [models.Index(fields=['bucket'], name='api_postvie_bucket_ca7de4_idx')],
+                'constraints': [models.UniqueConstraint(fields=('post', 'bucket'), name='api_postviewcount_post_bucket_uniq')],
+            },
+        ),
+    ]
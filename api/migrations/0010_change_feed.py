@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-19 05:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_slugredirect'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('post_id', models.UUIDField(db_index=True)),
+                ('reason', models.CharField(choices=[('deleted', 'Deleted'), ('unpublished', 'Unpublished')], max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['updated_at', 'id'], name='api_blogpos_updated_c3f34b_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-19 05:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_change_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PurgeTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target', models.URLField(max_length=500)),
+                ('key', models.CharField(help_text='URL path to purge', max_length=500)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('enqueued_at', models.DateTimeField(help_text='Last time this key was enqueued')),
+                ('next_attempt_at', models.DateTimeField()),
+                ('last_error', models.TextField(blank=True, default='')),
+            ],
+            options={
+                'ordering': ['next_attempt_at'],
+                'indexes': [models.Index(fields=['next_attempt_at'], name='api_purgeta_next_at_c6efc8_idx')],
+                'constraints': [models.UniqueConstraint(fields=('target', 'key'), name='api_purgetask_target_key_uniq')],
+            },
+        ),
+    ]
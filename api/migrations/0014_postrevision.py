@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-19 05:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_uuid7_primary_keys'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField()),
+                ('kind', models.CharField(choices=[('snapshot', 'Snapshot'), ('delta', 'Delta')], max_length=10)),
+                ('snapshot_number', models.PositiveIntegerField(help_text="Number of the snapshot this revision's delta chain starts from")),
+                ('data', models.BinaryField(help_text='zlib-compressed JSON state or delta')),
+                ('digest', models.CharField(help_text='SHA-1 of the full state', max_length=40)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='post_revisions', to=settings.AUTH_USER_MODEL)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='api.blogpost')),
+            ],
+            options={
+                'ordering': ['post', '-number'],
+                'constraints': [models.UniqueConstraint(fields=('post', 'number'), name='api_postrevision_post_number_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_image_uploads'),
+    ]
+
+    operations = [
+        # Indexes for the case-insensitive name prefix filter of /api/authors/ and /api/tags/
+        # (name__istartswith compiles to UPPER(name::text) LIKE UPPER('prefix%'))
+        migrations.RunSQL(
+            sql=[
+                "CREATE INDEX api_author_name_upper_like ON api_author (UPPER(name::text) text_pattern_ops)",
+                "CREATE INDEX api_tag_name_upper_like ON api_tag (UPPER(name::text) text_pattern_ops)",
+            ],
+            reverse_sql=[
+                "DROP INDEX IF EXISTS api_author_name_upper_like",
+                "DROP INDEX IF EXISTS api_tag_name_upper_like",
+            ],
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-19 05:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_directory_prefix_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['featured_image'], name='api_blogpos_feature_28c95d_idx'),
+        ),
+    ]
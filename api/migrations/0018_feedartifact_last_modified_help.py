@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 06:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_blogpost_featured_image_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='feedartifact',
+            name='last_modified',
+            field=models.DateTimeField(help_text='When the content of this artifact last changed'),
+        ),
+    ]
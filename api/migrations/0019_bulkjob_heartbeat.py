@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 06:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_feedartifact_last_modified_help'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bulkjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, help_text='Last time the running worker committed a chunk', null=True),
+        ),
+    ]
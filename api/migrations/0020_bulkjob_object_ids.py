@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-19 14:12
+
+from django.db import migrations, models
+
+
+def fail_unfinished_jobs(apps, schema_editor):
+    # Their selection was a pickled query, which is not kept
+    BulkJob = apps.get_model('api', 'BulkJob')
+    BulkJob.objects.filter(status__in=['queued', 'running']).update(
+        status='failed', error='Selection was not migrated; run the action again.'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_bulkjob_heartbeat'),
+    ]
+
+    operations = [
+        migrations.RunPython(fail_unfinished_jobs, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='bulkjob',
+            name='query',
+        ),
+        migrations.AddField(
+            model_name='bulkjob',
+            name='object_ids',
+            field=models.JSONField(default=list, help_text='Primary keys of the rows to change'),
+        ),
+    ]
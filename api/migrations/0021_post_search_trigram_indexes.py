@@ -0,0 +1,29 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_bulkjob_object_ids'),
+    ]
+
+    operations = [
+        # Trigram indexes for ?search= on /api/posts/, which ORs one
+        # UPPER(field::text) LIKE UPPER('%term%') per search field; every field
+        # needs an index for PostgreSQL to combine them instead of scanning.
+        migrations.RunSQL(
+            sql=[
+                "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+                "CREATE INDEX api_blogpost_title_upper_trgm ON api_blogpost USING gin (UPPER(title::text) gin_trgm_ops)",
+                "CREATE INDEX api_blogpost_subtitle_upper_trgm ON api_blogpost USING gin (UPPER(subtitle::text) gin_trgm_ops)",
+                "CREATE INDEX api_blogpost_category_upper_trgm ON api_blogpost USING gin (UPPER(category::text) gin_trgm_ops)",
+                "CREATE INDEX api_blogpost_plain_text_upper_trgm ON api_blogpost USING gin (UPPER(plain_text::text) gin_trgm_ops)",
+            ],
+            reverse_sql=[
+                "DROP INDEX IF EXISTS api_blogpost_title_upper_trgm",
+                "DROP INDEX IF EXISTS api_blogpost_subtitle_upper_trgm",
+                "DROP INDEX IF EXISTS api_blogpost_category_upper_trgm",
+                "DROP INDEX IF EXISTS api_blogpost_plain_text_upper_trgm",
+            ],
+        ),
+    ]
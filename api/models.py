@@ -1,13 +1,14 @@
-import uuid
 from django.db import models
 from django.contrib.auth import get_user_model
+from .content import extract_derived_fields
+from .ids import uuid7
 
 User = get_user_model()
 
 
 class Author(models.Model):
     """Author model for blog posts"""
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     name = models.CharField(max_length=255, help_text="Author's name")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -24,7 +25,7 @@ class Author(models.Model):
 
 class Tag(models.Model):
     """Tag model for blog posts"""
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     name = models.CharField(max_length=100, unique=True, help_text="Tag name")
     slug = models.SlugField(max_length=100, unique=True, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -40,6 +41,24 @@ class Tag(models.Model):
         return self.name
 
 
+class BlogPostQuerySet(models.QuerySet):
+    """Keeps the content-derived fields in sync on bulk writes"""
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.update_derived_fields()
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        if 'content' in fields:
+            for obj in objs:
+                obj.update_derived_fields()
+            fields = list(fields) + [name for name in BlogPost.DERIVED_FIELDS if name not in fields]
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+
 class BlogPost(models.Model):
     STATUS_CHOICES = [
         ('draft', 'Draft'),
@@ -47,11 +66,15 @@ class BlogPost(models.Model):
         ('archived', 'Archived'),
     ]
 
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     title = models.CharField(max_length=255)
     slug = models.SlugField(max_length=255, unique=True, db_index=True)
     subtitle = models.CharField(max_length=255, blank=True, null=True)
     content = models.JSONField(help_text="Blog post content in JSON format")
+    plain_text = models.TextField(blank=True, default='', editable=False, help_text="Text extracted from content")
+    word_count = models.PositiveIntegerField(default=0, editable=False)
+    read_time = models.PositiveIntegerField(default=0, editable=False, help_text="Estimated reading time in minutes")
+    excerpt = models.TextField(blank=True, default='', editable=False, help_text="Short plain-text summary of the content")
     author = models.ForeignKey(
         'Author',
         on_delete=models.CASCADE,
@@ -93,22 +116,41 @@ class BlogPost(models.Model):
         blank=True
     )
 
+    objects = BlogPostQuerySet.as_manager()
+
+    # Fields computed from content by update_derived_fields()
+    DERIVED_FIELDS = ['plain_text', 'word_count', 'read_time', 'excerpt']
+
     class Meta:
-        ordering = ['-created_at']
+        ordering = ['-created_at', '-id']
         indexes = [
             models.Index(fields=['slug']),
             models.Index(fields=['status']),
             models.Index(fields=['published_at']),
             models.Index(fields=['category']),
+            models.Index(fields=['updated_at', 'id']),
+            models.Index(fields=['featured_image']),
         ]
 
     def __str__(self):
         return self.title
 
+    def update_derived_fields(self):
+        """Recompute plain text, word count, read time and excerpt from content"""
+        for name, value in extract_derived_fields(self.content).items():
+            setattr(self, name, value)
+
+    def save(self, *args, **kwargs):
+        self.update_derived_fields()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'content' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | set(self.DERIVED_FIELDS)
+        super().save(*args, **kwargs)
+
 
 class Comment(models.Model):
     """Comment model for blog posts"""
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     blog_post = models.ForeignKey(
         'BlogPost',
         on_delete=models.CASCADE,
@@ -123,7 +165,7 @@ class Comment(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        ordering = ['-created_at']
+        ordering = ['-created_at', '-id']
         indexes = [
             models.Index(fields=['blog_post', 'created_at']),
             models.Index(fields=['is_approved']),
@@ -131,3 +173,271 @@ class Comment(models.Model):
 
     def __str__(self):
         return f"Comment by {self.name} on {self.blog_post.title}"
+
+
+class FeedArtifact(models.Model):
+    """Precomputed RSS/Atom feed or sitemap document"""
+    key = models.CharField(max_length=255, unique=True, help_text="Artifact key, e.g. 'rss:tag:django' or 'sitemap:2025-01'")
+    content_type = models.CharField(max_length=100)
+    body = models.TextField()
+    etag = models.CharField(max_length=64)
+    last_modified = models.DateTimeField(help_text="When the content of this artifact last changed")
+    generated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['key']
+
+    def __str__(self):
+        return self.key
+
+
+class RelatedPost(models.Model):
+    """Precomputed top-k similar posts for a blog post"""
+    post = models.ForeignKey(
+        'BlogPost',
+        on_delete=models.CASCADE,
+        related_name='related_entries',
+        help_text="Post the neighbours belong to"
+    )
+    related = models.ForeignKey(
+        'BlogPost',
+        on_delete=models.CASCADE,
+        related_name='+',
+        help_text="Similar post"
+    )
+    score = models.FloatField(help_text="Cosine similarity over tags and category")
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        ordering = ['post', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'rank'], name='api_relatedpost_post_rank_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.post_id} -> {self.related_id} ({self.score:.3f})"
+
+
+class PostViewCount(models.Model):
+    """Number of views of a blog post within one time bucket"""
+    post = models.ForeignKey(
+        'BlogPost',
+        on_delete=models.CASCADE,
+        related_name='view_counts',
+    )
+    bucket = models.DateTimeField(help_text="Start of the counting interval")
+    count = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-bucket']
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'bucket'], name='api_postviewcount_post_bucket_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['bucket']),
+        ]
+
+    def __str__(self):
+        return f"{self.post_id} @ {self.bucket:%Y-%m-%d %H:%M}: {self.count}"
+
+
+class PostPopularity(models.Model):
+    """Running totals used to rank popular and trending posts"""
+    post = models.OneToOneField(
+        'BlogPost',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='popularity',
+    )
+    total_views = models.PositiveBigIntegerField(default=0)
+    trending_score = models.FloatField(
+        default=0.0,
+        help_text="Log of the exponentially time-decayed view count (see api.hitcount)"
+    )
+    last_viewed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = 'post popularity'
+        indexes = [
+            models.Index(fields=['-total_views']),
+            models.Index(fields=['-trending_score']),
+        ]
+
+    def __str__(self):
+        return f"{self.post_id}: {self.total_views} views"
+
+
+class SlugRedirect(models.Model):
+    """Former slug of a blog post, kept so old URLs keep resolving"""
+    old_slug = models.SlugField(max_length=255, unique=True)
+    post = models.ForeignKey(
+        'BlogPost',
+        on_delete=models.CASCADE,
+        related_name='slug_redirects',
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.old_slug} -> {self.post_id}"
+
+
+class PostTombstone(models.Model):
+    """Record of a published post that was deleted or unpublished, for the change feed"""
+    REASON_CHOICES = [
+        ('deleted', 'Deleted'),
+        ('unpublished', 'Unpublished'),
+    ]
+
+    post_id = models.UUIDField(db_index=True)
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.post_id} {self.reason}"
+
+
+class PurgeTask(models.Model):
+    """Pending cache purge of one URL key for one webhook target"""
+    target = models.URLField(max_length=500)
+    key = models.CharField(max_length=500, help_text="URL path to purge")
+    attempts = models.PositiveIntegerField(default=0)
+    enqueued_at = models.DateTimeField(help_text="Last time this key was enqueued")
+    next_attempt_at = models.DateTimeField()
+    last_error = models.TextField(blank=True, default='')
+
+    class Meta:
+        ordering = ['next_attempt_at']
+        constraints = [
+            models.UniqueConstraint(fields=['target', 'key'], name='api_purgetask_target_key_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.key} -> {self.target}"
+
+
+class BulkJob(models.Model):
+    """Admin bulk action applied in the background, one primary-key chunk at a time"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    action = models.CharField(max_length=100)
+    object_ids = models.JSONField(default=list, help_text="Primary keys of the rows to change")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    total = models.PositiveIntegerField(null=True, blank=True)
+    processed = models.PositiveIntegerField(default=0)
+    last_pk = models.CharField(max_length=64, blank=True, default='', help_text="Last primary key processed")
+    error = models.TextField(blank=True, default='')
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        related_name='bulk_jobs',
+        null=True,
+        blank=True
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(
+        null=True, blank=True, help_text="Last time the running worker committed a chunk"
+    )
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.action} ({self.get_status_display()})"
+
+
+class PostRevision(models.Model):
+    """Stored state of a blog post after an admin edit: a full snapshot or a delta to the previous revision"""
+    KIND_CHOICES = [
+        ('snapshot', 'Snapshot'),
+        ('delta', 'Delta'),
+    ]
+
+    post = models.ForeignKey(BlogPost, on_delete=models.CASCADE, related_name='revisions')
+    number = models.PositiveIntegerField()
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    snapshot_number = models.PositiveIntegerField(help_text="Number of the snapshot this revision's delta chain starts from")
+    data = models.BinaryField(help_text="zlib-compressed JSON state or delta")
+    digest = models.CharField(max_length=40, help_text="SHA-1 of the full state")
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        related_name='post_revisions',
+        null=True,
+        blank=True
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['post', '-number']
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'number'], name='api_postrevision_post_number_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.post_id} #{self.number}"
+
+
+class ImageAsset(models.Model):
+    """Stored image file, shared by every upload with the same content"""
+    sha256 = models.CharField(max_length=64, unique=True)
+    file = models.ImageField(upload_to='blog_images/')
+    size = models.PositiveBigIntegerField()
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.file.name
+
+
+class ImageUpload(models.Model):
+    """Resumable chunked upload of a featured image, buffered in a temporary file until complete"""
+    STATUS_CHOICES = [
+        ('uploading', 'Uploading'),
+        ('complete', 'Complete'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField(help_text="Total size in bytes")
+    offset = models.PositiveBigIntegerField(default=0, help_text="Bytes received so far")
+    sha256 = models.CharField(max_length=64, blank=True, default='', help_text="Expected SHA-256 of the whole file")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploading')
+    asset = models.ForeignKey(ImageAsset, on_delete=models.SET_NULL, related_name='uploads', null=True, blank=True)
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        related_name='image_uploads',
+        null=True,
+        blank=True
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'updated_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size})"
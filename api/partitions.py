@@ -0,0 +1,159 @@
+"""
+Monthly range partitioning of the Comment table (PostgreSQL only).
+
+`manage.py partition_comments` converts api_comment into a table
+partitioned by month of `created_at`, keeps partitions created
+COMMENT_PARTITIONS_AHEAD months ahead, and moves partitions older than
+COMMENT_HOT_MONTHS to COMMENT_COLD_TABLESPACE.
+
+Partitions stay attached, so list_comments, the admin and every ORM query
+read them as before. The only schema difference is the primary key, which
+becomes (id, created_at) because PostgreSQL requires the partition key in
+unique constraints; ids are UUIDv7s generated by api.ids, so they stay unique.
+
+Partitions are named api_comment_pYYYY_MM; api_comment_default catches rows
+outside the existing ranges and is emptied into a monthly partition when
+that partition is created.
+"""
+import re
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import connection, transaction
+
+from .models import Comment
+
+TABLE = Comment._meta.db_table
+DEFAULT_PARTITION = f'{TABLE}_default'
+PARTITION_RE = re.compile(rf'^{TABLE}_p(?P<year>\d{{4}})_(?P<month>\d{{2}})$')
+
+
+def month_start(moment):
+    return datetime(moment.year, moment.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(month):
+    return f'{TABLE}_p{month:%Y_%m}'
+
+
+def _q(name):
+    return connection.ops.quote_name(name)
+
+
+def is_partitioned(cursor):
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = %s::regclass", [TABLE])
+    return cursor.fetchone()[0] == 'p'
+
+
+def existing_partitions(cursor):
+    """Names of the partitions currently attached to the comment table"""
+    cursor.execute(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = %s::regclass",
+        [TABLE],
+    )
+    return {row[0] for row in cursor.fetchall()}
+
+
+def _create_partition(cursor, parent, month):
+    """
+    Create a monthly partition, moving matching rows out of the default
+    partition first. All in one transaction, so the moved rows are never
+    visible outside both partitions.
+    """
+    name = partition_name(month)
+    lower, upper = month, add_months(month, 1)
+    with transaction.atomic():
+        cursor.execute(f'CREATE TABLE {_q(name)} (LIKE {_q(parent)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+        cursor.execute(
+            f'WITH moved AS (DELETE FROM {_q(DEFAULT_PARTITION)} WHERE created_at >= %s AND created_at < %s RETURNING *) '
+            f'INSERT INTO {_q(name)} SELECT * FROM moved',
+            [lower, upper],
+        )
+        cursor.execute(
+            f'ALTER TABLE {_q(parent)} ATTACH PARTITION {_q(name)} FOR VALUES FROM (%s) TO (%s)',
+            [lower, upper],
+        )
+    return name
+
+
+def ensure_partitions(cursor, until):
+    """Create missing monthly partitions from the current month up to `until` (inclusive)"""
+    existing = existing_partitions(cursor)
+    created = []
+    month = month_start(datetime.now(dt_timezone.utc))
+    while month <= until:
+        if partition_name(month) not in existing:
+            created.append(_create_partition(cursor, TABLE, month))
+        month = add_months(month, 1)
+    return created
+
+
+def convert(cursor, ahead):
+    """
+    Rebuild the comment table as a partitioned table and copy all rows.
+    Runs in one transaction and locks the table until it finishes.
+    """
+    constraints = connection.introspection.get_constraints(cursor, TABLE)
+    new = f'{TABLE}_partitioned'
+    with transaction.atomic():
+        cursor.execute(
+            f'CREATE TABLE {_q(new)} (LIKE {_q(TABLE)} INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)'
+        )
+        cursor.execute(f'CREATE TABLE {_q(DEFAULT_PARTITION)} PARTITION OF {_q(new)} DEFAULT')
+        cursor.execute(f'SELECT min(created_at) FROM {_q(TABLE)}')
+        oldest = cursor.fetchone()[0]
+        month = month_start(oldest) if oldest else month_start(datetime.now(dt_timezone.utc))
+        until = add_months(month_start(datetime.now(dt_timezone.utc)), ahead)
+        partitions = []
+        while month <= until:
+            partitions.append(_create_partition(cursor, new, month))
+            month = add_months(month, 1)
+        cursor.execute(f'INSERT INTO {_q(new)} SELECT * FROM {_q(TABLE)}')
+        cursor.execute(f'DROP TABLE {_q(TABLE)}')
+        cursor.execute(f'ALTER TABLE {_q(new)} RENAME TO {_q(TABLE)}')
+
+        # Recreate the constraints and indexes under their original names
+        for name, info in constraints.items():
+            columns = ', '.join(_q(column) for column in info['columns'])
+            if info['primary_key']:
+                cursor.execute(
+                    f'ALTER TABLE {_q(TABLE)} ADD CONSTRAINT {_q(name)} PRIMARY KEY ({columns}, created_at)'
+                )
+            elif info['foreign_key']:
+                target_table, target_column = info['foreign_key']
+                cursor.execute(
+                    f'ALTER TABLE {_q(TABLE)} ADD CONSTRAINT {_q(name)} FOREIGN KEY ({columns}) '
+                    f'REFERENCES {_q(target_table)} ({_q(target_column)}) DEFERRABLE INITIALLY DEFERRED'
+                )
+            elif info['index'] and not info['unique']:
+                cursor.execute(f'CREATE INDEX {_q(name)} ON {_q(TABLE)} ({columns})')
+    return partitions
+
+
+def move_to_cold(cursor, before, tablespace):
+    """Move partitions that end on or before `before` (and their indexes) to a tablespace"""
+    cursor.execute(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "LEFT JOIN pg_tablespace t ON t.oid = c.reltablespace "
+        "WHERE i.inhparent = %s::regclass AND c.relname <> %s AND t.spcname IS DISTINCT FROM %s",
+        [TABLE, DEFAULT_PARTITION, tablespace],
+    )
+    moved = []
+    for (name,) in cursor.fetchall():
+        match = PARTITION_RE.match(name)
+        if not match:
+            continue
+        month = datetime(int(match['year']), int(match['month']), 1, tzinfo=dt_timezone.utc)
+        if add_months(month, 1) > before:
+            continue
+        cursor.execute(f'ALTER TABLE {_q(name)} SET TABLESPACE {_q(tablespace)}')
+        cursor.execute('SELECT indexname FROM pg_indexes WHERE tablename = %s', [name])
+        for (index,) in cursor.fetchall():
+            cursor.execute(f'ALTER INDEX {_q(index)} SET TABLESPACE {_q(tablespace)}')
+        moved.append(name)
+    return sorted(moved)
@@ -0,0 +1,169 @@
+"""
+Static JSON snapshots of the public API for CDN / object-store offload.
+
+Files mirror the API URLs under the output directory:
+
+    /api/posts/{id}/                    -> api/posts/{id}/index.json
+    /api/posts/                         -> api/posts/index.json
+    /api/posts/?category=tech&page=2    -> api/posts/_q/category=tech&page=2.json
+
+Query strings are sorted and URL-encoded, and page 1 omits the `page`
+parameter, so a CDN rewrite rule can map any list URL to its file.
+Each file gets `.gz` (and `.br` when the `brotli` package is installed)
+siblings. A manifest of content hashes is kept in the output directory so
+re-runs only rewrite files whose content changed.
+"""
+import gzip
+import hashlib
+import json
+import os
+from urllib.parse import urlencode, urlsplit
+
+from django.apps import apps
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+MANIFEST_NAME = '.publish-manifest.json'
+
+# Per-worker state, set by init_worker()
+_worker = {}
+
+
+def detail_path(post_id):
+    return f'api/posts/{post_id}/index.json'
+
+
+def list_path(params):
+    """Output path of a list page; `params` must not contain page=1"""
+    if not params:
+        return 'api/posts/index.json'
+    return f'api/posts/_q/{urlencode(sorted(params.items()))}.json'
+
+
+def list_url(base_url, params, page):
+    if page is None:
+        return None
+    query = dict(params)
+    if page > 1:
+        query['page'] = page
+    suffix = f'?{urlencode(sorted(query.items()))}' if query else ''
+    return f'{base_url.rstrip("/")}/api/posts/{suffix}'
+
+
+def load_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME)) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    with open(path + '.tmp', 'w') as fh:
+        json.dump(manifest, fh, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'wb') as fh:
+        fh.write(data)
+    os.replace(path + '.tmp', path)
+
+
+def write_file(output_dir, relpath, data, previous_hash):
+    """Write a file and its compressed siblings unless the content is unchanged. Returns (hash, written)."""
+    digest = hashlib.sha256(data).hexdigest()
+    path = os.path.join(output_dir, relpath)
+    if digest == previous_hash and os.path.exists(path):
+        return digest, False
+    _write_atomic(path, data)
+    _write_atomic(path + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+        _write_atomic(path + '.br', brotli.compress(data))
+    return digest, True
+
+
+def remove_file(output_dir, relpath):
+    for suffix in ('', '.gz', '.br'):
+        try:
+            os.remove(os.path.join(output_dir, relpath + suffix))
+        except FileNotFoundError:
+            pass
+
+
+def init_worker(output_dir, base_url, manifest):
+    """Process pool initializer: set up Django and drop DB connections inherited from the parent"""
+    if not apps.ready:
+        import django
+        django.setup()
+    from django.db import connections
+    connections.close_all()
+
+    parts = urlsplit(base_url)
+    factory = RequestFactory()
+    _worker.update({
+        'output_dir': output_dir,
+        'base_url': base_url,
+        'manifest': manifest,
+        'request': Request(factory.get('/', HTTP_HOST=parts.netloc, secure=parts.scheme == 'https')),
+        'renderer': JSONRenderer(),
+    })
+
+
+def _emit(relpath, payload):
+    data = _worker['renderer'].render(payload)
+    digest, written = write_file(_worker['output_dir'], relpath, data, _worker['manifest'].get(relpath))
+    return relpath, digest, written
+
+
+def render_details(post_ids):
+    """Worker task: render detail JSON for a chunk of posts"""
+    from .models import BlogPost
+    from .serializers import BlogPostSerializer
+
+    posts = (
+        BlogPost.objects.filter(pk__in=post_ids, status='published')
+        .select_related('author', 'created_by', 'updated_by')
+        .prefetch_related('tags')
+    )
+    context = {'request': _worker['request']}
+    return [_emit(detail_path(post.pk), BlogPostSerializer(post, context=context).data) for post in posts]
+
+
+def render_list_pages(params, pages):
+    """Worker task: render the first `pages` list pages for a filter combination"""
+    from .models import BlogPost
+    from .serializers import BlogPostListSerializer
+
+    queryset = BlogPost.objects.filter(status='published')
+    if 'category' in params:
+        queryset = queryset.filter(category=params['category'])
+    if 'tag' in params:
+        queryset = queryset.filter(tags__slug=params['tag'])
+    count = queryset.count()
+    page_size = api_settings.PAGE_SIZE
+    last_page = max(1, -(-count // page_size))
+    queryset = queryset.select_related('author').prefetch_related('tags').order_by('-created_at', '-id')
+
+    results = []
+    context = {'request': _worker['request']}
+    for page in range(1, min(pages, last_page) + 1):
+        offset = (page - 1) * page_size
+        payload = {
+            'count': count,
+            'next': list_url(_worker['base_url'], params, page + 1 if page < last_page else None),
+            'previous': list_url(_worker['base_url'], params, page - 1 if page > 1 else None),
+            'results': BlogPostListSerializer(queryset[offset:offset + page_size], many=True, context=context).data,
+        }
+        query = dict(params, page=page) if page > 1 else params
+        results.append(_emit(list_path(query), payload))
+    return results
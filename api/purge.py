@@ -0,0 +1,172 @@
+"""
+Outbound cache invalidation.
+
+Content changes enqueue the URL keys they affect as PurgeTask rows (one per
+configured webhook target), after the surrounding transaction commits.
+Re-enqueuing a pending key only refreshes it, so bursts of edits collapse
+into a single purge. `manage.py run_purge_worker` claims due keys in a short
+transaction and sends them in batches outside of it:
+
+    POST <target>
+    {"keys": ["/api/posts/<id>/", "/api/posts/", ...]}
+
+with an `X-Signature: sha256=<hmac>` header when PURGE_WEBHOOK_SECRET is
+set. Failed batches are retried with exponential backoff. Keys ending in
+`/` that name a collection (e.g. `/api/posts/`) are meant as prefix purges
+covering all query-string variants.
+"""
+import hashlib
+import hmac
+import json
+import logging
+import random
+import urllib.error
+import urllib.request
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import PurgeTask
+
+logger = logging.getLogger(__name__)
+
+POSTS_KEY = '/api/posts/'
+FEEDS_KEY = '/api/feeds/'
+SITEMAP_KEYS = ['/api/sitemap.xml', '/api/sitemaps/']
+
+
+def post_keys(post, previous_slug=None):
+    """URL keys affected by a change to a blog post"""
+    keys = {
+        POSTS_KEY,
+        f'/api/posts/{post.pk}/',
+        f'/api/posts/{post.slug}/',
+        FEEDS_KEY,
+        *SITEMAP_KEYS,
+    }
+    if previous_slug and previous_slug != post.slug:
+        keys.add(f'/api/posts/{previous_slug}/')
+    return keys
+
+
+def tag_keys(tag):
+    return {POSTS_KEY, f'/api/feeds/tag/{tag.slug}/'}
+
+
+def comment_keys(post_id):
+    """Approved comments are listed and counted on the post"""
+    return {f'/api/posts/{post_id}/comments/list/', f'/api/posts/{post_id}/'}
+
+
+def enqueue(keys):
+    """Queue URL keys for purging once the current transaction commits"""
+    keys = sorted(set(keys))
+    if keys and settings.PURGE_WEBHOOK_TARGETS:
+        transaction.on_commit(lambda: _insert(keys))
+
+
+def _insert(keys):
+    # Only new rows start due now: a pending key keeps its schedule, so keys that
+    # are backing off or claimed by a worker are not retried early or sent twice
+    now = timezone.now()
+    PurgeTask.objects.bulk_create(
+        [
+            PurgeTask(target=target, key=key, enqueued_at=now, next_attempt_at=now)
+            for target in settings.PURGE_WEBHOOK_TARGETS
+            for key in keys
+        ],
+        update_conflicts=True,
+        unique_fields=['target', 'key'],
+        update_fields=['enqueued_at'],
+    )
+
+
+def _sign(body):
+    secret = settings.PURGE_WEBHOOK_SECRET
+    if not secret:
+        return {}
+    digest = hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+    return {'X-Signature': f'sha256={digest}'}
+
+
+def send(target, keys):
+    """POST a batch of keys to a target; raises on failure"""
+    body = json.dumps({'keys': keys}).encode('utf-8')
+    request = urllib.request.Request(
+        target,
+        data=body,
+        method='POST',
+        headers={'Content-Type': 'application/json', **_sign(body)},
+    )
+    with urllib.request.urlopen(request, timeout=settings.PURGE_WEBHOOK_TIMEOUT) as response:
+        if not 200 <= response.status < 300:
+            raise urllib.error.HTTPError(target, response.status, 'Unexpected status', response.headers, None)
+
+
+def backoff(attempts):
+    """Delay before the next attempt, with jitter"""
+    delay = min(settings.PURGE_BACKOFF_BASE * (2 ** (attempts - 1)), settings.PURGE_BACKOFF_MAX)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def claim(target, batch_size):
+    """
+    Claim up to `batch_size` due keys of a target by moving their next attempt
+    PURGE_CLAIM_TIMEOUT ahead, so other workers skip them while the batch is
+    sent. The row locks are only held for this short transaction.
+    """
+    with transaction.atomic():
+        claimed_at = timezone.now()
+        tasks = list(
+            PurgeTask.objects.select_for_update(skip_locked=True)
+            .filter(target=target, next_attempt_at__lte=claimed_at)
+            .order_by('next_attempt_at')[:batch_size]
+        )
+        if tasks:
+            PurgeTask.objects.filter(pk__in=[task.pk for task in tasks]).update(
+                next_attempt_at=claimed_at + timedelta(seconds=settings.PURGE_CLAIM_TIMEOUT)
+            )
+    return claimed_at, tasks
+
+
+def process_due(batch_size=None):
+    """Send one batch of due keys per target. Returns (sent, failed) key counts."""
+    batch_size = batch_size or settings.PURGE_BATCH_SIZE
+    sent = failed = 0
+    for target in settings.PURGE_WEBHOOK_TARGETS:
+        claimed_at, tasks = claim(target, batch_size)
+        if not tasks:
+            continue
+        try:
+            send(target, [task.key for task in tasks])
+        except Exception as exc:
+            failed += len(tasks)
+            _reschedule(tasks, exc)
+        else:
+            sent += len(tasks)
+            pks = [task.pk for task in tasks]
+            PurgeTask.objects.filter(pk__in=pks, enqueued_at__lt=claimed_at).delete()
+            # Keys enqueued again while the batch was in flight are purged again right away
+            PurgeTask.objects.filter(pk__in=pks).update(next_attempt_at=timezone.now(), attempts=0, last_error='')
+    return sent, failed
+
+
+def _reschedule(tasks, exc):
+    now = timezone.now()
+    dropped = []
+    for task in tasks:
+        task.attempts += 1
+        task.last_error = str(exc)[:1000]
+        task.next_attempt_at = now + backoff(task.attempts)
+        if task.attempts >= settings.PURGE_MAX_ATTEMPTS:
+            dropped.append(task.pk)
+    if dropped:
+        logger.error('Dropping %d purge keys for %s after %d attempts: %s',
+                     len(dropped), tasks[0].target, settings.PURGE_MAX_ATTEMPTS, exc)
+        PurgeTask.objects.filter(pk__in=dropped).delete()
+    PurgeTask.objects.bulk_update(
+        [task for task in tasks if task.pk not in dropped],
+        ['attempts', 'last_error', 'next_attempt_at'],
+    )
@@ -0,0 +1,168 @@
+"""
+Related-posts index.
+
+Each published post is a sparse binary vector over its tags plus its
+category (weighted by RELATED_POSTS_CATEGORY_WEIGHT). Similarity is the
+cosine of two vectors, computed only between posts that share at least one
+feature (via an inverted index), and the top RELATED_POSTS_TOP_K neighbours
+are stored as RelatedPost rows so retrieval is a single indexed lookup.
+"""
+import heapq
+import math
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import BlogPost, RelatedPost
+
+BATCH_SIZE = 500
+
+
+def _category_feature(category):
+    return f'category:{category}'
+
+
+def load_features(post_ids=None):
+    """
+    Return {post_id: {feature: weight}} for published posts.
+    With `post_ids`, only those posts are loaded.
+    """
+    posts = BlogPost.objects.filter(status='published')
+    through = BlogPost.tags.through.objects.filter(blogpost__status='published')
+    if post_ids is not None:
+        posts = posts.filter(pk__in=post_ids)
+        through = through.filter(blogpost_id__in=post_ids)
+
+    category_weight = settings.RELATED_POSTS_CATEGORY_WEIGHT
+    features = {}
+    for post_id, category in posts.order_by().values_list('id', 'category'):
+        features[post_id] = {_category_feature(category): category_weight}
+    for post_id, tag_id in through.values_list('blogpost_id', 'tag_id'):
+        if post_id in features:
+            features[post_id][f'tag:{tag_id}'] = 1.0
+    return features
+
+
+def candidate_ids(post_ids):
+    """Published posts sharing a tag or the category with any of the given posts"""
+    posts = BlogPost.objects.filter(pk__in=post_ids)
+    tag_ids = BlogPost.tags.through.objects.filter(blogpost_id__in=post_ids).values('tag_id')
+    categories = posts.values('category')
+    published = BlogPost.objects.filter(status='published')
+    ids = set(published.filter(tags__in=tag_ids).values_list('id', flat=True))
+    ids |= set(published.filter(category__in=categories).values_list('id', flat=True))
+    return ids
+
+
+def _norms(features):
+    return {
+        post_id: math.sqrt(sum(weight * weight for weight in vector.values()))
+        for post_id, vector in features.items()
+    }
+
+
+def _inverted_index(features):
+    index = defaultdict(list)
+    for post_id, vector in features.items():
+        for feature, weight in vector.items():
+            index[feature].append((post_id, weight))
+    return index
+
+
+def top_neighbours(post_id, features, index, norms, k):
+    """Return [(score, neighbour_id)] for the k most similar posts"""
+    vector = features.get(post_id)
+    if not vector or not norms[post_id]:
+        return []
+    dots = defaultdict(float)
+    for feature, weight in vector.items():
+        for other_id, other_weight in index[feature]:
+            if other_id != post_id:
+                dots[other_id] += weight * other_weight
+    scored = ((dot / (norms[post_id] * norms[other_id]), other_id) for other_id, dot in dots.items())
+    return heapq.nlargest(k, scored, key=lambda item: (item[0], str(item[1])))
+
+
+def _write(neighbours):
+    """Replace the stored neighbours of the given posts"""
+    with transaction.atomic():
+        RelatedPost.objects.filter(post_id__in=list(neighbours)).delete()
+        RelatedPost.objects.bulk_create([
+            RelatedPost(post_id=post_id, related_id=related_id, score=score, rank=rank)
+            for post_id, ranked in neighbours.items()
+            for rank, (score, related_id) in enumerate(ranked)
+        ])
+
+
+def _compute(post_ids, features):
+    index = _inverted_index(features)
+    norms = _norms(features)
+    k = settings.RELATED_POSTS_TOP_K
+    post_ids = list(post_ids)
+    for start in range(0, len(post_ids), BATCH_SIZE):
+        batch = post_ids[start:start + BATCH_SIZE]
+        _write({post_id: top_neighbours(post_id, features, index, norms, k) for post_id in batch})
+
+
+def _insert_changed(changed, features, exclude):
+    """
+    Add changed posts to the stored neighbours of the other posts sharing a
+    feature with them, where they beat the current k-th neighbour. Those
+    posts do not list a changed post yet, so nothing else in their top-k moves.
+    """
+    index = _inverted_index(features)
+    norms = _norms(features)
+    k = settings.RELATED_POSTS_TOP_K
+    offers = defaultdict(list)
+    for post_id in changed:
+        for score, other_id in top_neighbours(post_id, features, index, norms, len(features)):
+            if other_id not in exclude:
+                offers[other_id].append((score, post_id))
+    if not offers:
+        return
+
+    current = defaultdict(list)
+    rows = RelatedPost.objects.filter(post_id__in=list(offers)).values_list('post_id', 'related_id', 'score')
+    for post_id, related_id, score in rows:
+        current[post_id].append((score, related_id))
+
+    key = lambda item: (item[0], str(item[1]))  # noqa: E731 - the tie-break top_neighbours uses
+    updated = {}
+    for post_id, offered in offers.items():
+        ranked = heapq.nlargest(k, current[post_id] + offered, key=key)
+        if ranked != heapq.nlargest(k, current[post_id], key=key):
+            updated[post_id] = ranked
+    posts = list(updated)
+    for start in range(0, len(posts), BATCH_SIZE):
+        _write({post_id: updated[post_id] for post_id in posts[start:start + BATCH_SIZE]})
+
+
+def refresh(post_ids):
+    """
+    Update the index after the given posts changed tags, category or status.
+
+    The changed posts, and the posts currently listing one of them as a
+    neighbour, are recomputed. Every other post sharing a feature with a
+    changed post only gains it as a neighbour when its score beats the
+    post's k-th one, so a save costs one pass over the changed posts'
+    candidates rather than recomputing each of them.
+    """
+    changed = set(post_ids)
+    if not changed:
+        return
+    listing = set(RelatedPost.objects.filter(related_id__in=changed).values_list('post_id', flat=True))
+    recompute = changed | listing
+    # Candidates of the recomputed posts are needed to score them
+    features = load_features(recompute | candidate_ids(recompute))
+    # Posts that are no longer published end up with no neighbours
+    _compute(recompute, features)
+    _insert_changed(changed, features, recompute)
+
+
+def rebuild_all():
+    """Recompute the whole index"""
+    features = load_features()
+    RelatedPost.objects.exclude(post__status='published').delete()
+    _compute(features, features)
+    return len(features)
@@ -0,0 +1,225 @@
+"""
+Server-side rendering of BlogPost.content blocks to HTML.
+
+Inline markup inside block text is sanitized against a small allowlist
+(formatting tags and links with safe URL schemes); everything else is
+escaped. Rendered HTML is cached under (post id, updated_at,
+RENDERER_VERSION), so any edit or a renderer change simply misses the cache.
+Posts are rendered on save, on a cache miss, and in bulk by
+`manage.py prerender_content`. Bump RENDERER_VERSION whenever the output
+of the renderer changes.
+"""
+import logging
+from html import escape
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.dateparse import parse_datetime
+
+from .content import iter_blocks
+
+logger = logging.getLogger(__name__)
+
+RENDERER_VERSION = 1
+
+INLINE_TAGS = {'a', 'b', 'strong', 'i', 'em', 'u', 's', 'code', 'mark', 'sub', 'sup', 'br'}
+VOID_TAGS = {'br'}
+# Tags whose contents are dropped rather than escaped
+DROP_CONTENT_TAGS = {'script', 'style'}
+SAFE_SCHEMES = {'', 'http', 'https', 'mailto'}
+
+
+def _text(value):
+    """Block data comes from stored JSON; anything but a string renders as nothing"""
+    return value if isinstance(value, str) else ''
+
+
+def _items(value):
+    return value if isinstance(value, list) else []
+
+
+def safe_url(url):
+    """Return the URL if its scheme is allowed, otherwise an empty string"""
+    url = _text(url).strip()
+    try:
+        scheme = urlsplit(url).scheme.lower()
+    except ValueError:
+        return ''
+    return url if scheme in SAFE_SCHEMES else ''
+
+
+class _InlineSanitizer(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.out = []
+        self.open = []
+        self.dropping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping += 1
+            return
+        if tag not in INLINE_TAGS:
+            return
+        if tag in VOID_TAGS:
+            self.out.append(f'<{tag}>')
+            return
+        if tag == 'a':
+            href = safe_url(dict(attrs).get('href'))
+            if not href:
+                return
+            self.out.append(f'<a href="{escape(href)}" rel="nofollow noopener">')
+        else:
+            self.out.append(f'<{tag}>')
+        self.open.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in VOID_TAGS:
+            self.out.append(f'<{tag}>')
+
+    def handle_endtag(self, tag):
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping = max(self.dropping - 1, 0)
+            return
+        if tag not in self.open:
+            return
+        while self.open:
+            current = self.open.pop()
+            self.out.append(f'</{current}>')
+            if current == tag:
+                break
+
+    def handle_data(self, data):
+        if not self.dropping:
+            self.out.append(escape(data, quote=False))
+
+    def result(self):
+        self.close()
+        self.out.extend(f'</{tag}>' for tag in reversed(self.open))
+        return ''.join(self.out)
+
+
+def sanitize_inline(value):
+    """Keep allowlisted inline markup of a text value and escape everything else"""
+    if not isinstance(value, str):
+        return ''
+    parser = _InlineSanitizer()
+    parser.feed(value)
+    return parser.result()
+
+
+def _list_items(items, ordered):
+    tag = 'ol' if ordered else 'ul'
+    rendered = []
+    for item in _items(items):
+        if isinstance(item, dict):
+            # Nested list items: {"content": "...", "items": [...]}
+            text = sanitize_inline(item.get('content') or item.get('text'))
+            nested = _list_items(item.get('items'), ordered) if item.get('items') else ''
+            rendered.append(f'<li>{text}{nested}</li>')
+        else:
+            rendered.append(f'<li>{sanitize_inline(item)}</li>')
+    return f'<{tag}>{"".join(rendered)}</{tag}>'
+
+
+def _figure(src, caption):
+    src = safe_url(src)
+    if not src:
+        return ''
+    caption = _text(caption)
+    caption_html = f'<figcaption>{sanitize_inline(caption)}</figcaption>' if caption else ''
+    return f'<figure><img src="{escape(src)}" alt="{escape(caption)}" loading="lazy">{caption_html}</figure>'
+
+
+def render_block(block):
+    block_type = block.get('type')
+    data = block.get('data')
+    if not isinstance(data, dict):
+        data = {'text': data}
+
+    if block_type == 'paragraph':
+        return f'<p>{sanitize_inline(data.get("text"))}</p>'
+    if block_type == 'header':
+        try:
+            level = min(max(int(data.get('level', 2)), 1), 6)
+        except (TypeError, ValueError):
+            level = 2
+        return f'<h{level}>{sanitize_inline(data.get("text"))}</h{level}>'
+    if block_type == 'list':
+        return _list_items(data.get('items'), data.get('style') == 'ordered')
+    if block_type == 'checklist':
+        items = ''.join(
+            f'<li class="{"checked" if item.get("checked") else "unchecked"}">{sanitize_inline(item.get("text"))}</li>'
+            for item in _items(data.get('items')) if isinstance(item, dict)
+        )
+        return f'<ul class="checklist">{items}</ul>'
+    if block_type == 'quote':
+        caption = sanitize_inline(data.get('caption'))
+        caption_html = f'<cite>{caption}</cite>' if caption else ''
+        return f'<blockquote><p>{sanitize_inline(data.get("text"))}</p>{caption_html}</blockquote>'
+    if block_type == 'code':
+        return f'<pre><code>{escape(_text(data.get("code")))}</code></pre>'
+    if block_type == 'delimiter':
+        return '<hr>'
+    if block_type == 'image':
+        file = data.get('file')
+        src = file.get('url') if isinstance(file, dict) else data.get('url')
+        return _figure(src, data.get('caption'))
+    if block_type == 'embed':
+        source = safe_url(_text(data.get('source')) or data.get('embed'))
+        if not source:
+            return ''
+        caption = sanitize_inline(data.get('caption')) or escape(source)
+        return f'<p class="embed"><a href="{escape(source)}" rel="nofollow noopener">{caption}</a></p>'
+    if block_type == 'table':
+        rows = [row for row in _items(data.get('content')) if isinstance(row, list)]
+        if not rows:
+            return ''
+        head = ''
+        if data.get('withHeadings'):
+            head = '<thead><tr>' + ''.join(f'<th>{sanitize_inline(cell)}</th>' for cell in rows[0]) + '</tr></thead>'
+            rows = rows[1:]
+        body = ''.join('<tr>' + ''.join(f'<td>{sanitize_inline(cell)}</td>' for cell in row) + '</tr>' for row in rows)
+        return f'<table>{head}<tbody>{body}</tbody></table>'
+    if block_type == 'warning':
+        return (
+            f'<aside class="warning"><strong>{sanitize_inline(data.get("title"))}</strong>'
+            f'<p>{sanitize_inline(data.get("message"))}</p></aside>'
+        )
+    # Unknown blocks (including raw HTML) fall back to their text as a paragraph
+    text = sanitize_inline(data.get('text'))
+    return f'<p>{text}</p>' if text else ''
+
+
+def render_content(content):
+    """Render a content document to sanitized HTML"""
+    return '\n'.join(filter(None, (render_block(block) for block in iter_blocks(content))))
+
+
+def cache_key(post_id, updated_at):
+    if isinstance(updated_at, str):
+        updated_at = parse_datetime(updated_at)
+    return f'api:content-html:{RENDERER_VERSION}:{post_id}:{updated_at.timestamp()}'
+
+
+def get_html(post_id, updated_at, content):
+    """Rendered HTML of a post's content, rendered and cached on a miss"""
+    key = cache_key(post_id, updated_at)
+    html = cache.get(key)
+    if html is None:
+        html = render_content(content)
+        cache.set(key, html, settings.CONTENT_HTML_CACHE_TIMEOUT)
+    return html
+
+
+def prerender(posts):
+    """Render and cache the content of the given posts; a post that fails to render is logged and skipped"""
+    rendered = {}
+    for post in posts:
+        try:
+            rendered[cache_key(post.pk, post.updated_at)] = render_content(post.content)
+        except Exception:
+            logger.exception('Failed to render the content of post %s', post.pk)
+    cache.set_many(rendered, settings.CONTENT_HTML_CACHE_TIMEOUT)
@@ -0,0 +1,262 @@
+"""
+Compact revision history for blog posts.
+
+Each admin edit stores a PostRevision holding either a full snapshot of the
+post state or a delta to the previous revision, as zlib-compressed JSON.
+A snapshot is written every REVISION_SNAPSHOT_INTERVAL revisions, so any
+revision is rebuilt from its snapshot with at most
+REVISION_SNAPSHOT_INTERVAL - 1 delta applications.
+
+Deltas are structural:
+
+    {"v": value}                           replace the value
+    {"d": {key: ["=", value] | ["-"] | ["~", delta]}}
+                                           set, remove or patch dict keys
+    {"l": [["k", start, end] | ["i", [items]], ...]}
+                                           rebuild a list from slices of the
+                                           old list and inserted items
+
+so editing one block of a large `content` document stores only that block.
+
+Writing a revision diffs against the state loaded before the save (no
+revision rebuild). When that state does not match the latest revision,
+e.g. after an admin bulk action, a snapshot is written instead of a delta.
+"""
+import hashlib
+import json
+import zlib
+from difflib import HtmlDiff, SequenceMatcher
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.safestring import mark_safe
+
+from .content import block_text, iter_blocks
+from .models import BlogPost, PostRevision
+
+TRACKED_FIELDS = [
+    'title', 'slug', 'subtitle', 'content', 'category', 'status', 'featured', 'comments_enabled',
+    'meta_title', 'meta_description',
+]
+
+
+def post_state(post, tag_names=None):
+    """JSON-serializable state of a post as tracked by revisions"""
+    state = {field: getattr(post, field) for field in TRACKED_FIELDS}
+    state['author_id'] = str(post.author_id)
+    state['published_at'] = post.published_at.isoformat() if post.published_at else None
+    state['featured_image'] = post.featured_image.name if post.featured_image else None
+    if tag_names is None:
+        tag_names = post.tags.values_list('name', flat=True)
+    state['tags'] = sorted(tag_names)
+    return state
+
+
+def stored_state(post_id):
+    """State of a post as currently stored in the database, or None"""
+    post = BlogPost.objects.filter(pk=post_id).first()
+    return post_state(post) if post is not None else None
+
+
+def _dumps(value):
+    return json.dumps(value, sort_keys=True, separators=(',', ':'), default=str)
+
+
+def digest(state):
+    return hashlib.sha1(_dumps(state).encode('utf-8')).hexdigest()
+
+
+def _pack(value):
+    return zlib.compress(_dumps(value).encode('utf-8'))
+
+
+def _unpack(data):
+    return json.loads(zlib.decompress(bytes(data)))
+
+
+def diff(old, new):
+    """Delta turning `old` into `new`, or None when they are equal"""
+    if old == new:
+        return None
+    if isinstance(old, dict) and isinstance(new, dict):
+        changes = {}
+        for key in old.keys() - new.keys():
+            changes[key] = ['-']
+        for key, value in new.items():
+            if key not in old:
+                changes[key] = ['=', value]
+            elif old[key] != value:
+                nested = diff(old[key], value)
+                # Replacing small values is shorter than describing the change
+                if 'v' in nested:
+                    changes[key] = ['=', value]
+                else:
+                    changes[key] = ['~', nested]
+        return {'d': changes}
+    if isinstance(old, list) and isinstance(new, list):
+        # Most edits touch a few items; only the differing middle is matched item by item
+        start = 0
+        while start < min(len(old), len(new)) and old[start] == new[start]:
+            start += 1
+        end = 0
+        while end < min(len(old), len(new)) - start and old[-end - 1] == new[-end - 1]:
+            end += 1
+        ops = [['k', 0, start]] if start else []
+        old_middle, new_middle = old[start:len(old) - end], new[start:len(new) - end]
+        matcher = SequenceMatcher(
+            None, [_dumps(item) for item in old_middle], [_dumps(item) for item in new_middle], autojunk=False
+        )
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == 'equal':
+                ops.append(['k', start + i1, start + i2])
+            elif tag in ('replace', 'insert'):
+                ops.append(['i', new_middle[j1:j2]])
+        if end:
+            ops.append(['k', len(old) - end, len(old)])
+        return {'l': ops}
+    return {'v': new}
+
+
+def patch(old, delta):
+    """Apply a delta produced by diff()"""
+    if delta is None:
+        return old
+    if 'v' in delta:
+        return delta['v']
+    if 'd' in delta:
+        value = dict(old)
+        for key, change in delta['d'].items():
+            if change[0] == '-':
+                value.pop(key, None)
+            elif change[0] == '=':
+                value[key] = change[1]
+            else:
+                value[key] = patch(value.get(key), change[1])
+        return value
+    result = []
+    for op in delta['l']:
+        if op[0] == 'k':
+            result.extend(old[op[1]:op[2]])
+        else:
+            result.extend(op[1])
+    return result
+
+
+def _write(post, number, state, state_digest, user, previous=None, previous_state=None):
+    """Create revision `number`, as a delta to `previous` when the chain allows it"""
+    interval = settings.REVISION_SNAPSHOT_INTERVAL
+    if previous is not None and number - previous.snapshot_number < interval:
+        return PostRevision.objects.create(
+            post=post, number=number, kind='delta', snapshot_number=previous.snapshot_number,
+            data=_pack(diff(previous_state, state)), digest=state_digest, created_by=user,
+        )
+    return PostRevision.objects.create(
+        post=post, number=number, kind='snapshot', snapshot_number=number,
+        data=_pack(state), digest=state_digest, created_by=user,
+    )
+
+
+def record(post, user=None, base_state=None):
+    """
+    Store the current state of `post` as a new revision.
+    `base_state` is the state before the edit (see stored_state()); it is
+    recorded first when the post has no revisions yet. Returns the new
+    revision, or None when nothing changed.
+    """
+    state = post_state(post)
+    state_digest = digest(state)
+    with transaction.atomic():
+        latest = (
+            PostRevision.objects.select_for_update()
+            .filter(post=post)
+            .only('number', 'snapshot_number', 'digest')
+            .order_by('-number')
+            .first()
+        )
+        if latest is not None and latest.digest == state_digest:
+            return None
+        base_digest = digest(base_state) if base_state is not None else None
+        if latest is None and base_state is not None and base_digest != state_digest:
+            latest = _write(post, 1, base_state, base_digest, None)
+        number = latest.number + 1 if latest is not None else 1
+        if latest is not None and latest.digest == base_digest:
+            return _write(post, number, state, state_digest, user, latest, base_state)
+        return _write(post, number, state, state_digest, user)
+
+
+def rebuild(post_id, number):
+    """State of a post at revision `number`"""
+    revision = PostRevision.objects.only('snapshot_number').get(post_id=post_id, number=number)
+    chain = (
+        PostRevision.objects.filter(post_id=post_id, number__gte=revision.snapshot_number, number__lte=number)
+        .order_by('number')
+        .values_list('kind', 'data')
+    )
+    state = None
+    for kind, data in chain:
+        state = _unpack(data) if kind == 'snapshot' else patch(state, _unpack(data))
+    return state
+
+
+def compact(post_id, keep_after, keep_min):
+    """
+    Drop revisions created before `keep_after`, always keeping the newest
+    `keep_min`, and rewrite the rest as fresh snapshot/delta chains for the
+    current REVISION_SNAPSHOT_INTERVAL. Returns the number of deleted revisions.
+    """
+    interval = settings.REVISION_SNAPSHOT_INTERVAL
+    with transaction.atomic():
+        revisions = list(PostRevision.objects.select_for_update().filter(post_id=post_id).order_by('number'))
+        droppable = len(revisions) - keep_min
+        dropped = []
+        # Revisions are dropped oldest first, so the kept ones always form one history
+        for revision in revisions[:max(droppable, 0)]:
+            if revision.created_at >= keep_after:
+                break
+            dropped.append(revision)
+
+        state = previous_state = None
+        chain_start = None
+        updated = []
+        for index, revision in enumerate(revisions):
+            state = _unpack(revision.data) if revision.kind == 'snapshot' else patch(state, _unpack(revision.data))
+            if index < len(dropped):
+                previous_state = state
+                continue
+            if chain_start is None or revision.number - chain_start >= interval:
+                kind, snapshot_number, data = 'snapshot', revision.number, _pack(state)
+                chain_start = revision.number
+            else:
+                kind, snapshot_number, data = 'delta', chain_start, _pack(diff(previous_state, state))
+            if (kind, snapshot_number) != (revision.kind, revision.snapshot_number):
+                revision.kind, revision.snapshot_number, revision.data = kind, snapshot_number, data
+                updated.append(revision)
+            previous_state = state
+
+        PostRevision.objects.filter(pk__in=[revision.pk for revision in dropped]).delete()
+        PostRevision.objects.bulk_update(updated, ['kind', 'snapshot_number', 'data'])
+    return len(dropped)
+
+
+def _lines(field, value):
+    if field == 'content':
+        return [text for text in (block_text(block) for block in iter_blocks(value)) if text]
+    if isinstance(value, str):
+        return value.splitlines() or ['']
+    return [_dumps(value)]
+
+
+def html_diff(old, new, old_label, new_label):
+    """[(field, html table)] for the fields that differ between two states"""
+    differ = HtmlDiff(wrapcolumn=70)
+    changes = []
+    for field in sorted(old.keys() | new.keys()):
+        if old.get(field) == new.get(field):
+            continue
+        table = differ.make_table(
+            _lines(field, old.get(field)) if field in old else [],
+            _lines(field, new.get(field)),
+            old_label, new_label, context=True, numlines=2,
+        )
+        changes.append((field, mark_safe(table)))
+    return changes
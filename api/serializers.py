@@ -40,6 +40,9 @@ class BlogPostSerializer(serializers.ModelSerializer):
             'slug',
             'subtitle',
             'content',
+            'excerpt',
+            'word_count',
+            'read_time',
             'author_id',
             'author_name',
             'category',
@@ -57,7 +60,7 @@ class BlogPostSerializer(serializers.ModelSerializer):
             'created_by_id',
             'updated_by_id',
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'excerpt', 'word_count', 'read_time', 'created_at', 'updated_at']
 
     def validate_slug(self, value):
         """Ensure slug is unique"""
@@ -125,6 +128,9 @@ class BlogPostListSerializer(serializers.ModelSerializer):
             'title',
             'slug',
             'subtitle',
+            'excerpt',
+            'word_count',
+            'read_time',
             'author_name',
             'category',
             'tags',
@@ -136,6 +142,31 @@ class BlogPostListSerializer(serializers.ModelSerializer):
         ]
 
 
+class BlogPostChangeSerializer(BlogPostListSerializer):
+    """List serializer plus updated_at, for the change feed"""
+    class Meta(BlogPostListSerializer.Meta):
+        fields = BlogPostListSerializer.Meta.fields + ['updated_at']
+
+
+class AuthorStatsSerializer(serializers.ModelSerializer):
+    """Author with published post statistics (set by api.directory)"""
+    post_count = serializers.IntegerField(read_only=True)
+    latest_post_at = serializers.DateTimeField(read_only=True)
+
+    class Meta:
+        model = Author
+        fields = ['id', 'name', 'post_count', 'latest_post_at']
+
+
+class TagStatsSerializer(TagSerializer):
+    """Tag with published post statistics (set by api.directory)"""
+    post_count = serializers.IntegerField(read_only=True)
+    latest_post_at = serializers.DateTimeField(read_only=True)
+
+    class Meta(TagSerializer.Meta):
+        fields = TagSerializer.Meta.fields + ['post_count', 'latest_post_at']
+
+
 class CommentSerializer(serializers.ModelSerializer):
     """Serializer for Comment model"""
     blog_post_id = serializers.UUIDField(source='blog_post.id', read_only=True)
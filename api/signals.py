@@ -0,0 +1,311 @@
+"""
+Model signal receivers that keep precomputed data in sync with blog content.
+
+`posts_bulk_updated` is sent by code paths that change posts with
+`queryset.update()` (e.g. the admin bulk actions), which bypasses the
+regular save signals.
+"""
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import Signal, receiver
+
+from . import autocomplete, caching, changes, feeds, purge, related, rendering, slugs
+from .models import Author, BlogPost, Comment, Tag, RelatedPost, SlugRedirect
+
+# Sent with `post_ids` (ids of the posts changed in bulk) and `fields` (names of the updated fields)
+posts_bulk_updated = Signal()
+
+
+def _regenerate_feeds_on_commit(keys):
+    if keys:
+        transaction.on_commit(lambda: feeds.regenerate_keys(keys))
+
+
+def _refresh_related_on_commit(post_ids):
+    post_ids = set(post_ids)
+    if post_ids:
+        transaction.on_commit(lambda: related.refresh(post_ids))
+
+
+@receiver(pre_save, sender=BlogPost)
+def remember_previous_post_state(sender, instance, raw=False, **kwargs):
+    """Keep the pre-save state so data derived from the old values is rebuilt too"""
+    instance._previous_state = None
+    instance._previous_slug = None
+    if raw or instance._state.adding:
+        return
+    previous = BlogPost.objects.filter(pk=instance.pk).first()
+    if previous is not None:
+        instance._previous_state = feeds.post_state(previous)
+        instance._previous_slug = previous.slug
+
+
+@receiver(post_save, sender=BlogPost)
+def post_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    keys = set()
+    current = feeds.post_state(instance)
+    if current['published']:
+        keys |= feeds.keys_for_state(current)
+    previous = getattr(instance, '_previous_state', None)
+    if previous and previous['published']:
+        keys |= feeds.keys_for_state(previous)
+    _regenerate_feeds_on_commit(keys)
+
+    if previous is None or (previous['published'], previous['category']) != (current['published'], current['category']):
+        _refresh_related_on_commit([instance.pk])
+
+
+@receiver(post_save, sender=BlogPost)
+def record_unpublish(sender, instance, raw=False, **kwargs):
+    """Published posts that leave the published state get a change-feed tombstone"""
+    previous = getattr(instance, '_previous_state', None)
+    if not raw and previous and previous['published'] and instance.status != 'published':
+        changes.record_tombstones([instance.pk], 'unpublished')
+
+
+@receiver(post_delete, sender=BlogPost)
+def record_delete(sender, instance, **kwargs):
+    if instance.status == 'published':
+        changes.record_tombstones([instance.pk], 'deleted')
+
+
+@receiver(post_save, sender=BlogPost)
+def record_slug_change(sender, instance, created, raw=False, **kwargs):
+    """Keep the former slug as a redirect and invalidate slug maps"""
+    if raw:
+        return
+    previous_slug = getattr(instance, '_previous_slug', None)
+    if not created and previous_slug == instance.slug:
+        return
+    # A current slug always wins over a redirect
+    SlugRedirect.objects.filter(old_slug=instance.slug).delete()
+    if previous_slug:
+        SlugRedirect.objects.update_or_create(old_slug=previous_slug, defaults={'post': instance})
+    transaction.on_commit(slugs.invalidate)
+
+
+@receiver(post_delete, sender=BlogPost)
+def forget_deleted_slug(sender, instance, **kwargs):
+    transaction.on_commit(slugs.invalidate)
+
+
+@receiver(pre_delete, sender=BlogPost)
+def remember_related_neighbours(sender, instance, **kwargs):
+    """Posts listing the deleted post as a neighbour need a replacement"""
+    instance._related_neighbour_ids = list(
+        RelatedPost.objects.filter(related=instance).values_list('post_id', flat=True)
+    )
+
+
+@receiver(pre_delete, sender=BlogPost)
+def remember_deleted_post_state(sender, instance, **kwargs):
+    """Tag rows are unlinked before post_delete, so capture the feeds containing the post now"""
+    if instance.status == 'published':
+        instance._deleted_state = feeds.post_state(instance)
+
+
+@receiver(post_delete, sender=BlogPost)
+def post_deleted(sender, instance, **kwargs):
+    if instance.status != 'published':
+        return
+    state = getattr(instance, '_deleted_state', None) or feeds.post_state(instance, tag_slugs=[])
+    _regenerate_feeds_on_commit(feeds.keys_for_state(state))
+    _refresh_related_on_commit(getattr(instance, '_related_neighbour_ids', []))
+
+
+@receiver(m2m_changed, sender=BlogPost.tags.through)
+def post_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Rebuild the feeds and related posts of a published post whose tags changed"""
+    if reverse or not isinstance(instance, BlogPost):
+        return
+    if action == 'pre_clear':
+        instance._cleared_tag_slugs = list(instance.tags.values_list('slug', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear') or instance.status != 'published':
+        return
+    _refresh_related_on_commit([instance.pk])
+    if action == 'post_clear':
+        tag_slugs = getattr(instance, '_cleared_tag_slugs', [])
+    else:
+        tag_slugs = Tag.objects.filter(pk__in=pk_set).values_list('slug', flat=True)
+    _regenerate_feeds_on_commit({
+        feeds.feed_key(fmt, 'tag', slug) for fmt in feeds.FEED_FORMATS for slug in tag_slugs
+    })
+
+
+@receiver(pre_save, sender=Tag)
+@receiver(pre_save, sender=Author)
+def remember_previous_owner_state(sender, instance, raw=False, **kwargs):
+    """Keep the previous tag slug and tag or author name so their feeds can be rebuilt"""
+    instance._previous_feed_state = None
+    if raw or instance._state.adding:
+        return
+    fields = ['name', 'slug'] if sender is Tag else ['name']
+    instance._previous_feed_state = sender.objects.filter(pk=instance.pk).values(*fields).first()
+
+
+def _regenerate_feeds_of_posts_on_commit(post_ids, keys=()):
+    post_ids, keys = list(post_ids), set(keys)
+    if post_ids or keys:
+        transaction.on_commit(lambda: (
+            feeds.regenerate_keys(keys),
+            feeds.regenerate_for_posts(BlogPost.objects.filter(pk__in=post_ids, status='published')),
+        ))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Author)
+def owner_saved(sender, instance, created, raw=False, **kwargs):
+    """Tag and author names appear in feed titles and item categories and authors"""
+    previous = getattr(instance, '_previous_feed_state', None)
+    if raw or created or previous is None:
+        return
+    keys = set()
+    if sender is Tag and previous['slug'] != instance.slug:
+        # Rebuilding the old keys finds no tag under that slug and drops the artifacts
+        keys = feeds.tag_keys(previous['slug'])
+    if keys or previous['name'] != instance.name:
+        _regenerate_feeds_of_posts_on_commit(instance.blog_posts.values_list('pk', flat=True), keys)
+
+
+@receiver(pre_delete, sender=Tag)
+def tag_deleted(sender, instance, **kwargs):
+    """The tag's rows in the through table go without m2m_changed, so rebuild its posts' feeds here"""
+    _regenerate_feeds_of_posts_on_commit(
+        list(instance.blog_posts.values_list('pk', flat=True)), feeds.tag_keys(instance.slug)
+    )
+
+
+@receiver(post_save, sender=BlogPost)
+@receiver(post_delete, sender=BlogPost)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Author)
+@receiver(post_delete, sender=Author)
+@receiver(m2m_changed, sender=BlogPost.tags.through)
+@receiver(posts_bulk_updated)
+def invalidate_posts_cache(sender, **kwargs):
+    """Post, tag and author changes invalidate cached post listings and counts"""
+    if kwargs.get('raw'):
+        return
+    action = kwargs.get('action')
+    if action is not None and not action.startswith('post_'):
+        # m2m_changed fires pre_* and post_* actions; only react once
+        return
+    transaction.on_commit(lambda: caching.bump_generation(caching.POSTS_NAMESPACE))
+
+
+@receiver(post_save, sender=BlogPost)
+@receiver(post_delete, sender=BlogPost)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Author)
+@receiver(post_delete, sender=Author)
+@receiver(m2m_changed, sender=BlogPost.tags.through)
+@receiver(posts_bulk_updated)
+def invalidate_autocomplete(sender, **kwargs):
+    """Titles, names and the post counts used to rank tags and authors feed the suggestions"""
+    if kwargs.get('raw'):
+        return
+    action = kwargs.get('action')
+    if action is not None and not action.startswith('post_'):
+        return
+    transaction.on_commit(autocomplete.invalidate)
+
+
+def _invalidate_details_on_commit(post_ids):
+    post_ids = list(post_ids)
+    if post_ids:
+        transaction.on_commit(lambda: caching.invalidate_post_details(post_ids))
+
+
+@receiver(post_save, sender=BlogPost)
+@receiver(post_delete, sender=BlogPost)
+def invalidate_post_detail(sender, instance, **kwargs):
+    _invalidate_details_on_commit([instance.pk])
+
+
+@receiver(m2m_changed, sender=BlogPost.tags.through)
+def invalidate_post_details_for_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ('post_add', 'post_remove'):
+        _invalidate_details_on_commit(pk_set if reverse else [instance.pk])
+    elif action == 'pre_clear' and reverse:
+        _invalidate_details_on_commit(instance.blog_posts.values_list('pk', flat=True))
+    elif action == 'post_clear' and not reverse:
+        _invalidate_details_on_commit([instance.pk])
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+@receiver(post_save, sender=Author)
+def invalidate_post_details_for_owner(sender, instance, raw=False, **kwargs):
+    """Tag and author names are embedded in the cached post payloads"""
+    if not raw:
+        _invalidate_details_on_commit(instance.blog_posts.values_list('pk', flat=True))
+
+
+@receiver(posts_bulk_updated)
+def invalidate_post_details_in_bulk(sender, post_ids, **kwargs):
+    _invalidate_details_on_commit(post_ids)
+
+
+@receiver(posts_bulk_updated)
+def posts_changed_in_bulk(sender, post_ids, fields=(), **kwargs):
+    transaction.on_commit(
+        lambda: feeds.regenerate_for_posts(BlogPost.objects.filter(pk__in=post_ids))
+    )
+    if 'status' in fields:
+        _refresh_related_on_commit(post_ids)
+
+
+@receiver(post_save, sender=BlogPost)
+@receiver(post_delete, sender=BlogPost)
+def purge_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        purge.enqueue(purge.post_keys(instance, getattr(instance, '_previous_slug', None)))
+
+
+@receiver(m2m_changed, sender=BlogPost.tags.through)
+def purge_post_tags(sender, instance, action, reverse, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear') and not reverse:
+        purge.enqueue(purge.post_keys(instance))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def purge_tag(sender, instance, raw=False, **kwargs):
+    if not raw:
+        purge.enqueue(purge.tag_keys(instance))
+
+
+@receiver(pre_save, sender=Comment)
+def remember_previous_approval(sender, instance, raw=False, **kwargs):
+    instance._was_approved = (
+        not raw and not instance._state.adding
+        and Comment.objects.filter(pk=instance.pk, is_approved=True).exists()
+    )
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def purge_comment(sender, instance, raw=False, **kwargs):
+    """Only approved comments are public, so pending ones never trigger a purge"""
+    if not raw and (instance.is_approved or getattr(instance, '_was_approved', False)):
+        purge.enqueue(purge.comment_keys(instance.blog_post_id))
+
+
+@receiver(posts_bulk_updated)
+def purge_posts_in_bulk(sender, post_ids, **kwargs):
+    keys = set()
+    for post in BlogPost.objects.filter(pk__in=post_ids).only('id', 'slug'):
+        keys |= purge.post_keys(post)
+    purge.enqueue(keys)
+
+
+@receiver(post_save, sender=BlogPost)
+def prerender_content(sender, instance, raw=False, **kwargs):
+    """Render the saved content ahead of the first ?content_format=html request"""
+    if not raw:
+        transaction.on_commit(lambda: rendering.prerender([instance]))
@@ -0,0 +1,122 @@
+"""
+Slug to post id resolution.
+
+Each worker keeps a bounded LRU map of slug -> post id, including former
+slugs from SlugRedirect, warmed with the most recent published posts on the
+first request. Slug changes bump a generation in the shared cache
+(CACHE_URL), and every worker drops its map when it sees a new generation.
+Entries also expire after SLUG_CACHE_TTL seconds, which bounds how long a
+worker can miss a bump (e.g. when the cache was unavailable or evicted it).
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.signals import request_started
+
+from . import caching
+from .models import BlogPost, SlugRedirect
+
+SLUGS_NAMESPACE = 'slugs'
+
+_lock = threading.Lock()
+_slugs = OrderedDict()
+_generation = None
+
+
+def _sync_generation():
+    """Drop the local map if slugs changed anywhere since it was filled"""
+    global _generation
+    generation = caching.get_generation(SLUGS_NAMESPACE)
+    if generation != _generation:
+        with _lock:
+            _slugs.clear()
+            _generation = generation
+
+
+def _remember(slug, post_id):
+    with _lock:
+        _slugs[slug] = (post_id, time.monotonic() + settings.SLUG_CACHE_TTL)
+        _slugs.move_to_end(slug)
+        while len(_slugs) > settings.SLUG_CACHE_SIZE:
+            _slugs.popitem(last=False)
+
+
+def _lookup(slug):
+    """Post id remembered for `slug`, or None when unknown or expired; call with the lock held"""
+    entry = _slugs.get(slug)
+    if entry is None:
+        return None
+    post_id, expires = entry
+    if expires <= time.monotonic():
+        del _slugs[slug]
+        return None
+    _slugs.move_to_end(slug)
+    return post_id
+
+
+def resolve(slug):
+    """Return the id of the post currently or formerly using `slug`, or None"""
+    _sync_generation()
+    with _lock:
+        post_id = _lookup(slug)
+    if post_id is not None:
+        return post_id
+
+    post_id = BlogPost.objects.filter(slug=slug).values_list('pk', flat=True).first()
+    if post_id is None:
+        post_id = SlugRedirect.objects.filter(old_slug=slug).values_list('post_id', flat=True).first()
+    if post_id is not None:
+        _remember(slug, post_id)
+    return post_id
+
+
+def resolve_many(slugs):
+    """Return {slug: post_id} for the slugs that resolve; misses are looked up together"""
+    _sync_generation()
+    resolved, missing = {}, []
+    with _lock:
+        for slug in slugs:
+            post_id = _lookup(slug)
+            if post_id is not None:
+                resolved[slug] = post_id
+            else:
+                missing.append(slug)
+    if missing:
+        found = dict(BlogPost.objects.filter(slug__in=missing).values_list('slug', 'pk'))
+        still_missing = [slug for slug in missing if slug not in found]
+        if still_missing:
+            found.update(SlugRedirect.objects.filter(old_slug__in=still_missing).values_list('old_slug', 'post_id'))
+        for slug, post_id in found.items():
+            _remember(slug, post_id)
+        resolved.update(found)
+    return resolved
+
+
+def warm():
+    """Preload the slugs of the most recent published posts and the redirects pointing at them"""
+    _sync_generation()
+    limit = settings.SLUG_CACHE_SIZE
+    recent = list(
+        BlogPost.objects.filter(status='published').order_by('-created_at').values_list('slug', 'pk')[:limit]
+    )
+    redirects = list(
+        SlugRedirect.objects.filter(post_id__in=[post_id for _, post_id in recent])
+        .values_list('old_slug', 'post_id')[:max(0, limit - len(recent))]
+    )
+    # Oldest first, so the most recent posts end up at the fresh end of the LRU
+    for slug, post_id in redirects + recent[::-1]:
+        _remember(slug, post_id)
+    return len(recent) + len(redirects)
+
+
+def warm_on_first_request(sender, **kwargs):
+    """request_started receiver that warms the map once per worker"""
+    request_started.disconnect(warm_on_first_request)
+    warm()
+
+
+def invalidate():
+    """Tell every worker that slugs changed"""
+    caching.bump_generation(SLUGS_NAMESPACE)
@@ -0,0 +1,12 @@
+'use strict';
+{
+    const $ = django.jQuery;
+    $(document).on('change', '.autocomplete-filter select', function() {
+        const clearUrl = $(this).closest('.autocomplete-filter').data('clear-url');
+        const params = new URLSearchParams(clearUrl);
+        if (this.value) {
+            params.set(this.dataset.filterParam, this.value);
+        }
+        window.location.search = params.toString();
+    });
+}
@@ -0,0 +1,71 @@
+'use strict';
+{
+    function csrfToken() {
+        const input = document.querySelector('input[name=csrfmiddlewaretoken]');
+        return input ? input.value : '';
+    }
+
+    function loadPage(table, before) {
+        const url = new URL(table.dataset.url, window.location.href);
+        if (before) {
+            url.searchParams.set('before', before);
+        }
+        return fetch(url, {credentials: 'same-origin'})
+            .then((response) => response.json())
+            .then((data) => {
+                table.tBodies[0].insertAdjacentHTML('beforeend', data.html);
+                const more = table.parentElement.querySelector('.comment-inline-more');
+                more.hidden = !data.next;
+                more.dataset.next = data.next || '';
+            });
+    }
+
+    function moderate(row, action) {
+        const body = new URLSearchParams({action: action});
+        return fetch(row.dataset.moderateUrl, {
+            method: 'POST',
+            credentials: 'same-origin',
+            headers: {'X-CSRFToken': csrfToken()},
+            body: body
+        })
+            .then((response) => {
+                if (!response.ok) {
+                    throw new Error(response.statusText);
+                }
+                return response.json();
+            })
+            .then((data) => {
+                if (data.deleted) {
+                    row.remove();
+                } else if (data.html) {
+                    row.outerHTML = data.html;
+                }
+            });
+    }
+
+    window.addEventListener('load', function() {
+        document.querySelectorAll('table.comment-inline').forEach(function(table) {
+            const more = table.parentElement.querySelector('.comment-inline-more');
+            loadPage(table);
+            more.querySelector('button').addEventListener('click', function() {
+                loadPage(table, more.dataset.next);
+            });
+            table.addEventListener('click', function(event) {
+                const button = event.target.closest('button[data-action]');
+                if (!button) {
+                    return;
+                }
+                const action = button.dataset.action;
+                if (action === 'delete' && !window.confirm('Delete this comment?')) {
+                    return;
+                }
+                button.disabled = true;
+                moderate(button.closest('tr'), action).catch(function() {
+                    // The row is unchanged; let the editor try again
+                    button.disabled = false;
+                    window.alert('The comment could not be updated. Please try again.');
+                });
+            });
+        });
+    });
+}
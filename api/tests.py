@@ -1,3 +1,933 @@
-from django.test import TestCase
+import base64
+import hashlib
+import io
+import json
+import math
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+
+from . import admission, caching, changes, feeds, jobs, purge, related, rendering, revisions, slugs
+from .models import (
+    Author, BlogPost, BulkJob, Comment, FeedArtifact, ImageAsset, PostRevision, PurgeTask, RelatedPost, Tag,
+)
+
+
+def make_post(title, author=None, **fields):
+    author = author or Author.objects.get_or_create(name='Author')[0]
+    fields.setdefault('slug', title.lower().replace(' ', '-'))
+    fields.setdefault('status', 'published')
+    fields.setdefault('category', 'tech')
+    return BlogPost.objects.create(title=title, content={'blocks': []}, author=author, **fields)
+
+
+class PurgeStub:
+    """Local webhook target recording the purged keys; answers with `status`"""
+
+    def __init__(self):
+        self.requests = []
+        self.status = 200
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                stub.requests.append(json.loads(body)['keys'])
+                self.send_response(stub.status)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}/purge'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class PurgeWorkerTests(TestCase):
+    def setUp(self):
+        self.stub = PurgeStub().__enter__()
+        self.addCleanup(self.stub.__exit__)
+        patcher = override_settings(
+            PURGE_WEBHOOK_TARGETS=[self.stub.url], PURGE_WEBHOOK_SECRET='', PURGE_MAX_ATTEMPTS=3,
+        )
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+
+    def enqueue(self, *keys):
+        with self.captureOnCommitCallbacks(execute=True):
+            purge.enqueue(keys)
+
+    def test_repeated_keys_are_sent_once(self):
+        self.enqueue('/api/posts/', '/api/posts/1/')
+        self.enqueue('/api/posts/')
+
+        self.assertEqual(purge.process_due(), (2, 0))
+        self.assertEqual(self.stub.requests, [['/api/posts/', '/api/posts/1/']])
+        self.assertFalse(PurgeTask.objects.exists())
+        self.assertEqual(purge.process_due(), (0, 0))
+
+    def test_failed_batch_backs_off_and_is_retried(self):
+        self.enqueue('/api/posts/')
+        self.stub.status = 500
+
+        self.assertEqual(purge.process_due(), (0, 1))
+        task = PurgeTask.objects.get()
+        self.assertEqual(task.attempts, 1)
+        self.assertGreater(task.next_attempt_at, timezone.now())
+
+        # Enqueuing the key again does not cut the backoff short
+        self.enqueue('/api/posts/')
+        self.assertEqual(PurgeTask.objects.get().next_attempt_at, task.next_attempt_at)
+        self.assertEqual(purge.process_due(), (0, 0))
+
+        self.stub.status = 200
+        PurgeTask.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(purge.process_due(), (1, 0))
+        self.assertEqual(len(self.stub.requests), 2)
+        self.assertFalse(PurgeTask.objects.exists())
+
+    def test_key_is_dropped_after_max_attempts(self):
+        self.enqueue('/api/posts/')
+        self.stub.status = 500
+        with self.assertLogs('api.purge', 'ERROR'):
+            for _ in range(3):
+                PurgeTask.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+                purge.process_due()
+        self.assertFalse(PurgeTask.objects.exists())
+
+    def test_key_enqueued_during_send_is_purged_again(self):
+        self.enqueue('/api/posts/', '/api/posts/1/')
+        send = purge.send
+
+        def send_and_edit(target, keys):
+            # Claimed keys are not locked while the webhook runs, so this does not block
+            self.enqueue('/api/posts/1/')
+            self.assertEqual(purge.claim(target, 10)[1], [])
+            send(target, keys)
+
+        with mock.patch.object(purge, 'send', side_effect=send_and_edit):
+            self.assertEqual(purge.process_due(), (2, 0))
+
+        task = PurgeTask.objects.get()
+        self.assertEqual(task.key, '/api/posts/1/')
+        self.assertLessEqual(task.next_attempt_at, timezone.now())
+        self.assertEqual(purge.process_due(), (1, 0))
+        self.assertEqual(self.stub.requests, [['/api/posts/', '/api/posts/1/'], ['/api/posts/1/']])
+
+
+@override_settings(SINGLE_FLIGHT_WAIT=2, SINGLE_FLIGHT_LOCK_TIMEOUT=30)
+class SingleFlightTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def run_concurrently(self, count, target):
+        results = [None] * count
+
+        def call(index):
+            results[index] = target()
+
+        threads = [threading.Thread(target=call, args=(index,)) for index in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        return results
+
+    def test_waiters_reuse_the_leaders_value(self):
+        calls = []
+        release = threading.Event()
+
+        def compute():
+            calls.append(1)
+            release.wait(2)
+            return 'value'
+
+        leader = threading.Thread(target=caching.single_flight, args=('key', compute, 60))
+        leader.start()
+        while not calls:
+            time.sleep(0.01)
+        threading.Timer(0.1, release.set).start()
+        results = self.run_concurrently(5, lambda: caching.single_flight('key', compute, 60))
+        leader.join(5)
+
+        self.assertEqual(results, ['value'] * 5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.get('key'), 'value')
+
+    def test_waiters_compute_themselves_when_the_leader_fails(self):
+        started = threading.Event()
+
+        def failing():
+            started.set()
+            time.sleep(0.1)
+            raise RuntimeError('database is down')
+
+        errors = []
+
+        def lead():
+            try:
+                caching.single_flight('key', failing, 60)
+            except RuntimeError as exc:
+                errors.append(exc)
+
+        leader = threading.Thread(target=lead)
+        leader.start()
+        started.wait(2)
+        results = self.run_concurrently(3, lambda: caching.single_flight('key', lambda: 'fallback', 60))
+        leader.join(5)
+
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(results, ['fallback'] * 3)
+
+    def test_none_is_returned_but_not_cached(self):
+        self.assertIsNone(caching.single_flight('key', lambda: None, 60))
+        self.assertEqual(caching.single_flight('key', lambda: 'value', 60), 'value')
+
+    def test_value_stored_by_the_lock_holder_is_reused(self):
+        # Another worker holds the lock and stores the value shortly after
+        cache.add(caching._lock_key('key'), 'other', 30)
+        threading.Timer(0.1, cache.set, args=('key', 'theirs', 60)).start()
+        self.assertEqual(caching.single_flight('key', lambda: 'ours', 60), 'theirs')
+
+    @override_settings(SINGLE_FLIGHT_WAIT=0.1)
+    def test_abandoned_lock_is_not_waited_for_forever(self):
+        cache.add(caching._lock_key('key'), 'gone', 30)
+        self.assertEqual(caching.single_flight('key', lambda: 'ours', 60), 'ours')
+
+
+class StaleWhileRevalidateTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.version = 0
+
+    def get(self):
+        def compute():
+            self.version += 1
+            return self.version
+
+        return caching.get_stale_while_revalidate('test', ['page'], compute, 60, 300)
+
+    def test_fresh_entry_is_served_from_the_cache(self):
+        self.assertEqual(self.get(), 1)
+        self.assertEqual(self.get(), 1)
+
+    def test_stale_entry_is_served_while_another_request_refreshes_it(self):
+        self.assertEqual(self.get(), 1)
+        caching.bump_generation('test')
+        key = f'api:test:swr:{hashlib.sha1(b"page").hexdigest()}'
+        cache.add(caching._lock_key(key), 'refreshing', 30)
+        self.assertEqual(self.get(), 1)
+        self.assertEqual(self.version, 1)
+
+        cache.delete(caching._lock_key(key))
+        self.assertEqual(self.get(), 2)
+        self.assertEqual(self.get(), 2)
+
+    def test_expired_entry_is_refreshed(self):
+        self.assertEqual(self.get(), 1)
+        with mock.patch('api.caching.time.time', return_value=time.time() + 120):
+            self.assertEqual(self.get(), 2)
+
+
+class SlugResolutionTests(TestCase):
+    def setUp(self):
+        slugs._slugs.clear()
+
+    def test_renamed_slug_redirects_and_can_be_reused(self):
+        first = make_post('First', slug='hello')
+        self.assertEqual(slugs.resolve('hello'), first.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            first.slug = 'first'
+            first.save()
+        self.assertEqual(slugs.resolve('hello'), first.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second = make_post('Second', slug='hello')
+        self.assertEqual(slugs.resolve('hello'), second.pk)
+        self.assertEqual(slugs.resolve_many(['hello', 'first', 'missing']), {'hello': second.pk, 'first': first.pk})
+
+    def test_entries_expire_without_an_invalidation(self):
+        post = make_post('Post', slug='hello')
+        self.assertEqual(slugs.resolve('hello'), post.pk)
+        # Changed behind the worker's back, e.g. the generation bump never reached it
+        BlogPost.objects.filter(pk=post.pk).update(slug='other')
+        self.assertEqual(slugs.resolve('hello'), post.pk)
+        with mock.patch('api.slugs.time.monotonic', return_value=time.monotonic() + settings.SLUG_CACHE_TTL + 1):
+            self.assertIsNone(slugs.resolve('hello'))
+
+
+class RenderingTests(SimpleTestCase):
+    def test_non_string_values_render_as_nothing(self):
+        content = {'blocks': [
+            {'type': 'code', 'data': {'code': 123}},
+            {'type': 'image', 'data': {'url': {'src': 'x'}, 'caption': 5}},
+            {'type': 'image', 'data': {'url': 'https://example.com/a.png', 'caption': 5}},
+            {'type': 'embed', 'data': {'source': ['https://example.com'], 'caption': 1}},
+            {'type': 'list', 'data': {'items': 7}},
+            {'type': 'paragraph', 'data': {'text': '<b>ok</b>'}},
+        ]}
+        self.assertEqual(
+            rendering.render_content(content),
+            '<pre><code></code></pre>\n'
+            '<figure><img src="https://example.com/a.png" alt="" loading="lazy"></figure>\n'
+            '<ul></ul>\n'
+            '<p><b>ok</b></p>',
+        )
+
+    def test_prerender_skips_posts_that_fail_to_render(self):
+        post = BlogPost(pk=uuid.uuid4(), content={'blocks': []}, updated_at=timezone.now())
+        broken = BlogPost(pk=uuid.uuid4(), content={'blocks': []}, updated_at=timezone.now())
+        render = rendering.render_content
+
+        def render_or_fail(content):
+            if content is broken.content:
+                raise RuntimeError('renderer bug')
+            return render(content)
+
+        with mock.patch.object(rendering, 'render_content', side_effect=render_or_fail), \
+                self.assertLogs('api.rendering', 'ERROR'):
+            rendering.prerender([broken, post])
+        self.assertEqual(cache.get(rendering.cache_key(post.pk, post.updated_at)), '')
+        self.assertIsNone(cache.get(rendering.cache_key(broken.pk, broken.updated_at)))
+
+
+def encode_payload(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+@override_settings(CHANGE_FEED_SETTLE_SECONDS=0)
+class ChangeFeedTests(TestCase):
+    def sync(self, token=None, limit=2):
+        params = {'limit': limit}
+        if token:
+            params['since'] = token
+        return self.client.get('/api/posts/changes/', params)
+
+    def test_malformed_and_partial_tokens_are_rejected(self):
+        post_id = str(uuid.uuid4())
+        tokens = [
+            'not base64 !',
+            encode_payload('nope'),
+            encode_payload([1, 2]),
+            encode_payload(['2024-01-01T00:00:00+00:00', 5, 0]),
+            encode_payload([5, post_id, 0]),
+            encode_payload(['2024-01-01T00:00:00+00:00', None, 0]),
+            encode_payload([None, post_id, 0]),
+            encode_payload(['2024-01-01T00:00:00', post_id, 0]),
+            encode_payload(['yesterday', post_id, 0]),
+            encode_payload(['2024-01-01T00:00:00+00:00', 'not-a-uuid', 0]),
+            encode_payload([None, None, -1]),
+            encode_payload([None, None, '3']),
+        ]
+        for token in tokens:
+            with self.subTest(token=token):
+                response = self.sync(token)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {'error': 'Invalid sync token.'})
+
+    def test_cursor_pages_through_changes_and_tombstones(self):
+        posts = [make_post(f'Post {index}') for index in range(3)]
+        make_post('Draft', status='draft')
+
+        first = self.sync().json()
+        self.assertTrue(first['has_more'])
+        second = self.sync(first['next']).json()
+        self.assertFalse(second['has_more'])
+        seen = [item['id'] for item in first['changes'] + second['changes']]
+        self.assertCountEqual(seen, [str(post.pk) for post in posts])
+        self.assertEqual(changes.decode_token(second['next'])[1], uuid.UUID(seen[-1]))
+
+        posts[0].status = 'draft'
+        posts[0].save()
+        deleted_id = posts[1].pk
+        posts[1].delete()
+        third = self.sync(second['next']).json()
+        self.assertEqual(third['changes'], [])
+        self.assertEqual(
+            [(item['id'], item['reason']) for item in third['tombstones']],
+            [(str(posts[0].pk), 'unpublished'), (str(deleted_id), 'deleted')],
+        )
+        # The tombstone cursor moved past them
+        self.assertEqual(self.sync(third['next']).json()['tombstones'], [])
+
+
+class DirectoryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def pages(self, url, **params):
+        names, response = [], self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            names += [row['name'] for row in data['results']]
+            if not data['next']:
+                return names
+            response = self.client.get(data['next'])
+
+    def test_keyset_pages_cover_duplicate_names_once(self):
+        authors = [Author.objects.create(name=name) for name in ['Bob', 'Alice', 'Alice', 'Alice B', 'Alice', 'Carol']]
+        self.assertEqual(self.pages('/api/authors/', limit=2), sorted(author.name for author in authors))
+        self.assertEqual(self.pages('/api/authors/', limit=1, prefix='ALI'), ['Alice', 'Alice', 'Alice', 'Alice B'])
+        self.assertEqual(self.pages('/api/authors/', prefix='z'), [])
+
+    def test_malformed_cursors_are_rejected(self):
+        for cursor in ['!!', encode_payload(['x', 5]), encode_payload([5, str(uuid.uuid4())]),
+                       encode_payload(['x', 'not-a-uuid']), encode_payload({'name': 'x'})]:
+            with self.subTest(cursor=cursor):
+                response = self.client.get('/api/authors/', {'cursor': cursor})
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {'error': 'Invalid cursor.'})
+
+    def test_counts_follow_publishing(self):
+        author = Author.objects.create(name='Alice')
+        tag = Tag.objects.create(name='Django', slug='django')
+        with self.captureOnCommitCallbacks(execute=True):
+            post = make_post('Post', author=author)
+            post.tags.add(tag)
+            make_post('Draft', author=author, status='draft').tags.add(tag)
+
+        self.assertEqual(self.client.get(f'/api/authors/{author.pk}/').json()['post_count'], 1)
+        self.assertEqual(self.client.get('/api/tags/django/').json()['post_count'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            post.status = 'draft'
+            post.save()
+        self.assertEqual(self.client.get(f'/api/authors/{author.pk}/').json()['post_count'], 0)
+        self.assertEqual(self.client.get('/api/tags/').json()['results'][0]['post_count'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            post.status = 'published'
+            post.save()
+        self.assertEqual(self.client.get('/api/authors/', {'prefix': 'al'}).json()['results'][0]['post_count'], 1)
+        self.assertEqual(self.client.get(f'/api/tags/{tag.pk}/').json()['post_count'], 1)
+
+
+class FeedInvalidationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = Author.objects.create(name='Alice')
+        self.tag = Tag.objects.create(name='Django', slug='django')
+        with self.captureOnCommitCallbacks(execute=True):
+            make_post('Post', author=self.author).tags.add(self.tag)
+        self.assertEqual(self.client.get('/api/feeds/tag/django/rss/').status_code, 200)
+
+    def test_tag_slug_change_drops_old_artifacts(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag.name = 'Python'
+            self.tag.slug = 'python'
+            self.tag.save()
+
+        self.assertFalse(FeedArtifact.objects.filter(key__in=feeds.tag_keys('django')).exists())
+        self.assertEqual(self.client.get('/api/feeds/tag/django/rss/').status_code, 404)
+        self.assertIn(b'Tag: Python', self.client.get('/api/feeds/tag/python/rss/').content)
+        self.assertIn(b'Python', self.client.get('/api/feeds/rss/').content)
+
+    def test_tag_delete_drops_artifacts(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag.delete()
+
+        self.assertFalse(FeedArtifact.objects.filter(key__in=feeds.tag_keys('django')).exists())
+        self.assertNotIn(b'Django', self.client.get('/api/feeds/rss/').content)
+
+    def test_author_rename_rebuilds_feeds(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.name = 'Alicia'
+            self.author.save()
+
+        self.assertIn(b'Alicia', self.client.get('/api/feeds/tag/django/rss/').content)
+        self.assertIn(b'Author: Alicia', self.client.get(f'/api/feeds/author/{self.author.pk}/atom/').content)
+
+    def test_unknown_scope_is_remembered_until_content_changes(self):
+        with mock.patch.object(feeds, 'regenerate', wraps=feeds.regenerate) as regenerate:
+            self.assertEqual(self.client.get('/api/feeds/tag/missing/rss/').status_code, 404)
+            self.assertEqual(self.client.get('/api/feeds/tag/missing/rss/').status_code, 404)
+        self.assertEqual(regenerate.call_count, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(name='Missing', slug='missing')
+            make_post('Other', author=self.author).tags.add(Tag.objects.get(slug='missing'))
+        self.assertEqual(self.client.get('/api/feeds/tag/missing/rss/').status_code, 200)
+
+
+@override_settings(ADMIN_BULK_SYNC_LIMIT=2, ADMIN_BULK_CHUNK_SIZE=2, ADMIN_BULK_JOB_LEASE=60)
+class BulkJobTests(TestCase):
+    def setUp(self):
+        tags = [Tag.objects.create(name='Django', slug='django'), Tag.objects.create(name='Django ORM', slug='django-orm')]
+        self.posts = []
+        for i in range(5):
+            post = make_post(f'Post {i}', status='draft')
+            post.tags.add(*tags)
+            self.posts.append(post)
+        # Matches every post twice, like a changelist search on tag names
+        self.selection = BlogPost.objects.filter(tags__name__icontains='django')
+
+    def published(self):
+        return BlogPost.objects.filter(status='published').count()
+
+    def test_small_selection_runs_inline(self):
+        count, job = jobs.submit('make_published', self.selection.filter(slug__in=['post-0', 'post-1']), None)
+        self.assertEqual((count, job), (2, None))
+        self.assertEqual(self.published(), 2)
+
+    def test_large_selection_runs_in_chunks(self):
+        count, job = jobs.submit('make_published', self.selection, None)
+        self.assertIsNone(count)
+        self.assertEqual(sorted(job.object_ids), sorted(str(post.pk) for post in self.posts))
+
+        chunks = []
+        apply = jobs.ACTIONS['make_published'][1]
+        with mock.patch.dict(jobs.ACTIONS, {'make_published': (BlogPost, lambda ids, user: chunks.append(ids) or apply(ids, user))}):
+            job = jobs.run(jobs.claim_next())
+
+        self.assertEqual(job.status, 'done')
+        self.assertEqual([len(ids) for ids in chunks], [2, 2, 1])
+        self.assertEqual((job.total, job.processed), (5, 5))
+        self.assertEqual(job.last_pk, str(max(post.pk for post in self.posts)))
+        self.assertEqual(self.published(), 5)
+
+    def test_failed_job_resumes_after_last_chunk(self):
+        _, job = jobs.submit('make_published', self.selection, None)
+        apply = jobs.ACTIONS['make_published'][1]
+        calls = []
+
+        def fail_second_chunk(ids, user):
+            calls.append(ids)
+            if len(calls) == 2:
+                raise RuntimeError('boom')
+            return apply(ids, user)
+
+        with mock.patch.dict(jobs.ACTIONS, {'make_published': (BlogPost, fail_second_chunk)}), \
+                self.assertLogs('api.jobs', 'ERROR'):
+            job = jobs.run(jobs.claim_next())
+        self.assertEqual((job.status, job.processed, job.error), ('failed', 2, 'boom'))
+        self.assertEqual(self.published(), 2)
+
+        BulkJob.objects.filter(pk=job.pk).update(status='queued')
+        job = jobs.run(jobs.claim_next())
+        self.assertEqual((job.status, job.processed), ('done', 5))
+        self.assertEqual(self.published(), 5)
+
+    def test_job_without_heartbeat_is_reclaimed(self):
+        _, job = jobs.submit('make_published', self.selection, None)
+        stalled = jobs.claim_next()
+        self.assertIsNone(jobs.claim_next())
+
+        BulkJob.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(seconds=61))
+        with self.assertLogs('api.jobs', 'WARNING'):
+            reclaimed = jobs.claim_next()
+        self.assertEqual(reclaimed.pk, job.pk)
+
+        # The stalled worker notices the takeover before its next chunk
+        with self.assertLogs('api.jobs', 'WARNING'):
+            jobs.run(stalled)
+        self.assertEqual(self.published(), 0)
+
+        job = jobs.run(reclaimed)
+        self.assertEqual((job.status, job.processed), ('done', 5))
+        self.assertEqual(self.published(), 5)
+
+
+class GateTests(SimpleTestCase):
+    def make_gate(self, max_concurrency=1, **pools):
+        return admission.Gate(pools or {
+            'admin': {'concurrency': 1, 'queue': 1, 'wait': 5, 'priority': 0},
+            'read': {'concurrency': 1, 'queue': 1, 'wait': 5},
+        }, max_concurrency)
+
+    def wait_for(self, condition):
+        deadline = time.monotonic() + 5
+        while not condition():
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+
+    def test_classify(self):
+        factory = RequestFactory()
+        cases = [
+            (factory.get('/admin/api/blogpost/'), 'admin'),
+            (factory.put(f'/api/uploads/{uuid.uuid4()}/'), 'uploads'),
+            (factory.get(f'/api/uploads/{uuid.uuid4()}/'), 'uploads'),
+            (factory.post('/api/posts/x/comments/'), 'write'),
+            (factory.get('/api/posts/', {'search': 'django'}), 'search'),
+            (factory.get('/api/posts/x/comments/list/'), 'comments'),
+            (factory.get('/api/posts/'), 'read'),
+            (factory.get('/media/a.png'), None),
+        ]
+        for request, pool in cases:
+            with self.subTest(path=request.path, method=request.method):
+                self.assertEqual(admission.classify(request), pool)
+
+    def test_full_queue_sheds_immediately(self):
+        gate = self.make_gate(read={'concurrency': 1, 'queue': 0, 'wait': 5})
+        read = gate.pools['read']
+        self.assertEqual(gate.acquire(read), (True, False))
+        started = time.monotonic()
+        self.assertEqual(gate.acquire(read), (False, False))
+        self.assertLess(time.monotonic() - started, 1)
+
+    def test_wait_runs_out(self):
+        gate = self.make_gate(read={'concurrency': 1, 'queue': 1, 'wait': 0.1})
+        read = gate.pools['read']
+        gate.acquire(read)
+        self.assertEqual(gate.acquire(read), (False, True))
+        self.assertEqual(read.waiting, 0)
+
+    def test_queued_request_is_admitted_on_release(self):
+        gate = self.make_gate()
+        read = gate.pools['read']
+        gate.acquire(read)
+        results = []
+        waiter = threading.Thread(target=lambda: results.append(gate.acquire(read)))
+        waiter.start()
+        self.wait_for(lambda: read.waiting == 1)
+        gate.release(read)
+        waiter.join(5)
+        self.assertEqual(results, [(True, True)])
+
+    def test_higher_priority_pool_goes_first(self):
+        gate = self.make_gate()
+        admin, read = gate.pools['admin'], gate.pools['read']
+        gate.acquire(read)
+        order = []
+
+        def enter(pool):
+            gate.acquire(pool)
+            order.append(pool.name)
+            gate.release(pool)
+
+        read_waiter = threading.Thread(target=enter, args=(read,))
+        read_waiter.start()
+        self.wait_for(lambda: read.waiting == 1)
+        admin_waiter = threading.Thread(target=enter, args=(admin,))
+        admin_waiter.start()
+        self.wait_for(lambda: admin.waiting == 1)
+
+        gate.release(read)
+        read_waiter.join(5)
+        admin_waiter.join(5)
+        self.assertEqual(order, ['admin', 'read'])
+        self.assertEqual((gate.active, admin.active, read.active), (0, 0, 0))
+
+
+class MediaTests(TestCase):
+    image = 'blog_images/cover.0123456789abcdef.jpg'
+
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        overridden = override_settings(MEDIA_ROOT=media_root, MEDIA_SERVE_MODE='python')
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+        os.makedirs(os.path.join(media_root, 'blog_images'))
+        for name in [self.image, 'notes.txt']:
+            with open(os.path.join(media_root, name), 'wb') as fh:
+                fh.write(b'0123456789')
+
+    def get(self, name, **headers):
+        return self.client.get(f'/media/{name}', headers=headers)
+
+    def test_ranges(self):
+        response = self.get('notes.txt', Range='bytes=2-4')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'234')
+        self.assertEqual(response['Content-Range'], 'bytes 2-4/10')
+
+        response = self.get('notes.txt', Range='bytes=-3')
+        self.assertEqual(b''.join(response.streaming_content), b'789')
+
+        response = self.get('notes.txt', Range='bytes=10-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+        # Multiple ranges are answered with the whole file
+        response = self.get('notes.txt', Range='bytes=0-1,4-5')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+
+    def test_if_range_and_conditional_requests(self):
+        etag = self.get('notes.txt')['ETag']
+        self.assertEqual(self.get('notes.txt', Range='bytes=0-0', If_Range=etag).status_code, 206)
+        self.assertEqual(self.get('notes.txt', Range='bytes=0-0', If_Range='"stale"').status_code, 200)
+        self.assertEqual(self.get('notes.txt', If_None_Match=etag).status_code, 304)
+
+    def test_hidden_featured_image(self):
+        post = make_post('Draft', status='draft', featured_image=self.image)
+        self.assertEqual(self.get(self.image).status_code, 404)
+        # The normalized path is checked, not the requested one
+        self.assertEqual(self.get('blog_images/./cover.0123456789abcdef.jpg').status_code, 404)
+        self.assertEqual(self.get('x/../' + self.image).status_code, 404)
+
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+        response = self.get(self.image)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+        self.client.logout()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            post.status = 'published'
+            post.save()
+        self.assertEqual(self.get(self.image).status_code, 200)
+
+    def test_cache_lifetimes(self):
+        self.assertIn('immutable', self.get(self.image)['Cache-Control'])
+        self.assertNotIn('immutable', self.get('notes.txt')['Cache-Control'])
+
+        # A published and an unpublished post share the image: visible, but may be hidden later
+        with self.captureOnCommitCallbacks(execute=True):
+            make_post('Published', featured_image=self.image)
+            make_post('Draft', status='draft', featured_image=self.image)
+        response = self.get(self.image)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], f'public, max-age={settings.MEDIA_CACHE_MAX_AGE}')
+
+
+@override_settings(ADMIN_INLINE_COMMENTS_PAGE_SIZE=2)
+class AdminCommentInlineTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        self.post = make_post('Post')
+        self.comments = [
+            Comment.objects.create(blog_post=self.post, name=f'Reader {i}', email='r@example.com', content='Hi')
+            for i in range(3)
+        ]
+        self.url = f'/admin/api/blogpost/{self.post.pk}/comments/'
+
+    def test_pages(self):
+        first = self.client.get(self.url).json()
+        self.assertEqual(first['next'], str(self.comments[1].pk))
+        second = self.client.get(self.url, {'before': first['next']}).json()
+        self.assertIsNone(second['next'])
+        self.assertIn('Reader 0', second['html'])
+        self.assertNotIn('Reader 1', second['html'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {'before': 'not-a-uuid'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'before': str(uuid.uuid4())}).status_code, 404)
+
+
+@override_settings(RELATED_POSTS_TOP_K=2, RELATED_POSTS_CATEGORY_WEIGHT=0.5)
+class RelatedPostsTests(TestCase):
+    def setUp(self):
+        self.x = Tag.objects.create(name='X', slug='x')
+        self.y = Tag.objects.create(name='Y', slug='y')
+        self.posts = {}
+        with self.captureOnCommitCallbacks(execute=True):
+            for title, category, tags, status in [
+                ('A', 'tech', [self.x, self.y], 'published'),
+                ('B', 'tech', [self.x], 'published'),
+                ('C', 'food', [self.y], 'published'),
+                ('D', 'tech', [self.x], 'draft'),
+                ('E', 'food', [], 'published'),
+            ]:
+                post = make_post(title, category=category, status=status)
+                post.tags.add(*tags)
+                self.posts[title] = post
+
+    def neighbours(self):
+        titles = {post.pk: title for title, post in self.posts.items()}
+        result = {}
+        for row in RelatedPost.objects.order_by('rank'):
+            result.setdefault(titles[row.post_id], []).append((titles[row.related_id], round(row.score, 6)))
+        return result
+
+    def assertMatchesRebuild(self):
+        incremental = self.neighbours()
+        related.rebuild_all()
+        self.assertEqual(incremental, self.neighbours())
+
+    def test_cosine_scores(self):
+        # A = {tech: .5, x: 1, y: 1}, B = {tech: .5, x: 1}, C = {food: .5, y: 1}, E = {food: .5}
+        norm_a, norm_b = math.sqrt(2.25), math.sqrt(1.25)
+        self.assertEqual(self.neighbours(), {
+            'A': [('B', round(1.25 / (norm_a * norm_b), 6)), ('C', round(1 / (norm_a * norm_b), 6))],
+            'B': [('A', round(1.25 / (norm_a * norm_b), 6))],
+            'C': [('A', round(1 / (norm_a * norm_b), 6)), ('E', round(0.25 / (norm_b * 0.5), 6))],
+            'E': [('C', round(0.25 / (norm_b * 0.5), 6))],
+        })
+
+    def test_publish_and_unpublish(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.posts['D'].status = 'published'
+            self.posts['D'].save()
+        self.assertIn(('D', 1.0), self.neighbours()['B'])
+        self.assertMatchesRebuild()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.posts['B'].status = 'draft'
+            self.posts['B'].save()
+        self.assertNotIn('B', self.neighbours())
+        self.assertMatchesRebuild()
+
+    def test_retag(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.posts['C'].tags.remove(self.y)
+        self.assertMatchesRebuild()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.posts['E'].tags.add(self.x, self.y)
+        self.assertEqual(self.neighbours()['E'][0][0], 'A')
+        self.assertMatchesRebuild()
+
+    def test_delete(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.posts['A'].delete()
+        self.assertNotIn('A', [title for ranked in self.neighbours().values() for title, _ in ranked])
+        self.assertMatchesRebuild()
+
+
+class RevisionTests(TestCase):
+    def test_diff_patch_round_trip(self):
+        blocks = [{'type': 'paragraph', 'data': {'text': f'Paragraph {i}'}} for i in range(20)]
+        edited = blocks[:5] + [{'type': 'heading', 'data': {'text': 'New'}}] + blocks[6:15] + blocks[16:]
+        cases = [
+            ({'a': 1, 'b': [1, 2]}, {'a': 2, 'c': None}),
+            ({'content': {'blocks': blocks}}, {'content': {'blocks': edited}}),
+            ([1, 2, 3], [0, 1, 3, 4]),
+            ('text', {'now': 'a dict'}),
+            ({'same': True}, {'same': True}),
+        ]
+        for old, new in cases:
+            with self.subTest(old=old, new=new):
+                self.assertEqual(revisions.patch(old, revisions.diff(old, new)), new)
+        delta = revisions.diff({'content': {'blocks': blocks}}, {'content': {'blocks': edited}})
+        self.assertLess(len(json.dumps(delta)), len(json.dumps(edited)) / 4)
+
+    def edit(self, post, **fields):
+        base_state = revisions.stored_state(post.pk)
+        for field, value in fields.items():
+            setattr(post, field, value)
+        post.save()
+        return revisions.record(post, None, base_state)
+
+    @override_settings(REVISION_SNAPSHOT_INTERVAL=3)
+    def test_rebuild_and_compact(self):
+        post = make_post('Post')
+        # The first edit also records the state before it
+        states = [revisions.post_state(post)]
+        for i in range(8):
+            self.edit(post, subtitle=f'Edit {i}')
+            states.append(revisions.post_state(post))
+        self.assertIsNone(self.edit(post, subtitle='Edit 7'))
+        kinds = list(PostRevision.objects.filter(post=post).order_by('number').values_list('kind', flat=True))
+        self.assertEqual(kinds, ['snapshot', 'delta', 'delta'] * 3)
+        for number, state in enumerate(states, start=1):
+            self.assertEqual(revisions.rebuild(post.pk, number), state)
+
+        PostRevision.objects.filter(post=post, number__lte=4).update(created_at=timezone.now() - timedelta(days=30))
+        deleted = revisions.compact(post.pk, keep_after=timezone.now() - timedelta(days=1), keep_min=2)
+        self.assertEqual(deleted, 4)
+        kinds = list(PostRevision.objects.filter(post=post).order_by('number').values_list('number', 'kind'))
+        self.assertEqual(kinds, [(5, 'snapshot'), (6, 'delta'), (7, 'delta'), (8, 'snapshot'), (9, 'delta')])
+        for number, state in enumerate(states[4:], start=5):
+            self.assertEqual(revisions.rebuild(post.pk, number), state)
+
+        # The newest keep_min revisions survive however old they are
+        PostRevision.objects.filter(post=post).update(created_at=timezone.now() - timedelta(days=30))
+        self.assertEqual(revisions.compact(post.pk, keep_after=timezone.now(), keep_min=2), 3)
+        kinds = list(PostRevision.objects.filter(post=post).order_by('number').values_list('number', 'kind'))
+        self.assertEqual(kinds, [(8, 'snapshot'), (9, 'delta')])
+        self.assertEqual(revisions.rebuild(post.pk, 9), states[8])
+
+
+class ImageUploadTests(TestCase):
+    def setUp(self):
+        temp_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_root)
+        overridden = override_settings(
+            MEDIA_ROOT=os.path.join(temp_root, 'media'), IMAGE_UPLOAD_TEMP_DIR=os.path.join(temp_root, 'tmp')
+        )
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+        self.post = make_post('Post')
+        buffer = io.BytesIO()
+        Image.new('RGB', (40, 30), 'red').save(buffer, 'PNG')
+        self.image = buffer.getvalue()
+
+    def start(self, data=None):
+        data = data or self.image
+        response = self.client.post('/api/uploads/', {
+            'filename': 'cover.png', 'size': len(data), 'sha256': hashlib.sha256(data).hexdigest(),
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        return f"/api/uploads/{response.json()['id']}/"
+
+    def put(self, url, data, start, checksum=None):
+        headers = {'Content-Range': f'bytes {start}-{start + len(data) - 1}/{len(self.image)}'}
+        if checksum:
+            headers['X-Chunk-SHA256'] = checksum
+        return self.client.put(url, data, content_type='application/octet-stream', headers=headers)
+
+    def complete(self, url):
+        return self.client.post(f'{url}complete/', {'post': str(self.post.pk)}, content_type='application/json')
+
+    def test_chunks_must_start_at_offset(self):
+        url = self.start()
+        self.assertEqual(self.put(url, self.image[:20], 0).json()['offset'], 20)
+        response = self.put(url, self.image[30:40], 30)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['offset'], 20)
+        # A retry of the chunk already received is rejected the same way
+        self.assertEqual(self.put(url, self.image[:20], 0).status_code, 409)
+        self.assertEqual(self.client.get(url).json()['offset'], 20)
+
+    def test_chunk_checksum_mismatch_is_cut_back(self):
+        url = self.start()
+        self.put(url, self.image[:20], 0)
+        response = self.put(url, self.image[20:], 20, checksum=hashlib.sha256(b'other').hexdigest())
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(url).json()['offset'], 20)
+
+        response = self.put(url, self.image[20:], 20, checksum=hashlib.sha256(self.image[20:]).hexdigest())
+        self.assertEqual(response.json()['offset'], len(self.image))
+        response = self.complete(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'complete')
+
+    def test_file_checksum_mismatch_resets_upload(self):
+        url = self.start()
+        self.put(url, b'x' * len(self.image), 0)
+        response = self.complete(url)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(url).json()['offset'], 0)
+
+    def test_same_image_is_stored_once(self):
+        names = []
+        for _ in range(2):
+            url = self.start()
+            self.put(url, self.image, 0)
+            self.assertEqual(self.complete(url).status_code, 200)
+            self.post.refresh_from_db()
+            names.append(self.post.featured_image.name)
+        self.assertEqual(names[0], names[1])
+        self.assertEqual(ImageAsset.objects.count(), 1)
+        self.assertEqual(os.listdir(os.path.join(settings.MEDIA_ROOT, 'blog_images')), [os.path.basename(names[0])])
+        # Completing again is harmless
+        self.assertEqual(self.complete(url).status_code, 200)
@@ -0,0 +1,293 @@
+"""
+Resumable, chunked featured-image uploads.
+
+    POST /api/uploads/                  {"filename": ..., "size": ..., "sha256": ...}
+    PUT  /api/uploads/{id}/             raw bytes, Content-Range: bytes {start}-{end}/{size}
+    GET  /api/uploads/{id}/             bytes received so far, to resume after a failure
+    POST /api/uploads/{id}/complete/    {"post": "<post id>"}
+
+Chunks are streamed from the request body into a temporary file
+(`IMAGE_UPLOAD_TEMP_DIR/<id>.part`) in BUFFER_SIZE blocks, so neither a
+chunk nor the image is ever held in memory. A chunk must start at the
+current offset; when it carries an `X-Chunk-SHA256` header the received
+bytes are checked against it and the file is cut back on a mismatch, so the
+client simply resends that chunk. While a chunk streams in, the temporary
+file is locked (flock) rather than the upload row, so no transaction stays
+open for the duration of a client upload; the row is only updated once the
+chunk is on disk.
+
+Completing an upload hashes the file, lets Pillow check it (header and
+structure only, pixels are not decoded) and attaches it to the post. Images
+are stored once per content hash as ImageAsset rows, named
+`<name>.<hash prefix>.<ext>`; uploading the same image again reuses the
+stored file instead of writing a copy. The asset is committed before the
+post is changed, so a failing post save leaves a completed upload that can
+simply be completed again.
+"""
+import fcntl
+import hashlib
+import os
+import re
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+from PIL import Image
+
+from . import revisions
+from .models import ImageAsset, ImageUpload
+
+BUFFER_SIZE = 64 * 1024
+
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+SHA256_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+class UploadError(ValueError):
+    pass
+
+
+class OffsetMismatch(UploadError):
+    """The chunk does not start where the upload currently ends"""
+
+    def __init__(self, offset):
+        super().__init__(f'Chunk must start at byte {offset}.')
+        self.offset = offset
+
+
+class UploadBusy(OffsetMismatch):
+    """Another request is writing to or completing the upload"""
+
+    def __init__(self, offset):
+        UploadError.__init__(self, f'Another chunk of this upload is being written; retry from byte {offset}.')
+        self.offset = offset
+
+
+class _TemporaryFile(File):
+    # FileSystemStorage moves files exposing temporary_file_path() instead of copying them
+    def temporary_file_path(self):
+        return self.name
+
+
+def temp_path(upload):
+    return os.path.join(settings.IMAGE_UPLOAD_TEMP_DIR, f'{upload.pk}.part')
+
+
+def parse_content_range(value):
+    """Return (start, end, total) of a `bytes start-end/total` header; `end` is inclusive"""
+    match = CONTENT_RANGE_RE.match(value or '')
+    if not match:
+        raise UploadError('Content-Range must be "bytes {start}-{end}/{size}".')
+    start, end, total = (int(group) for group in match.groups())
+    if end < start:
+        raise UploadError('Content-Range end must not be before its start.')
+    return start, end, total
+
+
+def create(filename, size, sha256='', user=None):
+    """Start an upload of `size` bytes"""
+    if not os.path.basename(filename or '').strip():
+        raise UploadError('filename is required.')
+    filename = get_valid_filename(os.path.basename(filename))
+    extension = os.path.splitext(filename)[1].lower()
+    if Image.registered_extensions().get(extension) not in settings.IMAGE_UPLOAD_FORMATS:
+        raise UploadError(f'Unsupported file type; allowed formats are {", ".join(settings.IMAGE_UPLOAD_FORMATS)}.')
+    if not 0 < size <= settings.IMAGE_UPLOAD_MAX_SIZE:
+        raise UploadError(f'size must be between 1 and {settings.IMAGE_UPLOAD_MAX_SIZE} bytes.')
+    sha256 = (sha256 or '').lower()
+    if sha256 and not SHA256_RE.match(sha256):
+        raise UploadError('sha256 must be a hex SHA-256 digest.')
+    os.makedirs(settings.IMAGE_UPLOAD_TEMP_DIR, exist_ok=True)
+    return ImageUpload.objects.create(filename=filename, size=size, sha256=sha256, created_by=user)
+
+
+def _remove_temp(upload):
+    try:
+        os.remove(temp_path(upload))
+    except FileNotFoundError:
+        pass
+
+
+@contextmanager
+def _locked(upload):
+    """
+    Open the upload's temporary file (creating it) under an exclusive lock,
+    which the OS releases even if the worker dies mid-chunk.
+    """
+    fd = os.open(temp_path(upload), os.O_RDWR | os.O_CREAT, 0o600)
+    with open(fd, 'r+b') as fh:
+        try:
+            fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise UploadBusy(upload.offset)
+        try:
+            yield fh
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _check_writable(upload, total=None, end=None):
+    if upload.status != 'uploading':
+        raise UploadError('Upload is already complete.')
+    if total is not None and (total != upload.size or end >= upload.size):
+        raise UploadError(f'Content-Range does not fit an upload of {upload.size} bytes.')
+
+
+def write_chunk(upload_id, stream, content_range, checksum=None):
+    """
+    Append one chunk read from `stream` (the request body) and return the
+    updated upload. The file lock keeps concurrent retries of the same upload
+    from interleaving their writes; the later one gets UploadBusy.
+    """
+    start, end, total = parse_content_range(content_range)
+    length = end - start + 1
+    if length > settings.IMAGE_UPLOAD_CHUNK_SIZE:
+        raise UploadError(f'Chunks may not exceed {settings.IMAGE_UPLOAD_CHUNK_SIZE} bytes.')
+    checksum = (checksum or '').lower()
+    if checksum and not SHA256_RE.match(checksum):
+        raise UploadError('X-Chunk-SHA256 must be a hex SHA-256 digest.')
+
+    upload = ImageUpload.objects.get(pk=upload_id)
+    _check_writable(upload, total, end)
+    with _locked(upload) as fh:
+        # Nobody else writes now; re-read what the last writer recorded
+        upload.refresh_from_db()
+        if upload.status != 'uploading':
+            # Completed meanwhile; drop the file opening it may have recreated
+            _remove_temp(upload)
+        _check_writable(upload)
+        received = os.fstat(fh.fileno()).st_size
+        if received < upload.offset:
+            # The temporary file was lost (e.g. cleaned up); resume from what is on disk
+            upload.offset = received
+            upload.save(update_fields=['offset', 'updated_at'])
+        if start != upload.offset:
+            raise OffsetMismatch(upload.offset)
+
+        digest = hashlib.sha256()
+        written = 0
+        # Drop whatever an interrupted earlier attempt left past the offset
+        fh.seek(start)
+        fh.truncate()
+        try:
+            while written < length:
+                block = stream.read(min(BUFFER_SIZE, length - written))
+                if not block:
+                    break
+                fh.write(block)
+                digest.update(block)
+                written += len(block)
+        except BaseException:
+            fh.truncate(start)
+            raise
+        if written != length:
+            fh.truncate(start)
+            raise UploadError(f'Expected {length} bytes but received {written}.')
+        if checksum and digest.hexdigest() != checksum:
+            fh.truncate(start)
+            raise UploadError('Chunk checksum mismatch; resend the chunk.')
+        fh.flush()
+
+        upload.offset = end + 1
+        upload.save(update_fields=['offset', 'updated_at'])
+    return upload
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(BUFFER_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def probe(path):
+    """Return (width, height) of a valid image in an allowed format, reading it from disk"""
+    try:
+        with Image.open(path) as image:
+            image_format, size = image.format, image.size
+            if image_format not in settings.IMAGE_UPLOAD_FORMATS:
+                raise UploadError(f'Unsupported image format: {image_format}.')
+            image.verify()
+    except UploadError:
+        raise
+    except Exception:
+        raise UploadError('Upload a valid image. The file is either not an image or a corrupted image.')
+    return size
+
+
+def _store(upload, path, digest):
+    """Return the asset for `digest`, moving the temporary file into storage if it is new"""
+    asset = ImageAsset.objects.filter(sha256=digest).first()
+    if asset is not None:
+        return asset
+    width, height = probe(path)
+    asset = ImageAsset(sha256=digest, size=upload.size, width=width, height=height)
+    with open(path, 'rb') as fh:
+        # The content hash in the name keeps different images with the same file name apart
+        stem, extension = os.path.splitext(upload.filename)
+        asset.file.save(f'{stem}.{digest[:16]}{extension.lower()}', _TemporaryFile(fh, name=path), save=False)
+    try:
+        asset.save()
+    except IntegrityError:
+        # Another upload of the same image finished first
+        asset.file.delete(save=False)
+        asset = ImageAsset.objects.get(sha256=digest)
+    except BaseException:
+        asset.file.delete(save=False)
+        raise
+    return asset
+
+
+def _finish(upload):
+    """Store a fully received upload as an asset and mark it complete"""
+    with _locked(upload) as fh:
+        upload.refresh_from_db()
+        if upload.status == 'complete':
+            _remove_temp(upload)
+            return upload
+        path = temp_path(upload)
+        if upload.offset != upload.size or os.fstat(fh.fileno()).st_size != upload.size:
+            raise UploadError(f'Upload is incomplete: {upload.offset} of {upload.size} bytes received.')
+        digest = file_digest(path)
+        if upload.sha256 and digest != upload.sha256:
+            # Nothing can tell which chunk is wrong, so start over
+            fh.truncate(0)
+            upload.offset = 0
+            upload.save(update_fields=['offset', 'updated_at'])
+            raise UploadError('File checksum mismatch; the upload has been reset.')
+        # Committed on its own: the stored file always has its asset row
+        upload.asset = _store(upload, path, digest)
+        upload.status = 'complete'
+        upload.save(update_fields=['asset', 'status', 'updated_at'])
+        _remove_temp(upload)
+    return upload
+
+
+def complete(upload_id, post, user=None):
+    """Finish an upload and make it the post's featured image; completing twice is harmless"""
+    upload = ImageUpload.objects.select_related('asset').get(pk=upload_id)
+    if upload.status != 'complete':
+        upload = _finish(upload)
+
+    with transaction.atomic():
+        base_state = revisions.stored_state(post.pk)
+        post.featured_image = upload.asset.file.name
+        post.updated_by = user
+        post.save()
+        revisions.record(post, user, base_state)
+    return upload
+
+
+def prune():
+    """Delete unfinished uploads idle for IMAGE_UPLOAD_EXPIRY_HOURS, with their temporary files"""
+    cutoff = timezone.now() - timedelta(hours=settings.IMAGE_UPLOAD_EXPIRY_HOURS)
+    stale = list(ImageUpload.objects.filter(status='uploading', updated_at__lt=cutoff))
+    for upload in stale:
+        _remove_temp(upload)
+    ImageUpload.objects.filter(pk__in=[upload.pk for upload in stale]).delete()
+    return len(stale)
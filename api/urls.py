@@ -1,4 +1,4 @@
-from django.urls import path, include
+from django.urls import path, re_path, include
 from rest_framework.routers import DefaultRouter
 from . import views
 
@@ -6,11 +6,24 @@ app_name = 'api'
 
 router = DefaultRouter()
 router.register(r'posts', views.BlogPostViewSet, basename='blogpost')
+router.register(r'authors', views.AuthorViewSet, basename='author')
+router.register(r'tags', views.TagViewSet, basename='tag')
 
 urlpatterns = [
     path('health/', views.health_check, name='health-check'),
+    path('admission/', views.admission_stats, name='admission-stats'),
+    path('autocomplete/', views.autocomplete_view, name='autocomplete'),
+    path('uploads/', views.create_upload, name='create-upload'),
+    path('uploads/<uuid:upload_id>/', views.upload_detail, name='upload-detail'),
+    path('uploads/<uuid:upload_id>/complete/', views.complete_upload, name='complete-upload'),
     path('posts/<uuid:post_id>/comments/', views.create_comment, name='create-comment'),
     path('posts/<uuid:post_id>/comments/list/', views.list_comments, name='list-comments'),
+    re_path(r'^feeds/(?P<fmt>rss|atom)/$', views.feed, name='feed'),
+    re_path(r'^feeds/category/(?P<category>[^/]+)/(?P<fmt>rss|atom)/$', views.category_feed, name='category-feed'),
+    re_path(r'^feeds/tag/(?P<slug>[-\w]+)/(?P<fmt>rss|atom)/$', views.tag_feed, name='tag-feed'),
+    re_path(r'^feeds/author/(?P<author_id>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})/(?P<fmt>rss|atom)/$', views.author_feed, name='author-feed'),
+    path('sitemap.xml', views.sitemap_index, name='sitemap-index'),
+    re_path(r'^sitemaps/(?P<shard>\d{4}-\d{2})\.xml$', views.sitemap_shard, name='sitemap-shard'),
     path('', include(router.urls)),
 ]
 
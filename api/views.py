@@ -1,13 +1,27 @@
-from rest_framework.decorators import api_view
+import uuid
+
+from rest_framework.decorators import api_view, action, permission_classes
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from rest_framework import status, viewsets, filters
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAdminUser
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from django.http import Http404, HttpResponse
 from django.shortcuts import get_object_or_404
-from .models import BlogPost, Comment
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+from . import admission, autocomplete, caching, changes, directory, feeds, hitcount, rendering, slugs, uploads
+from .models import Author, BlogPost, Comment, ImageUpload, RelatedPost, Tag
 from .serializers import (
     HealthCheckSerializer, 
     BlogPostSerializer, 
     BlogPostListSerializer,
+    BlogPostChangeSerializer,
+    AuthorStatsSerializer,
+    TagStatsSerializer,
     CommentSerializer,
     CommentCreateSerializer
 )
@@ -31,22 +45,32 @@ class BlogPostViewSet(viewsets.ReadOnlyModelViewSet):
     Posts can only be created/updated via Django Admin.
     
     list: Return a paginated list of all blog posts (GET /api/posts/)
-    retrieve: Return a specific blog post by ID (GET /api/posts/{id}/)
+    retrieve: Return a specific blog post by ID or slug (GET /api/posts/{id_or_slug}/)
+    related: Return similar published posts (GET /api/posts/{id}/related/)
+    facets: Return filter counts for the current filters (GET /api/posts/facets/)
+    popular: Return the most viewed published posts (GET /api/posts/popular/)
+    trending: Return published posts ranked by recent views (GET /api/posts/trending/)
+    batch: Return several posts by ID or slug in one request (GET /api/posts/batch/?ids=...)
+    changes: Return posts changed and removed since a sync token (GET /api/posts/changes/?since=...)
     
     Query parameters:
     - author: Filter by author UUID (e.g., ?author=uuid)
     - status: Filter by status (draft|published|archived)
     - category: Filter by category
     - featured: Filter by featured (true|false)
-    - search: Search in title, subtitle, category
+    - tag: Filter by tag slug
+    - search: Search in title, subtitle, category and content text
     - ordering: Order by created_at, updated_at, published_at
+    - content_format: `html` adds the rendered `content_html` (retrieve only)
     """
     queryset = BlogPost.objects.all()
     permission_classes = [AllowAny]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ['title', 'subtitle', 'category']
+    search_fields = ['title', 'subtitle', 'category', 'plain_text']
     ordering_fields = ['created_at', 'updated_at', 'published_at']
-    ordering = ['-created_at']
+    ordering = ['-created_at', '-id']
+    # Relations read by BlogPostSerializer
+    detail_related = ['author', 'created_by', 'updated_by']
 
     def get_serializer_class(self):
         """Use different serializers for list and detail views"""
@@ -57,6 +81,10 @@ class BlogPostViewSet(viewsets.ReadOnlyModelViewSet):
     def get_queryset(self):
         """Filter queryset based on query parameters"""
         queryset = super().get_queryset()
+        if self.action == 'list':
+            queryset = queryset.select_related('author').prefetch_related('tags')
+        elif self.action == 'retrieve':
+            queryset = queryset.select_related(*self.detail_related).prefetch_related('tags')
         
         # Filter by author if provided
         author_filter = self.request.query_params.get('author', None)
@@ -79,6 +107,11 @@ class BlogPostViewSet(viewsets.ReadOnlyModelViewSet):
             featured_bool = featured_filter.lower() == 'true'
             queryset = queryset.filter(featured=featured_bool)
         
+        # Filter by tag slug if provided
+        tag_filter = self.request.query_params.get('tag', None)
+        if tag_filter:
+            queryset = queryset.filter(tags__slug=tag_filter)
+        
         # Only show published posts by default for non-authenticated users
         # (This can be overridden by explicitly passing status parameter)
         if not self.request.user.is_authenticated and not status_filter:
@@ -86,6 +119,313 @@ class BlogPostViewSet(viewsets.ReadOnlyModelViewSet):
         
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return super().list(request, *args, **kwargs)
+        # Anonymous pages are shared: cached per URL and refreshed in the background of one request
+        data = caching.get_stale_while_revalidate(
+            caching.POSTS_NAMESPACE,
+            ('list', request.build_absolute_uri()),
+            lambda: super(BlogPostViewSet, self).list(request, *args, **kwargs).data,
+            settings.POST_LIST_CACHE_TIMEOUT,
+            settings.POST_LIST_STALE_TIMEOUT,
+        )
+        return Response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        post_id = self._resolve_lookup(kwargs['pk'])
+        kwargs['pk'] = self.kwargs['pk'] = str(post_id)
+        if set(request.query_params) - {'content_format'}:
+            # Filters take part in the lookup, so bypass the shared detail cache
+            response = super().retrieve(request, *args, **kwargs)
+        else:
+            data = self._load_details([post_id]).get(str(post_id))
+            if data is None or not self._is_visible(data):
+                raise Http404
+            response = Response(self._present(data))
+        if request.query_params.get('content_format') == 'html':
+            data = response.data
+            data['content_html'] = rendering.get_html(data['id'], data['updated_at'], data['content'])
+        hitcount.record_view(response.data['id'])
+        return response
+
+    @staticmethod
+    def _resolve_lookup(value):
+        """Return the post id for a UUID or a current or former slug"""
+        try:
+            return uuid.UUID(str(value))
+        except ValueError:
+            pass
+        post_id = slugs.resolve(value)
+        if post_id is None:
+            raise Http404
+        return post_id
+
+    def _is_visible(self, data):
+        """Anonymous users only see published posts"""
+        return self.request.user.is_authenticated or data['status'] == 'published'
+
+    def _present(self, data):
+        """Cached payloads hold relative media URLs; make them absolute for this request"""
+        data = dict(data)
+        if data.get('featured_image') and data['featured_image'].startswith('/'):
+            data['featured_image'] = self.request.build_absolute_uri(data['featured_image'])
+        return data
+
+    def _load_details(self, post_ids):
+        """
+        Serialized posts keyed by id, served from the detail cache where possible.
+        All misses are loaded with a single query.
+        """
+        details = caching.get_post_details(post_ids)
+        missing = [post_id for post_id in post_ids if str(post_id) not in details]
+        if len(missing) == 1:
+            # A hot post whose entry just expired: serialize it once for all concurrent requests
+            post_id = str(missing[0])
+            data = caching.coalesce_post_detail(post_id, lambda: self._serialize_details(missing).get(post_id))
+            if data is not None:
+                details[post_id] = data
+        elif missing:
+            fresh = self._serialize_details(missing)
+            caching.set_post_details(fresh)
+            details.update(fresh)
+        return details
+
+    def _serialize_details(self, post_ids):
+        posts = (
+            BlogPost.objects.filter(pk__in=post_ids)
+            .select_related(*self.detail_related)
+            .prefetch_related('tags')
+        )
+        return {str(post.pk): dict(BlogPostSerializer(post).data) for post in posts}
+
+    @action(detail=False, methods=['get'])
+    def batch(self, request):
+        """
+        Return up to BATCH_MAX_ITEMS posts, given as comma-separated ids or slugs
+        in `?ids=`, in request order. Missing or hidden posts get a not-found marker.
+        """
+        lookups = [value.strip() for value in request.query_params.get('ids', '').split(',') if value.strip()]
+        if not lookups:
+            return Response(
+                {'error': 'Provide post ids or slugs as ?ids=id1,id2,...'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(lookups) > settings.BATCH_MAX_ITEMS:
+            return Response(
+                {'error': f'At most {settings.BATCH_MAX_ITEMS} posts can be requested at once.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        post_ids, unresolved = {}, []
+        for value in lookups:
+            try:
+                post_ids[value] = uuid.UUID(value)
+            except ValueError:
+                unresolved.append(value)
+        post_ids.update(slugs.resolve_many(unresolved))
+
+        details = self._load_details(list(post_ids.values()))
+        results = []
+        for value in lookups:
+            data = details.get(str(post_ids[value])) if value in post_ids else None
+            if data is not None and self._is_visible(data):
+                results.append(self._present(data))
+            else:
+                results.append({'lookup': value, 'error': 'Not found.'})
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """
+        Incremental sync: published posts created or updated, and tombstones of
+        posts deleted or unpublished, since the `since` token of a previous call.
+        """
+        try:
+            limit = min(int(request.query_params.get('limit', settings.CHANGE_FEED_PAGE_SIZE)), settings.CHANGE_FEED_MAX_PAGE_SIZE)
+        except ValueError:
+            return Response({'error': 'limit must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            posts, tombstones, next_token, has_more = changes.get_changes(
+                request.query_params.get('since'), max(limit, 1)
+            )
+        except changes.InvalidToken as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = BlogPostChangeSerializer(posts, many=True, context=self.get_serializer_context())
+        return Response({
+            'changes': serializer.data,
+            'tombstones': [
+                {'id': tombstone.post_id, 'reason': tombstone.reason, 'at': tombstone.created_at}
+                for tombstone in tombstones
+            ],
+            'next': next_token,
+            'has_more': has_more,
+        }, status=status.HTTP_200_OK)
+
+    def _ranked_list(self, order_field):
+        queryset = (
+            BlogPost.objects.filter(status='published', popularity__isnull=False)
+            .select_related('author')
+            .prefetch_related('tags')
+            .order_by(order_field)
+        )
+        page = self.paginate_queryset(queryset)
+        serializer = BlogPostListSerializer(page, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def popular(self, request):
+        """Published posts ordered by total views"""
+        return self._ranked_list('-popularity__total_views')
+
+    @action(detail=False, methods=['get'])
+    def trending(self, request):
+        """Published posts ordered by time-decayed views"""
+        return self._ranked_list('-popularity__trending_score')
+
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """
+        Return post counts per category, tag, author, status and featured flag
+        for the current search/filter parameters.
+        """
+        params = sorted(
+            (key, value) for key, value in request.query_params.items()
+            if key not in ('page', 'ordering', 'format')
+        )
+        cache_key = caching.make_key(caching.POSTS_NAMESPACE, 'facets', request.user.is_authenticated, params)
+        data = cache.get(cache_key)
+        if data is None:
+            data = self._compute_facets(self.filter_queryset(self.get_queryset()))
+            cache.set(cache_key, data, settings.FACETS_CACHE_TIMEOUT)
+        return Response(data, status=status.HTTP_200_OK)
+
+    def _compute_facets(self, queryset):
+        """One grouped aggregate query per facet"""
+        queryset = queryset.order_by()
+        post_ids = queryset.values('id')
+        tag_counts = (
+            BlogPost.tags.through.objects.filter(blogpost_id__in=post_ids)
+            .values('tag_id', 'tag__name', 'tag__slug')
+            .annotate(count=Count('blogpost_id'))
+            .order_by('-count', 'tag__name')
+        )
+        author_counts = (
+            queryset.values('author_id', 'author__name')
+            .annotate(count=Count('id'))
+            .order_by('-count', 'author__name')
+        )
+        category_counts = queryset.values('category').annotate(count=Count('id')).order_by('-count', 'category')
+        status_counts = queryset.values('status').annotate(count=Count('id')).order_by('status')
+        featured_counts = queryset.values('featured').annotate(count=Count('id')).order_by('-featured')
+
+        featured = [{'value': row['featured'], 'count': row['count']} for row in featured_counts]
+        return {
+            'count': sum(row['count'] for row in featured),
+            'category': [{'value': row['category'], 'count': row['count']} for row in category_counts],
+            'tag': [
+                {'id': row['tag_id'], 'name': row['tag__name'], 'slug': row['tag__slug'], 'count': row['count']}
+                for row in tag_counts
+            ],
+            'author': [
+                {'id': row['author_id'], 'name': row['author__name'], 'count': row['count']}
+                for row in author_counts
+            ],
+            'status': [{'value': row['status'], 'count': row['count']} for row in status_counts],
+            'featured': featured,
+        }
+
+    @action(detail=True, methods=['get'])
+    def related(self, request, pk=None):
+        """Return the precomputed most similar published posts, best match first"""
+        pk = self._resolve_lookup(pk)
+        entries = list(
+            RelatedPost.objects.filter(post_id=pk, related__status='published')
+            .select_related('related__author')
+            .prefetch_related('related__tags')
+        )
+        if not entries:
+            get_object_or_404(self.get_queryset(), pk=pk)
+        serializer = BlogPostListSerializer(
+            [entry.related for entry in entries], many=True, context=self.get_serializer_context()
+        )
+        data = serializer.data
+        for item, entry in zip(data, entries):
+            item['score'] = round(entry.score, 4)
+        return Response(data, status=status.HTTP_200_OK)
+
+
+class DirectoryViewSet(viewsets.ViewSet):
+    """
+    Read-only authors or tags with published post counts, ordered by name.
+
+    Query parameters (list):
+    - prefix: Only names starting with this text (case-insensitive)
+    - cursor: `next` cursor of the previous page
+    - limit: Page size (default DIRECTORY_PAGE_SIZE)
+    """
+    permission_classes = [AllowAny]
+    model = None
+    serializer_class = None
+
+    def get_lookup(self, pk):
+        return {'pk': uuid.UUID(str(pk))}
+
+    def list(self, request):
+        try:
+            limit = min(max(int(request.query_params.get('limit', settings.DIRECTORY_PAGE_SIZE)), 1),
+                        settings.DIRECTORY_MAX_PAGE_SIZE)
+        except ValueError:
+            return Response({'error': 'limit must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            results, next_cursor = directory.page(
+                self.model, self.serializer_class,
+                prefix=request.query_params.get('prefix', '')[:100],
+                cursor=request.query_params.get('cursor'),
+                limit=limit,
+            )
+        except directory.InvalidCursor as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        next_url = None
+        if next_cursor:
+            next_url = replace_query_param(request.build_absolute_uri(), 'cursor', next_cursor)
+        return Response({'next': next_url, 'results': results}, status=status.HTTP_200_OK)
+
+    def retrieve(self, request, pk=None):
+        try:
+            lookup = self.get_lookup(pk)
+        except ValueError:
+            raise Http404
+        data = directory.detail(self.model, self.serializer_class, **lookup)
+        if data is None:
+            raise Http404
+        return Response(data, status=status.HTTP_200_OK)
+
+
+class AuthorViewSet(DirectoryViewSet):
+    """
+    list: Authors with published post counts (GET /api/authors/?prefix=al)
+    retrieve: One author by ID (GET /api/authors/{id}/)
+    """
+    model = Author
+    serializer_class = AuthorStatsSerializer
+
+
+class TagViewSet(DirectoryViewSet):
+    """
+    list: Tags with published post counts (GET /api/tags/?prefix=dj)
+    retrieve: One tag by ID or slug (GET /api/tags/{id_or_slug}/)
+    """
+    model = Tag
+    serializer_class = TagStatsSerializer
+
+    def get_lookup(self, pk):
+        try:
+            return {'pk': uuid.UUID(str(pk))}
+        except ValueError:
+            return {'slug': pk}
+
 
 @api_view(['POST'])
 def create_comment(request, post_id):
@@ -138,3 +478,202 @@ def list_comments(request, post_id):
     serializer = CommentSerializer(comments, many=True)
     
     return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+def autocomplete_view(request):
+    """
+    Suggest post titles, tag names and author names for a search prefix.
+
+    GET /api/autocomplete/?q=dja&limit=8
+    """
+    try:
+        limit = min(max(int(request.query_params.get('limit', settings.AUTOCOMPLETE_LIMIT)), 1),
+                    settings.AUTOCOMPLETE_MAX_LIMIT)
+    except ValueError:
+        return Response({'error': 'limit must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+    query = request.query_params.get('q', '')[:100]
+    response = Response({'query': query, 'results': autocomplete.suggest(query, limit)}, status=status.HTTP_200_OK)
+    patch_cache_control(response, public=True, max_age=settings.AUTOCOMPLETE_CACHE_MAX_AGE)
+    return response
+
+
+def _upload_payload(request, upload):
+    return {
+        'id': upload.id,
+        'filename': upload.filename,
+        'size': upload.size,
+        'offset': upload.offset,
+        'status': upload.status,
+        'chunk_size': settings.IMAGE_UPLOAD_CHUNK_SIZE,
+        'image': request.build_absolute_uri(upload.asset.file.url) if upload.asset_id else None,
+    }
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def create_upload(request):
+    """
+    Start a resumable featured image upload (admin users only).
+
+    POST /api/uploads/
+
+    Request body:
+    {
+        "filename": "cover.jpg",
+        "size": 48213376,
+        "sha256": "<optional hex digest of the whole file>"
+    }
+    """
+    try:
+        size = int(request.data.get('size', ''))
+    except (TypeError, ValueError):
+        return Response({'error': 'size must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        upload = uploads.create(request.data.get('filename'), size, request.data.get('sha256'), request.user)
+    except uploads.UploadError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(_upload_payload(request, upload), status=status.HTTP_201_CREATED)
+
+
+@api_view(['GET', 'PUT'])
+@permission_classes([IsAdminUser])
+def upload_detail(request, upload_id):
+    """
+    GET: bytes received so far, to resume an interrupted upload.
+    PUT: append a chunk; the raw body is the chunk, with
+    `Content-Range: bytes {start}-{end}/{size}` and optionally `X-Chunk-SHA256`.
+    A chunk not starting at the current offset gets 409 with that offset.
+    """
+    if request.method == 'GET':
+        return Response(_upload_payload(request, get_object_or_404(ImageUpload, pk=upload_id)))
+    try:
+        # Read the body from the underlying request so it is streamed, not parsed
+        upload = uploads.write_chunk(
+            upload_id, request._request, request.headers.get('Content-Range'), request.headers.get('X-Chunk-SHA256')
+        )
+    except ImageUpload.DoesNotExist:
+        raise Http404
+    except uploads.OffsetMismatch as exc:
+        return Response({'error': str(exc), 'offset': exc.offset}, status=status.HTTP_409_CONFLICT)
+    except uploads.UploadError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(_upload_payload(request, upload))
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def complete_upload(request, upload_id):
+    """
+    Finish an upload and set it as a post's featured image.
+
+    POST /api/uploads/{upload_id}/complete/
+
+    Request body:
+    {
+        "post": "<post id>"
+    }
+    """
+    try:
+        post_id = uuid.UUID(str(request.data.get('post')))
+    except ValueError:
+        return Response({'error': 'post must be a post id.'}, status=status.HTTP_400_BAD_REQUEST)
+    post = get_object_or_404(BlogPost, pk=post_id)
+    try:
+        upload = uploads.complete(upload_id, post, request.user)
+    except ImageUpload.DoesNotExist:
+        raise Http404
+    except uploads.UploadBusy as exc:
+        return Response({'error': str(exc), 'offset': exc.offset}, status=status.HTTP_409_CONFLICT)
+    except uploads.UploadError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(_upload_payload(request, upload))
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def admission_stats(request):
+    """
+    Queued, shed and timed-out request counts per admission pool, with the
+    current load of the worker answering (admin users only).
+
+    GET /api/admission/
+    """
+    return Response(admission.stats(), status=status.HTTP_200_OK)
+
+
+def _serve_artifact(request, key):
+    """Serve a precomputed feed/sitemap artifact with ETag and Last-Modified support"""
+    artifact = feeds.get_or_build(key)
+    if artifact is None:
+        raise Http404('Feed not found.')
+
+    etag = f'"{artifact.etag}"'
+    last_modified = int(artifact.last_modified.timestamp())
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = HttpResponse(artifact.body, content_type=artifact.content_type)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, public=True, max_age=300)
+    return response
+
+
+@require_safe
+def feed(request, fmt):
+    """
+    Feed of all published posts.
+
+    GET /api/feeds/{rss|atom}/
+    """
+    return _serve_artifact(request, feeds.feed_key(fmt))
+
+
+@require_safe
+def category_feed(request, category, fmt):
+    """
+    Feed of published posts in a category.
+
+    GET /api/feeds/category/{category}/{rss|atom}/
+    """
+    return _serve_artifact(request, feeds.feed_key(fmt, 'category', category))
+
+
+@require_safe
+def tag_feed(request, slug, fmt):
+    """
+    Feed of published posts with a tag.
+
+    GET /api/feeds/tag/{slug}/{rss|atom}/
+    """
+    return _serve_artifact(request, feeds.feed_key(fmt, 'tag', slug))
+
+
+@require_safe
+def author_feed(request, author_id, fmt):
+    """
+    Feed of published posts by an author.
+
+    GET /api/feeds/author/{author_id}/{rss|atom}/
+    """
+    return _serve_artifact(request, feeds.feed_key(fmt, 'author', author_id))
+
+
+@require_safe
+def sitemap_index(request):
+    """
+    Sitemap index listing one sitemap per month of posts.
+
+    GET /api/sitemap.xml
+    """
+    return _serve_artifact(request, feeds.SITEMAP_INDEX_KEY)
+
+
+@require_safe
+def sitemap_shard(request, shard):
+    """
+    Sitemap of the published posts created in a month.
+
+    GET /api/sitemaps/{YYYY-MM}.xml
+    """
+    return _serve_artifact(request, feeds.sitemap_key(shard))
@@ -0,0 +1,152 @@
+"""
+Worker warm-up.
+
+A fresh worker otherwise initialises lazily on its first requests: the URL
+resolver, model metadata caches, DRF serializer and renderer code paths,
+the database connection and the per-worker slug and autocomplete indexes.
+`warm_up()` does all of that before the worker takes traffic, and also
+fills the shared caches with the first list page and the hottest posts.
+
+It runs from the WSGI/ASGI entry points (config/wsgi.py, config/asgi.py)
+when WARMUP_ON_STARTUP is set, so management commands are not affected.
+ASGI servers import the application inside their running event loop, where
+Django refuses database access, so there it runs on the ASGI lifespan
+startup event in Django's sync thread (`with_lifespan_warm_up`); servers
+without lifespan support skip it. Django runs each ASGI request's sync code
+in a thread of its own, so the connections opened by the warm-up are never
+reused there; they are closed afterwards instead of lingering idle.
+With `gunicorn --preload` the application is imported before workers are
+forked, which would share the warmed database connection between them; in
+that case disable WARMUP_ON_STARTUP and call `warm_up()` from gunicorn's
+`post_fork` hook instead.
+"""
+import logging
+import time
+from urllib.parse import urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+from django.test import RequestFactory
+from django.urls import get_resolver, resolve
+
+from . import autocomplete, caching, slugs
+from .models import BlogPost
+
+logger = logging.getLogger(__name__)
+
+# Step timings of the last warm-up in this process, in seconds
+last_report = {}
+
+
+def hot_post_ids(limit):
+    """Trending published posts, topped up with the most recent ones"""
+    published = BlogPost.objects.filter(status='published')
+    post_ids = list(
+        published.filter(popularity__isnull=False)
+        .order_by('-popularity__trending_score')
+        .values_list('pk', flat=True)[:limit]
+    )
+    if len(post_ids) < limit:
+        recent = published.exclude(pk__in=post_ids).order_by('-created_at', '-id')
+        post_ids += list(recent.values_list('pk', flat=True)[:limit - len(post_ids)])
+    return post_ids
+
+
+def _get(view, path, **params):
+    """Run a GET through the API view and render it, as for an anonymous visitor"""
+    parts = urlsplit(settings.SITE_URL)
+    request = RequestFactory().get(path, params, HTTP_HOST=parts.netloc, secure=parts.scheme == 'https')
+    response = view(request)
+    response.render()
+    return response
+
+
+def _warm_database():
+    for alias in connections:
+        connections[alias].ensure_connection()
+
+
+def _warm_urls():
+    get_resolver().url_patterns
+    resolve('/api/posts/')
+
+
+def _warm_indexes():
+    # Done here, so the first request does not have to
+    request_started.disconnect(slugs.warm_on_first_request)
+    request_started.disconnect(autocomplete.warm_on_first_request)
+    slugs.warm()
+    autocomplete.warm()
+
+
+def _warm_posts():
+    from .views import BlogPostViewSet
+
+    _get(BlogPostViewSet.as_view({'get': 'list'}), '/api/posts/')
+    post_ids = hot_post_ids(settings.WARMUP_HOT_POSTS)
+    batch = BlogPostViewSet.as_view({'get': 'batch'})
+    for start in range(0, len(post_ids), settings.BATCH_MAX_ITEMS):
+        chunk = post_ids[start:start + settings.BATCH_MAX_ITEMS]
+        _get(batch, '/api/posts/batch/', ids=','.join(str(post_id) for post_id in chunk))
+
+
+STEPS = [
+    ('database', _warm_database),
+    ('urls', _warm_urls),
+    ('indexes', _warm_indexes),
+    ('posts', _warm_posts),
+]
+
+
+def warm_up():
+    """Run every warm-up step and return {step: seconds}; a failing step is logged and skipped"""
+    report = {}
+    for name, step in STEPS:
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception:
+            logger.exception('Warm-up step %r failed', name)
+        report[name] = time.perf_counter() - started
+    last_report.clear()
+    last_report.update(report)
+    return report
+
+
+def warm_up_on_startup():
+    if not settings.DEBUG and not caching.is_shared():
+        logger.warning('The default cache is local to this worker; set CACHE_URL so workers share '
+                       'cache invalidation, single-flight locks and admission counters.')
+    if not settings.WARMUP_ON_STARTUP:
+        return
+    report = warm_up()
+    logger.info('Worker warmed up in %.3fs (%s)', sum(report.values()),
+                ', '.join(f'{name} {seconds:.3f}s' for name, seconds in report.items()))
+
+
+def _warm_up_and_disconnect():
+    try:
+        warm_up_on_startup()
+    finally:
+        # Requests get connections in their own threads; this one would only idle
+        connections.close_all()
+
+
+def with_lifespan_warm_up(application):
+    """Wrap an ASGI application to warm up on the lifespan startup event, which Django itself does not handle"""
+
+    async def lifespan_application(scope, receive, send):
+        if scope['type'] != 'lifespan':
+            return await application(scope, receive, send)
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await sync_to_async(_warm_up_and_disconnect)()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    return lifespan_application
@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_asgi_application()
+
+# Build caches and connections on the lifespan startup event, before the first request (see api.warmup)
+from api.warmup import with_lifespan_warm_up  # noqa: E402
+
+application = with_lifespan_warm_up(application)
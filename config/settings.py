@@ -11,7 +11,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -46,6 +47,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'api.admission.AdmissionControlMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -85,10 +87,35 @@ DATABASES = {
         'PASSWORD': config('DB_PASSWORD', default='2134'),
         'HOST': config('DB_HOST', default='localhost'),
         'PORT': config('DB_PORT', default='5432'),
+        # Keep connections open between requests (and from the startup warm-up)
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
 
+# Cache
+# Workers share cache generations, single-flight locks and counters through the
+# default cache, so production needs a shared backend: CACHE_URL=redis://host:6379/0
+# (needs `redis`) or memcached://host:11211 (needs `pymemcache`). Without CACHE_URL
+# each process gets its own local-memory cache, which is only fit for development.
+
+CACHE_URL = config('CACHE_URL', default='')
+if CACHE_URL.startswith(('redis://', 'rediss://', 'unix://')):
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': CACHE_URL}}
+elif CACHE_URL.startswith('memcached://'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': CACHE_URL.removeprefix('memcached://'),
+        }
+    }
+elif CACHE_URL:
+    raise ImproperlyConfigured(f'Unsupported CACHE_URL scheme: {CACHE_URL.split(":", 1)[0]}')
+else:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -149,3 +176,136 @@ REST_FRAMEWORK = {
 # CORS settings - Allow all origins
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
+
+# Feeds & sitemap settings
+SITE_URL = config('SITE_URL', default='http://localhost:8000')
+BLOG_POST_URL = config('BLOG_POST_URL', default='http://localhost:3000/blog/{slug}/')
+FEED_TITLE = config('FEED_TITLE', default='Blog')
+FEED_DESCRIPTION = config('FEED_DESCRIPTION', default='Latest blog posts')
+FEED_ITEM_LIMIT = config('FEED_ITEM_LIMIT', default=50, cast=int)
+# Seconds a feed key without content (unknown tag, empty category) is remembered as missing
+FEED_MISSING_CACHE_TIMEOUT = config('FEED_MISSING_CACHE_TIMEOUT', default=300, cast=int)
+
+# Static JSON snapshots (manage.py publish_static)
+STATIC_SNAPSHOT_ROOT = config('STATIC_SNAPSHOT_ROOT', default=str(BASE_DIR / 'snapshots'))
+
+# Related posts
+RELATED_POSTS_TOP_K = config('RELATED_POSTS_TOP_K', default=10, cast=int)
+RELATED_POSTS_CATEGORY_WEIGHT = config('RELATED_POSTS_CATEGORY_WEIGHT', default=0.5, cast=float)
+
+# Cached filter counts for /api/posts/facets/ (seconds)
+FACETS_CACHE_TIMEOUT = config('FACETS_CACHE_TIMEOUT', default=300, cast=int)
+
+# Content-derived fields
+READ_TIME_WORDS_PER_MINUTE = config('READ_TIME_WORDS_PER_MINUTE', default=200, cast=int)
+EXCERPT_LENGTH = config('EXCERPT_LENGTH', default=280, cast=int)
+
+# View counting and trending
+VIEW_COUNT_BUCKET_SECONDS = config('VIEW_COUNT_BUCKET_SECONDS', default=3600, cast=int)
+VIEW_COUNT_FLUSH_INTERVAL = config('VIEW_COUNT_FLUSH_INTERVAL', default=10, cast=float)
+VIEW_COUNT_MAX_BUFFER = config('VIEW_COUNT_MAX_BUFFER', default=1000, cast=int)
+TRENDING_HALF_LIFE_HOURS = config('TRENDING_HALF_LIFE_HOURS', default=24, cast=float)
+
+# Cached post detail payloads and batch retrieval
+POST_DETAIL_CACHE_TIMEOUT = config('POST_DETAIL_CACHE_TIMEOUT', default=600, cast=int)
+BATCH_MAX_ITEMS = config('BATCH_MAX_ITEMS', default=50, cast=int)
+
+# Slug -> post id entries kept in memory per worker, and seconds each is trusted
+SLUG_CACHE_SIZE = config('SLUG_CACHE_SIZE', default=10000, cast=int)
+SLUG_CACHE_TTL = config('SLUG_CACHE_TTL', default=60, cast=int)
+
+# Change feed (/api/posts/changes/)
+CHANGE_FEED_PAGE_SIZE = config('CHANGE_FEED_PAGE_SIZE', default=100, cast=int)
+CHANGE_FEED_MAX_PAGE_SIZE = config('CHANGE_FEED_MAX_PAGE_SIZE', default=500, cast=int)
+CHANGE_FEED_SETTLE_SECONDS = config('CHANGE_FEED_SETTLE_SECONDS', default=2, cast=int)
+
+# Outbound cache purge webhooks (manage.py run_purge_worker)
+PURGE_WEBHOOK_TARGETS = config('PURGE_WEBHOOK_TARGETS', default='', cast=Csv())
+PURGE_WEBHOOK_SECRET = config('PURGE_WEBHOOK_SECRET', default='')
+PURGE_WEBHOOK_TIMEOUT = config('PURGE_WEBHOOK_TIMEOUT', default=5, cast=float)
+PURGE_BATCH_SIZE = config('PURGE_BATCH_SIZE', default=100, cast=int)
+# Seconds a worker's claimed batch is skipped by other workers; keep above PURGE_WEBHOOK_TIMEOUT
+PURGE_CLAIM_TIMEOUT = config('PURGE_CLAIM_TIMEOUT', default=60, cast=float)
+PURGE_MAX_ATTEMPTS = config('PURGE_MAX_ATTEMPTS', default=8, cast=int)
+PURGE_BACKOFF_BASE = config('PURGE_BACKOFF_BASE', default=5, cast=float)
+PURGE_BACKOFF_MAX = config('PURGE_BACKOFF_MAX', default=3600, cast=float)
+
+# Admin bulk actions (manage.py run_admin_jobs)
+ADMIN_BULK_SYNC_LIMIT = config('ADMIN_BULK_SYNC_LIMIT', default=1000, cast=int)
+ADMIN_BULK_CHUNK_SIZE = config('ADMIN_BULK_CHUNK_SIZE', default=500, cast=int)
+# Seconds without a committed chunk after which a running job is taken over by another worker
+ADMIN_BULK_JOB_LEASE = config('ADMIN_BULK_JOB_LEASE', default=600, cast=int)
+
+# Admin changelists switch to planner row estimates above this many rows
+ADMIN_EXACT_COUNT_LIMIT = config('ADMIN_EXACT_COUNT_LIMIT', default=10000, cast=int)
+
+# Comments shown per page in the blog post admin
+ADMIN_INLINE_COMMENTS_PAGE_SIZE = config('ADMIN_INLINE_COMMENTS_PAGE_SIZE', default=20, cast=int)
+
+# Monthly comment partitions (manage.py partition_comments, PostgreSQL only)
+COMMENT_PARTITIONING = config('COMMENT_PARTITIONING', default=False, cast=bool)
+COMMENT_PARTITIONS_AHEAD = config('COMMENT_PARTITIONS_AHEAD', default=3, cast=int)
+COMMENT_HOT_MONTHS = config('COMMENT_HOT_MONTHS', default=12, cast=int)
+COMMENT_COLD_TABLESPACE = config('COMMENT_COLD_TABLESPACE', default='')
+
+# Rendered content HTML (?content_format=html, manage.py prerender_content)
+CONTENT_HTML_CACHE_TIMEOUT = config('CONTENT_HTML_CACHE_TIMEOUT', default=7 * 24 * 3600, cast=int)
+
+# Post revision history (manage.py compact_revisions)
+REVISION_SNAPSHOT_INTERVAL = config('REVISION_SNAPSHOT_INTERVAL', default=10, cast=int)
+REVISION_RETENTION_DAYS = config('REVISION_RETENTION_DAYS', default=365, cast=int)
+REVISION_KEEP_MIN = config('REVISION_KEEP_MIN', default=10, cast=int)
+
+# Typeahead suggestions (/api/autocomplete/)
+AUTOCOMPLETE_LIMIT = config('AUTOCOMPLETE_LIMIT', default=8, cast=int)
+AUTOCOMPLETE_MAX_LIMIT = config('AUTOCOMPLETE_MAX_LIMIT', default=20, cast=int)
+# Index keys examined per lookup before ranking; bounds the cost of one-letter prefixes
+AUTOCOMPLETE_SCAN_LIMIT = config('AUTOCOMPLETE_SCAN_LIMIT', default=500, cast=int)
+AUTOCOMPLETE_CACHE_MAX_AGE = config('AUTOCOMPLETE_CACHE_MAX_AGE', default=30, cast=int)
+
+# Resumable featured image uploads (/api/uploads/, manage.py prune_uploads)
+IMAGE_UPLOAD_TEMP_DIR = config('IMAGE_UPLOAD_TEMP_DIR', default=str(BASE_DIR / 'upload_tmp'))
+IMAGE_UPLOAD_MAX_SIZE = config('IMAGE_UPLOAD_MAX_SIZE', default=200 * 1024 * 1024, cast=int)
+IMAGE_UPLOAD_CHUNK_SIZE = config('IMAGE_UPLOAD_CHUNK_SIZE', default=8 * 1024 * 1024, cast=int)
+IMAGE_UPLOAD_EXPIRY_HOURS = config('IMAGE_UPLOAD_EXPIRY_HOURS', default=24, cast=int)
+IMAGE_UPLOAD_FORMATS = config('IMAGE_UPLOAD_FORMATS', default='JPEG,PNG,GIF,WEBP', cast=Csv())
+
+# Coalesced cache misses and stale-while-revalidate list pages (anonymous requests)
+SINGLE_FLIGHT_WAIT = config('SINGLE_FLIGHT_WAIT', default=5, cast=float)
+SINGLE_FLIGHT_LOCK_TIMEOUT = config('SINGLE_FLIGHT_LOCK_TIMEOUT', default=30, cast=int)
+POST_LIST_CACHE_TIMEOUT = config('POST_LIST_CACHE_TIMEOUT', default=30, cast=int)
+POST_LIST_STALE_TIMEOUT = config('POST_LIST_STALE_TIMEOUT', default=300, cast=int)
+
+# Worker warm-up from the WSGI/ASGI entry points (manage.py measure_startup)
+WARMUP_ON_STARTUP = config('WARMUP_ON_STARTUP', default=True, cast=bool)
+WARMUP_HOT_POSTS = config('WARMUP_HOT_POSTS', default=50, cast=int)
+
+# Admission control (api.admission): per-worker concurrency limits, bounded wait
+# queues (`queue` requests waiting at most `wait` seconds) and statement timeouts
+# in milliseconds. Pools with a lower priority number are admitted first.
+ADMISSION_CONTROL = config('ADMISSION_CONTROL', default=True, cast=bool)
+ADMISSION_MAX_CONCURRENCY = config('ADMISSION_MAX_CONCURRENCY', default=16, cast=int)
+ADMISSION_RETRY_AFTER = config('ADMISSION_RETRY_AFTER', default=5, cast=int)
+ADMISSION_POOLS = {
+    'admin': {'concurrency': 4, 'queue': 20, 'wait': 10, 'priority': 0, 'statement_timeout': 30000},
+    'write': {'concurrency': 4, 'queue': 20, 'wait': 5, 'priority': 0, 'statement_timeout': 10000},
+    'uploads': {'concurrency': 2, 'queue': 4, 'wait': 2, 'statement_timeout': 10000},
+    'search': {'concurrency': 2, 'queue': 4, 'wait': 0.5, 'statement_timeout': 2000},
+    'comments': {'concurrency': 4, 'queue': 8, 'wait': 1, 'statement_timeout': 2000},
+    'read': {'concurrency': 12, 'queue': 16, 'wait': 1, 'statement_timeout': 5000},
+}
+
+# Author and tag directories (/api/authors/, /api/tags/)
+DIRECTORY_PAGE_SIZE = config('DIRECTORY_PAGE_SIZE', default=50, cast=int)
+DIRECTORY_MAX_PAGE_SIZE = config('DIRECTORY_MAX_PAGE_SIZE', default=200, cast=int)
+DIRECTORY_CACHE_TIMEOUT = config('DIRECTORY_CACHE_TIMEOUT', default=600, cast=int)
+
+# Media serving (api.media): 'python' streams files from the worker with Range
+# and conditional request support; 'x-accel-redirect' (nginx) and 'x-sendfile'
+# (Apache/lighttpd) hand the transfer to the front-end server; 'none' leaves
+# MEDIA_URL entirely to the front-end server.
+MEDIA_SERVE_MODE = config('MEDIA_SERVE_MODE', default='python')
+MEDIA_ACCEL_REDIRECT_PREFIX = config('MEDIA_ACCEL_REDIRECT_PREFIX', default='/protected-media/')
+MEDIA_CACHE_MAX_AGE = config('MEDIA_CACHE_MAX_AGE', default=3600, cast=int)
+MEDIA_IMMUTABLE_MAX_AGE = config('MEDIA_IMMUTABLE_MAX_AGE', default=365 * 24 * 3600, cast=int)
+MEDIA_ACCESS_CACHE_TIMEOUT = config('MEDIA_ACCESS_CACHE_TIMEOUT', default=600, cast=int)